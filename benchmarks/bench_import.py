@@ -0,0 +1,105 @@
+"""
+Benchmark: worker start-up cost of the static fallback data
+===========================================================
+Runs each measurement in a fresh interpreter (median of several runs):
+
+    literals ...      importing the catalog + festivals as Python dict
+                      literals, the way they used to sit in ai_service.py
+                      (with a warm .pyc, and without one as on a fresh deploy)
+    numpy import      what ai_service.py paid at import for the vectorized
+                      fallback before it became lazy
+    ai_service import importing recommendations.ai_service now — mostly the
+                      google-genai SDK; static data and NumPy are not touched
+    first fallback    the one-off lazy load (JSON + NumPy + columns + style
+                      index) a worker pays on its first fallback, or the
+                      master pays once with gunicorn preload_app
+
+    python benchmarks/bench_import.py
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA = os.path.join(ROOT, 'recommendations', 'data')
+RUNS = 7
+
+SETUP = (
+    "import os, sys, time, resource\n"
+    "sys.path.insert(0, {root!r})\n"
+    "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gypsycompass_backend.settings')\n"
+    "import django; django.setup()\n"
+)
+REPORT = (
+    "print(elapsed * 1000, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+)
+
+LEGACY = (
+    "sys.path.insert(0, {tmp!r})\n"
+    "t = time.perf_counter()\n"
+    "import legacy_static_data\n"
+    "elapsed = time.perf_counter() - t\n"
+)
+
+# label → (interpreter flags, snippet)
+SNIPPETS = {
+    'literals (no .pyc)': (['-B'], LEGACY),
+    'literals (.pyc)': ([], LEGACY),
+    'numpy import': ([], (
+        "t = time.perf_counter()\n"
+        "import numpy\n"
+        "elapsed = time.perf_counter() - t\n"
+    )),
+    'ai_service import': ([], (
+        "t = time.perf_counter()\n"
+        "import recommendations.ai_service\n"
+        "elapsed = time.perf_counter() - t\n"
+    )),
+    'first fallback': ([], (
+        "import recommendations.ai_service as ai\n"
+        "t = time.perf_counter()\n"
+        "ai.warm_static_data()\n"
+        "elapsed = time.perf_counter() - t\n"
+    )),
+}
+
+
+def _write_legacy_module(tmp):
+    """Recreate the old in-source layout from the data files."""
+    with open(os.path.join(DATA, 'destinations.json'), encoding='utf-8') as f:
+        destinations = json.load(f)
+    with open(os.path.join(DATA, 'festivals.json'), encoding='utf-8') as f:
+        festivals = json.load(f)
+    with open(os.path.join(tmp, 'legacy_static_data.py'), 'w', encoding='utf-8') as f:
+        f.write(f"ALL_DESTINATIONS = {destinations!r}\n")
+        f.write(f"FESTIVALS_DB = {festivals['destinations']!r}\n")
+
+
+def _measure(flags, code):
+    times, rss = [], []
+    for _ in range(RUNS):
+        out = subprocess.run(
+            [sys.executable, *flags, '-c', code], capture_output=True, text=True, check=True, cwd=ROOT,
+        ).stdout.strip().splitlines()[-1]
+        ms, kb = out.split()
+        times.append(float(ms))
+        rss.append(int(kb))
+    return statistics.median(times), statistics.median(rss)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        _write_legacy_module(tmp)
+        print(f"{'measurement':<20}{'median ms':>11}{'max RSS MB':>12}")
+        for label, (flags, body) in SNIPPETS.items():
+            code = SETUP.format(root=ROOT) + body.format(tmp=tmp) + REPORT
+            ms, kb = _measure(flags, code)
+            print(f"{label:<20}{ms:>11.1f}{kb / 1024:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
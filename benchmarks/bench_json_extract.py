@@ -0,0 +1,91 @@
+"""
+Benchmark: JSON extraction from Gemini replies
+==============================================
+Compares the old regex-based _clean_json with the single-pass
+JSONStreamParser on large and malformed model outputs.
+
+    python benchmarks/bench_json_extract.py
+"""
+
+import json
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recommendations.json_stream import JSONStreamParser, extract_json  # noqa: E402
+
+
+def legacy_clean_json(text):
+    """The previous implementation, kept here for comparison."""
+    if not text:
+        return None
+    text = re.sub(r'```json\s*', '', text)
+    text = re.sub(r'```\s*', '', text)
+    text = text.strip()
+    try:
+        return json.loads(text)
+    except Exception:
+        pass
+    for pattern in [r'\{[\s\S]*\}', r'\[[\s\S]*\]']:
+        match = re.search(pattern, text)
+        if match:
+            try:
+                return json.loads(match.group())
+            except Exception:
+                pass
+    return None
+
+
+def _recommendation(i):
+    return {
+        'name': f'Destination {i}', 'location': f'Town {i}, State',
+        'tagline': 'Misty hills, "tea" gardens and {curly} waterfalls',
+        'estimated_cost': 20000 + i, 'cost_breakdown': {'travel': 5000, 'stay': 9000, 'food': 4000},
+        'styles': ['hill stations', 'nature & landscape'], 'highlight': 'Sunrise point\\viewpoint',
+        'within_budget': i % 3 != 0,
+    }
+
+
+def _reply(n):
+    return json.dumps({'recommendations': [_recommendation(i) for i in range(n)], 'ai_summary': 'x' * 400}, indent=2)
+
+
+BODY = _reply(200)
+CASES = {
+    'clean (200 recs)': BODY,
+    'fenced + prose': 'Sure! Here are your picks:\n```json\n' + BODY + '\n```\nEnjoy {your} trip!',
+    'prose braces first': 'Note: costs are in {INR} and [approximate].\n' + BODY,
+    'trailing junk': BODY + '\n\nLet me know if you want {more} options} ]',
+    'truncated (max tokens)': BODY[: len(BODY) * 2 // 3],
+    'no json, many braces': '{' * 3000 + ' hello ' + '[' * 3000,
+    'unclosed prose braces': '{ a ' * 8000,
+    'deep nesting': '[' * 1500 + ']' * 1500,
+}
+
+
+def _stream(text, size=64):
+    parser = JSONStreamParser(array_key='recommendations')
+    items = 0
+    for i in range(0, len(text), size):
+        items += len(parser.feed(text[i:i + size]))
+    return items, parser.close()
+
+
+def main():
+    print(f"{'case':<26}{'bytes':>9}{'legacy ms':>12}{'parser ms':>12}{'stream ms':>12}  agree  streamed")
+    for label, text in CASES.items():
+        runs = 20
+        legacy = timeit.timeit(lambda: legacy_clean_json(text), number=runs) / runs * 1000
+        parser = timeit.timeit(lambda: extract_json(text), number=runs) / runs * 1000
+        stream = timeit.timeit(lambda: _stream(text), number=runs) / runs * 1000
+        old, new = legacy_clean_json(text), extract_json(text)
+        items, _ = _stream(text)
+        agree = 'yes' if old == new else ('new' if new is not None else 'no')
+        print(f"{label:<26}{len(text):>9}{legacy:>12.2f}{parser:>12.2f}{stream:>12.2f}  {agree:<5}  {items}")
+
+
+if __name__ == '__main__':
+    main()
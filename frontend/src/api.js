@@ -10,17 +10,59 @@ const api = axios.create({
   timeout: 60000, // 60 seconds for AI responses
 });
 
+// The backend runs under ASGI: the /async/ views await Gemini without
+// holding the worker's single sync thread, so a slow details call can't
+// block suggestions or other requests.
 export const getRecommendations = (userPrefs) =>
-  api.post('/recommendations/', userPrefs);
+  api.post('/async/recommendations/', userPrefs);
+
+// Streams NDJSON events from /recommendations/stream/ — the static picks arrive
+// first, then each AI recommendation, then the summary. Calls onEvent(event)
+// for every line and resolves once the stream ends; rejects if the request
+// fails or the server sends an {"type": "error"} event.
+export const streamRecommendations = async (userPrefs, onEvent) => {
+  const res = await fetch(`${API_BASE}/recommendations/stream/`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(userPrefs),
+  });
+  if (!res.ok || !res.body) {
+    throw new Error(`Stream request failed (${res.status})`);
+  }
+  const handle = (line) => {
+    const event = JSON.parse(line);
+    if (event.type === 'error') {
+      throw new Error(event.error || 'Recommendations stream failed');
+    }
+    onEvent(event);
+  };
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  try {
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop();
+      lines.filter((line) => line.trim()).forEach(handle);
+    }
+    if (buffer.trim()) handle(buffer);
+  } catch (err) {
+    reader.cancel().catch(() => {});
+    throw err;
+  }
+};
 
 export const getDestinationDetails = (destinationName, userPrefs) =>
-  api.post('/destination-details/', {
+  api.post('/async/destination-details/', {
     destination_name: destinationName,
     user_prefs: userPrefs,
   });
 
 export const getLocationSuggestions = (query) =>
-  api.get('/location-suggestions/', { params: { q: query } });
+  api.get('/async/location-suggestions/', { params: { q: query } });
 
 export const checkHealth = () =>
   api.get('/health/');
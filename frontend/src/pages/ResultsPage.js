@@ -252,6 +252,17 @@ const ResultsPage = ({ recommendations, userPrefs, setSelectedDestination }) =>
                             <span>{recommendations.ai_summary}</span>
                         </div>
                     )}
+
+                    {recommendations.streaming && (
+                        <p style={{ marginTop: '1rem', fontSize: '0.9rem', color: 'rgba(255,255,255,0.85)', fontFamily: 'Inter, sans-serif' }}>
+                            ✨ Personalizing with AI — these picks will update in a moment...
+                        </p>
+                    )}
+                    {recommendations.stream_error && (
+                        <p style={{ marginTop: '1rem', fontSize: '0.9rem', color: 'rgba(255,255,255,0.85)', fontFamily: 'Inter, sans-serif' }}>
+                            ⚠️ {recommendations.stream_error}
+                        </p>
+                    )}
                 </div>
             </div>
 
@@ -1,6 +1,6 @@
 import React, { useState, useEffect, useRef, useCallback } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { getRecommendations, getLocationSuggestions } from '../api';
+import { getRecommendations, streamRecommendations, getLocationSuggestions } from '../api';
 
 const CURRENCIES = [
     { code: 'INR', symbol: '₹', name: 'Indian Rupee' },
@@ -53,6 +53,10 @@ const STEPS = [
     { id: 9, label: 'Style', icon: '🎨' },
 ];
 
+// Streamed AI picks replace the instant static ones once this many have
+// arrived (or the stream is done), so the results never shrink to one card
+const AI_SWAP_MIN_RECS = 3;
+
 const TripPlannerPage = ({ setRecommendations, setUserPrefs }) => {
     const navigate = useNavigate();
     const [currentStep, setCurrentStep] = useState(1);
@@ -152,9 +156,57 @@ const TripPlannerPage = ({ setRecommendations, setUserPrefs }) => {
                 num_days: parseInt(formData.num_days),
             };
             setUserPrefs(payload);
-            const res = await getRecommendations(payload);
-            setRecommendations(res.data);
-            navigate('/results');
+            let shown = false;
+            let aiRecs = [];
+            try {
+                await streamRecommendations(payload, (event) => {
+                    if (event.type === 'fallback') {
+                        // Instant static picks — show the results page right away
+                        setRecommendations({
+                            success: true,
+                            user_prefs: payload,
+                            recommendations: event.recommendations,
+                            ai_summary: event.ai_summary,
+                            streaming: true,
+                        });
+                        shown = true;
+                        navigate('/results');
+                    } else if (event.type === 'recommendation') {
+                        aiRecs = [...aiRecs, { ...event.recommendation, id: aiRecs.length + 1 }];
+                        if (aiRecs.length >= AI_SWAP_MIN_RECS) {
+                            const recs = aiRecs;
+                            setRecommendations((prev) => ({ ...prev, recommendations: recs }));
+                        }
+                    } else if (event.type === 'summary') {
+                        setRecommendations((prev) => ({ ...prev, ai_summary: event.ai_summary }));
+                    } else if (event.type === 'done') {
+                        // A short AI list replaces the static picks only if the AI
+                        // answer completed (source 'ai' or 'cache')
+                        const recs = event.source !== 'fallback' && aiRecs.length ? aiRecs : null;
+                        setRecommendations((prev) => ({
+                            ...prev,
+                            ...(recs ? { recommendations: recs } : {}),
+                            streaming: false,
+                            ip_location: event.ip_location,
+                        }));
+                    }
+                });
+                // Ended without a 'done' event (connection dropped)
+                setRecommendations((prev) => (prev && prev.streaming ? { ...prev, streaming: false } : prev));
+            } catch (streamErr) {
+                if (shown) {
+                    // Keep whatever already arrived, but say the AI picks didn't
+                    setRecommendations((prev) => ({
+                        ...prev,
+                        streaming: false,
+                        stream_error: 'AI picks could not be loaded right now — showing our curated matches instead.',
+                    }));
+                    return;
+                }
+                const res = await getRecommendations(payload);
+                setRecommendations(res.data);
+                navigate('/results');
+            }
         } catch (err) {
             setError('Failed to get recommendations. Please ensure the backend server is running.');
             setLoading(false);
@@ -0,0 +1,20 @@
+"""
+Gunicorn settings — picked up automatically from the project root.
+
+preload_app imports Django once in the master process. when_ready then loads
+the static fallback data (destination catalog, festivals) there as well, so
+every forked worker shares those pages copy-on-write instead of parsing its
+own copy on first use.
+"""
+
+import gc
+
+preload_app = True
+
+
+def when_ready(server):
+    from recommendations.ai_service import warm_static_data
+    warm_static_data()
+    # Move everything allocated so far out of the cyclic GC's reach: its
+    # bookkeeping writes would otherwise un-share the preloaded pages
+    gc.freeze()
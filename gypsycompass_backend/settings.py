@@ -110,3 +110,96 @@ GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
 
 # Excel file path for local storing of user data (Ignored by Git)
 USER_DATA_EXCEL = BASE_DIR / 'user_data.xlsx'
+# Trip requests are appended here and moved into USER_DATA_EXCEL by
+# `manage.py compact_user_data`; fsync at most once per interval (seconds)
+USER_DATA_JOURNAL = BASE_DIR / 'user_data.jsonl'
+USER_DATA_JOURNAL_FSYNC_INTERVAL = float(os.getenv('USER_DATA_JOURNAL_FSYNC_INTERVAL', 1.0))
+
+# Client IP → location for trip analytics (see recommendations/geoip.py): an
+# offline range database built by `manage.py import_geoip`, cached per process.
+# GEOIP_ENRICHER ('' to disable) fills offline misses over HTTP in the background.
+GEOIP_DATABASE = BASE_DIR / 'recommendations' / 'data' / 'geoip.npz'
+GEOIP_RESOLVER = os.getenv('GEOIP_RESOLVER', 'recommendations.geoip.OfflineResolver')
+GEOIP_ENRICHER = os.getenv('GEOIP_ENRICHER', 'recommendations.geoip.IpapiResolver')
+GEOIP_CACHE_TTL = int(os.getenv('GEOIP_CACHE_TTL', 24 * 3600))
+GEOIP_CACHE_MAX_ENTRIES = int(os.getenv('GEOIP_CACHE_MAX_ENTRIES', 10000))
+# Addresses nobody could locate are retried after this many seconds
+GEOIP_NEGATIVE_CACHE_TTL = int(os.getenv('GEOIP_NEGATIVE_CACHE_TTL', 300))
+
+# Rows fetched per database round trip by the TripRequest export
+# (manage.py export_trip_requests, /api/export/trip-requests/)
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+
+# Trip request analytics (TripRequest rows + journal lines) are written behind
+# the request by one thread per process: a batch every max_batch records or
+# flush_interval seconds. At most max_size records wait; beyond that the
+# overflow policy drops the oldest ('drop_oldest') or the newest ('drop_newest').
+ANALYTICS_WRITE_BEHIND = {
+    'max_batch': int(os.getenv('ANALYTICS_FLUSH_BATCH', 100)),
+    'flush_interval': float(os.getenv('ANALYTICS_FLUSH_INTERVAL', 0.5)),
+    'max_size': int(os.getenv('ANALYTICS_QUEUE_MAX_SIZE', 10000)),
+    'overflow': os.getenv('ANALYTICS_QUEUE_OVERFLOW', 'drop_oldest'),
+}
+
+# Response cache in front of Gemini ('memory' per process, or 'sqlite' shared per host)
+AI_CACHE_BACKEND = os.getenv('AI_CACHE_BACKEND', 'memory')
+AI_CACHE_PATH = BASE_DIR / 'ai_cache.sqlite3'
+AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL', 6 * 3600))
+AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', 500))
+
+# Destination details: served fresh for FRESH_TTL, then served stale (while a
+# background refresh runs) until FRESH_TTL + STALE_TTL
+AI_DETAILS_FRESH_TTL = int(os.getenv('AI_DETAILS_FRESH_TTL', 24 * 3600))
+AI_DETAILS_STALE_TTL = int(os.getenv('AI_DETAILS_STALE_TTL', 7 * 24 * 3600))
+
+# Hedging: seconds to wait for Gemini before answering with the static fallback
+# (0 = wait indefinitely). Late AI results are still cached for the next request.
+AI_DEADLINES = {
+    'recommendations': float(os.getenv('AI_RECOMMENDATIONS_DEADLINE', 20)),
+    'details': float(os.getenv('AI_DETAILS_DEADLINE', 15)),
+}
+AI_MAX_CONCURRENCY = int(os.getenv('AI_MAX_CONCURRENCY', 16))
+
+# Circuit breaker around Gemini (see recommendations/circuit_breaker.py)
+AI_CIRCUIT_BREAKER = {
+    'window': int(os.getenv('AI_BREAKER_WINDOW', 20)),
+    'min_calls': int(os.getenv('AI_BREAKER_MIN_CALLS', 5)),
+    'failure_threshold': float(os.getenv('AI_BREAKER_FAILURE_THRESHOLD', 0.5)),
+    'open_seconds': float(os.getenv('AI_BREAKER_OPEN_SECONDS', 30)),
+    'probe_timeout': float(os.getenv('AI_BREAKER_PROBE_TIMEOUT', 120)),
+    'timeout_ceiling': float(os.getenv('AI_BREAKER_TIMEOUT_CEILING', 60)),
+}
+
+# Per-use-case Gemini call overrides, merged over CALL_POLICIES in
+# recommendations/ai_service.py (model, grounding, max_output_tokens, temperature)
+AI_CALL_POLICIES = {
+    'recommendations': {'model': os.getenv('GEMINI_RECOMMENDATIONS_MODEL', 'gemini-2.0-flash')},
+    'details': {'model': os.getenv('GEMINI_DETAILS_MODEL', 'gemini-2.0-flash')},
+    'suggestions': {'model': os.getenv('GEMINI_SUGGESTIONS_MODEL', 'gemini-2.0-flash-lite')},
+}
+
+# Static recommender tie-break: seeded from the request (identical prefs →
+# identical output) or random per call
+AI_FALLBACK_DETERMINISTIC = os.getenv('AI_FALLBACK_DETERMINISTIC', 'true').lower() == 'true'
+# Precomputed fallback answers for common requests (manage.py materialize_fallback);
+# rebuilt automatically when the catalog changes
+AI_FALLBACK_GRID_PATH = BASE_DIR / 'fallback_grid.npz'
+
+# Location autocomplete: per-process prefix cache size, and how long browsers /
+# CDNs may reuse an answer (PARTIAL_MAX_AGE when it had fewer than 6 places and
+# Gemini may still be filling the prefix in)
+AI_SUGGESTIONS_CACHE_MAX_ENTRIES = int(os.getenv('AI_SUGGESTIONS_CACHE_MAX_ENTRIES', 4096))
+AI_SUGGESTIONS_MAX_AGE = int(os.getenv('AI_SUGGESTIONS_MAX_AGE', 3600))
+AI_SUGGESTIONS_PARTIAL_MAX_AGE = int(os.getenv('AI_SUGGESTIONS_PARTIAL_MAX_AGE', 60))
+# Seconds between applying origin popularity to autocomplete rankings; each
+# re-ranking empties the suggestion cache
+AI_SUGGESTIONS_RERANK_INTERVAL = float(os.getenv('AI_SUGGESTIONS_RERANK_INTERVAL', 300))
+
+# Batch recommendations (POST /api/recommendations/batch/): most entries per
+# request (static / with "ai": true), and Gemini calls a single batch may
+# have in flight at once. Callers are staff users or send one of
+# BATCH_API_KEYS (comma-separated) as X-API-Key.
+AI_BATCH_MAX_ITEMS = int(os.getenv('AI_BATCH_MAX_ITEMS', 500))
+AI_BATCH_MAX_AI_ITEMS = int(os.getenv('AI_BATCH_MAX_AI_ITEMS', 20))
+AI_BATCH_CONCURRENCY = int(os.getenv('AI_BATCH_CONCURRENCY', 4))
+BATCH_API_KEYS = [k.strip() for k in os.getenv('BATCH_API_KEYS', '').split(',') if k.strip()]
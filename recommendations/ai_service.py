@@ -2,8 +2,10 @@
 GypsyCompass AI Service
 =======================
 Uses the NEW google-genai v1.x SDK (not the deprecated google-generativeai).
-Reads GEMINI_API_KEY directly from os.environ / .env on every request,
-so no server restart is needed after adding the key.
+One GeminiAIService (and one pooled genai.Client) lives per worker process.
+Every request re-checks the .env mtime and GEMINI_API_KEY, and the client is
+only rebuilt when one of them actually changed — so no server restart is
+needed after adding the key, but nothing is reloaded when it hasn't.
 
 To enable AI: put your real key in .env:
     GEMINI_API_KEY=AIzaSy...
@@ -11,14 +13,27 @@ Get a free key at: https://aistudio.google.com/app/apikey
 """
 
 import os
+import asyncio
 import json
 import re
-import random
+import threading
+import time
 import traceback
 import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from pathlib import Path
 from dotenv import load_dotenv
 from google.genai import types
 
+from django.conf import settings
+
+from .cache_service import build_cache, recommendations_cache_key, details_cache_key, ranking_seed, swappable_name
+from .singleflight import SingleFlight, AsyncSingleFlight, prompt_key
+from .json_stream import JSONStreamParser, extract_json
+from .circuit_breaker import CircuitBreaker
+from .autocomplete import Autocomplete, SuggestionCache, fold as fold_location
+
 # ── Ensure console output handles Unicode (Crucial for ₹ symbol on Windows) ──
 try:
     if sys.stdout.encoding.lower() != 'utf-8':
@@ -26,8 +41,17 @@ try:
 except:
     pass
 
-# ── Load .env on every import so key changes reflect instantly ──
-load_dotenv(override=True)
+# ── .env lives next to manage.py (same place settings.py loads it from) ──
+ENV_PATH = Path(__file__).resolve().parent.parent / '.env'
+load_dotenv(ENV_PATH, override=True)
+
+
+def _env_file_mtime():
+    """Return the .env modification time, or None if the file is missing."""
+    try:
+        return ENV_PATH.stat().st_mtime_ns
+    except OSError:
+        return None
 
 
 def _read_api_key():
@@ -49,6 +73,40 @@ def _build_genai_client(api_key):
         return None
 
 
+GEMINI_MODEL = 'gemini-2.0-flash'
+GEMINI_LITE_MODEL = 'gemini-2.0-flash-lite'
+
+# Per-use-case call policy. Google Search grounding adds search round trips
+# (and can't be combined with a response schema), so only the prompts that
+# need live facts — prices, festivals, travel times — use it. Override any
+# field per kind with settings.AI_CALL_POLICIES.
+CALL_POLICIES = {
+    'recommendations': {
+        'model': GEMINI_MODEL, 'grounding': True,
+        'max_output_tokens': 8192, 'temperature': 0.8, 'response_schema': None,
+    },
+    'details': {
+        'model': GEMINI_MODEL, 'grounding': True,
+        'max_output_tokens': 4096, 'temperature': 0.4, 'response_schema': None,
+    },
+    'suggestions': {
+        'model': GEMINI_LITE_MODEL, 'grounding': False,
+        'max_output_tokens': 256, 'temperature': 0.2, 'response_schema': list[str],
+    },
+    'default': {
+        'model': GEMINI_MODEL, 'grounding': True,
+        'max_output_tokens': None, 'temperature': None, 'response_schema': None,
+    },
+}
+
+
+def call_policy(kind):
+    """CALL_POLICIES[kind] with any settings.AI_CALL_POLICIES overrides applied."""
+    policy = dict(CALL_POLICIES.get(kind, CALL_POLICIES['default']))
+    policy.update(getattr(settings, 'AI_CALL_POLICIES', {}).get(kind, {}))
+    return policy
+
+
 # ─────────────────────────────────────────────────────────
 #  CURRENCY CONVERSIONS  (INR base — fallback database is in INR)
 # ─────────────────────────────────────────────────────────
@@ -63,10 +121,19 @@ CURRENCY_TO_INR = {
     'MYR': 19,
 }
 
+# Trip cost multiplier per travel medium (anything else costs like 'any')
+MEDIUM_MULTIPLIERS = {
+    'any': 0.60,
+    'bus': 0.50,
+    'train': 0.55,
+    'flight': 0.85,
+    'travel_agency': 1.30,
+}
+
 # ─────────────────────────────────────────────────────────
 #  STYLE ALIASES: Frontend label → backend destination tags
 #  This bridges the gap between TripPlannerPage style names
-#  and the tags used in ALL_DESTINATIONS.
+#  and the tags used in data/destinations.json.
 # ─────────────────────────────────────────────────────────
 STYLE_ALIASES = {
     # Frontend name (lowercased)       → list of backend tags that match
@@ -93,649 +160,138 @@ STYLE_ALIASES = {
     'food & culinary':                  ['food & culinary'],
 }
 
-def _normalize_style(style: str) -> set:
-    """Convert a user-selected style to a set of backend tags it should match."""
-    s = style.lower().strip()
-    if s in STYLE_ALIASES:
-        return set(STYLE_ALIASES[s])
-    # Fallback: return self + try word-level matching
-    return {s}
-
 
 # ─────────────────────────────────────────────────────────
-#  FULL DESTINATION DATABASE  (fallback when AI unavailable)
+#  STATIC DATA  (fallback when AI unavailable)
+#  Destinations and festivals live in recommendations/data/*.json and are
+#  loaded on first fallback use, so a worker that Gemini serves end to end
+#  never parses them. With gunicorn preload_app they are loaded once in the
+#  master instead (see gunicorn.conf.py) and shared copy-on-write.
 # ─────────────────────────────────────────────────────────
-ALL_DESTINATIONS = [
-    # BEACH / COASTAL
-    {
-        "name": "Goa", "location": "Goa, India",
-        "tagline": "Sun, sand & sea — India's beach capital",
-        "styles": ["beaches", "water-based", "city life", "adventure", "food & culinary", "waterfalls"],
-        "base_cost": 10000, "cost_per_day": 2500,
-        "distance": "~600 km from Mumbai", "travel_time": "1 hr by flight",
-        "highlight": "Calangute & Baga Beach, Dudhsagar Falls, Old Goa Churches",
-        "image_keyword": "goa beach sunset palm trees waves",
-        "famous_for": "Beaches, nightlife, seafood, and Portuguese architecture",
-    },
-    {
-        "name": "Andaman Islands", "location": "Port Blair, Andaman & Nicobar",
-        "tagline": "Crystal waters, pristine beaches, and untouched nature",
-        "styles": ["beaches", "islands", "water-based", "adventure", "nature & landscape", "heritage sites"],
-        "base_cost": 25000, "cost_per_day": 4000,
-        "distance": "~1200 km from Chennai (by air)", "travel_time": "2.5 hrs by flight",
-        "highlight": "Radhanagar Beach, Havelock Island, scuba diving, Cellular Jail",
-        "image_keyword": "andaman beach clear turquoise water coral island",
-        "famous_for": "Scuba diving, pristine beaches, and bioluminescent bays",
-    },
-    {
-        "name": "Lakshadweep", "location": "Kavaratti, Lakshadweep",
-        "tagline": "India's hidden paradise — coral islands and lagoons",
-        "styles": ["beaches", "islands", "water-based", "nature & landscape"],
-        "base_cost": 30000, "cost_per_day": 5000,
-        "distance": "~400 km from Kochi (by sea/air)", "travel_time": "1.5 hrs by flight",
-        "highlight": "Agatti Island, lagoon snorkeling, glass-bottom boat rides",
-        "image_keyword": "lakshadweep lagoon coral reef turquoise island",
-        "famous_for": "Coral reefs, crystal lagoons, and marine biodiversity",
-    },
-    {
-        "name": "Pondicherry", "location": "Puducherry, India",
-        "tagline": "French charm meets Indian soul by the Bay of Bengal",
-        "styles": ["beaches", "culture & heritage", "heritage sites", "city life", "food & culinary", "museums & arts"],
-        "base_cost": 5000, "cost_per_day": 1500,
-        "distance": "~150 km from Chennai", "travel_time": "3 hrs by bus/train",
-        "highlight": "Promenade Beach, Auroville, French Quarter, Sri Aurobindo Ashram",
-        "image_keyword": "pondicherry french quarter beach colorful streets",
-        "famous_for": "French architecture, spiritual retreats, and beach cafes",
-    },
-    {
-        "name": "Varkala", "location": "Varkala, Kerala",
-        "tagline": "Cliff-top beach paradise in God's Own Country",
-        "styles": ["beaches", "nature & landscape", "temples & spiritual", "backwaters & lakes"],
-        "base_cost": 7000, "cost_per_day": 1800,
-        "distance": "~55 km from Thiruvananthapuram", "travel_time": "1.5 hrs",
-        "highlight": "Varkala Cliff, Papanasam Beach, Janardanaswamy Temple",
-        "image_keyword": "varkala cliff beach kerala sunset",
-        "famous_for": "Red laterite cliffs, beach yoga, and Ayurvedic treatments",
-    },
+_static_lock = threading.Lock()
+_catalog = None
+_festivals = None
+_autocomplete = None
+_suggestion_cache = None
+_fallback_grid = None
+_fallback_grid_checked = False
+
+
+def get_catalog():
+    """Destination catalog (NumPy columns + style index), loaded on first use."""
+    global _catalog
+    if _catalog is None:
+        with _static_lock:
+            if _catalog is None:
+                # NumPy is imported here, not at module load
+                from .catalog import Catalog, load_data
+                hubs = [p for p in load_data('places.json') if p.get('hub')]
+                _catalog = Catalog(load_data('destinations.json'), STYLE_ALIASES, hubs=hubs)
+    return _catalog
+
+
+def get_festivals():
+    """FestivalIndex (by destination name and by month), loaded on first use."""
+    global _festivals
+    if _festivals is None:
+        with _static_lock:
+            if _festivals is None:
+                from .catalog import load_data
+                from .festival_index import FestivalIndex
+                data = load_data('festivals.json')
+                _festivals = FestivalIndex(data['destinations'], data['default'])
+    return _festivals
+
+
+def get_autocomplete():
+    """Location autocomplete index over data/places.json, built on first use."""
+    global _autocomplete
+    if _autocomplete is None:
+        with _static_lock:
+            if _autocomplete is None:
+                from .catalog import load_data
+                _autocomplete = Autocomplete.from_places(
+                    load_data('places.json'),
+                    rerank_interval=getattr(settings, 'AI_SUGGESTIONS_RERANK_INTERVAL', 300),
+                )
+    return _autocomplete
 
-    # MOUNTAINS / HILL STATIONS
-    {
-        "name": "Manali", "location": "Manali, Himachal Pradesh",
-        "tagline": "Snow-capped peaks, pine forests, and mountain magic",
-        "styles": ["mountains", "hill stations", "adventure", "nature & landscape", "snow"],
-        "base_cost": 12000, "cost_per_day": 2500,
-        "distance": "~540 km from Delhi", "travel_time": "12 hrs bus or 1.5 hrs flight",
-        "highlight": "Rohtang Pass, Solang Valley skiing, Hadimba Temple, Old Manali",
-        "image_keyword": "manali mountains snow river himachal pradesh",
-        "famous_for": "Snow sports, scenic beauty, and adventure activities",
-    },
-    {
-        "name": "Shimla", "location": "Shimla, Himachal Pradesh",
-        "tagline": "The Queen of Hills — colonial charm in the Himalayas",
-        "styles": ["hill stations", "mountains", "culture & heritage", "nature & landscape"],
-        "base_cost": 10000, "cost_per_day": 2000,
-        "distance": "~370 km from Delhi", "travel_time": "8 hrs by bus",
-        "highlight": "The Ridge, Jakhu Temple, Christ Church, Mall Road",
-        "image_keyword": "shimla hill station colonial town himachal",
-        "famous_for": "Toy train ride, colonial architecture, and apple orchards",
-    },
-    {
-        "name": "Leh Ladakh", "location": "Leh, Ladakh",
-        "tagline": "The roof of India — otherworldly landscapes and monasteries",
-        "styles": ["mountains", "adventure", "nature & landscape", "culture & heritage", "snow"],
-        "base_cost": 20000, "cost_per_day": 3500,
-        "distance": "~1000 km from Delhi", "travel_time": "1.5 hrs by flight",
-        "highlight": "Pangong Lake, Nubra Valley, Khardung La Pass, Thiksey Monastery",
-        "image_keyword": "ladakh pangong lake monastery mountain desert",
-        "famous_for": "Monastery treks, Pangong Lake, and high-altitude adventures",
-    },
-    {
-        "name": "Darjeeling", "location": "Darjeeling, West Bengal",
-        "tagline": "Tea gardens, toy trains, and Himalayan sunrises",
-        "styles": ["hill stations", "nature & landscape", "culture & heritage"],
-        "base_cost": 10000, "cost_per_day": 2000,
-        "distance": "~600 km from Kolkata", "travel_time": "12 hrs by train",
-        "highlight": "Tiger Hill sunrise, Batasia Loop, tea estate tours, Himalayan Railway",
-        "image_keyword": "darjeeling tea plantation himalayan sunrise kanchenjunga",
-        "famous_for": "Darjeeling tea, UNESCO toy train, and Kanchenjunga views",
-    },
-    {
-        "name": "Munnar", "location": "Munnar, Kerala",
-        "tagline": "Rolling tea hills and misty valleys of Kerala",
-        "styles": ["hill stations", "nature & landscape", "forests & wildlife", "waterfalls", "backwaters & lakes"],
-        "base_cost": 8000, "cost_per_day": 1800,
-        "distance": "~580 km from Chennai", "travel_time": "9 hrs by bus",
-        "highlight": "Tea Museum, Eravikulam National Park, Mattupetty Dam, Attukal Waterfalls",
-        "image_keyword": "munnar tea plantation hills mist kerala green",
-        "famous_for": "Tea and spice plantations, Neelakurinji flowers, wildlife",
-    },
-    {
-        "name": "Ooty (Udhagamandalam)", "location": "Ooty, Tamil Nadu",
-        "tagline": "Queen of Hill Stations in the Nilgiris",
-        "styles": ["hill stations", "nature & landscape", "forests & wildlife"],
-        "base_cost": 5000, "cost_per_day": 1500,
-        "distance": "~560 km from Chennai", "travel_time": "8 hrs by bus",
-        "highlight": "Ooty Lake, Botanical Gardens, Doddabetta Peak, Nilgiri Mountain Railway",
-        "image_keyword": "ooty nilgiris hill station botanical garden lake",
-        "famous_for": "Nilgiri Mountain Railway, rose gardens, and Toda villages",
-    },
-    {
-        "name": "Kodaikanal", "location": "Kodaikanal, Tamil Nadu",
-        "tagline": "Princess of Hill Stations — misty lakes and ancient forests",
-        "styles": ["hill stations", "nature & landscape", "forests & wildlife", "backwaters & lakes", "waterfalls"],
-        "base_cost": 5000, "cost_per_day": 1400,
-        "distance": "~460 km from Chennai", "travel_time": "7 hrs by bus",
-        "highlight": "Kodai Lake, Coaker's Walk, Pillar Rocks, Bryant Park, Pine Forest",
-        "image_keyword": "kodaikanal lake mist hill station tamil nadu green",
-        "famous_for": "Star-shaped lake, homemade chocolates, eucalyptus forests, and sunrise from Dolphin's Nose",
-    },
-    {
-        "name": "Yelagiri", "location": "Yelagiri Hills, Tamil Nadu",
-        "tagline": "Peaceful hill retreat just 3 hours from Chennai",
-        "styles": ["hill stations", "nature & landscape", "adventure"],
-        "base_cost": 3000, "cost_per_day": 1000,
-        "distance": "~230 km from Chennai", "travel_time": "3.5 hrs by bus",
-        "highlight": "Yelagiri Lake, Swami Malai Hills trek, Nature Park, 14-hairpin bend road",
-        "image_keyword": "yelagiri hills lake tamil nadu green peaceful",
-        "famous_for": "Budget-friendly weekend getaway, paragliding, trekking, rose garden",
-    },
-    {
-        "name": "Yercaud", "location": "Yercaud, Tamil Nadu",
-        "tagline": "The Jewel of the South — serene coffee plantations and lakes",
-        "styles": ["hill stations", "nature & landscape"],
-        "base_cost": 3500, "cost_per_day": 1000,
-        "distance": "~360 km from Chennai", "travel_time": "5 hrs by bus",
-        "highlight": "Yercaud Lake, Lady's Seat viewpoint, Bear's Cave, Killiyur Falls",
-        "image_keyword": "yercaud lake coffee plantation hill station salem",
-        "famous_for": "Coffee plantations, serene lake, orange groves, and Shevaroy Temple",
-    },
-    {
-        "name": "Coorg (Kodagu)", "location": "Coorg, Karnataka",
-        "tagline": "Scotland of India — coffee, mist, and waterfalls",
-        "styles": ["hill stations", "nature & landscape", "forests & wildlife", "adventure", "waterfalls", "village/rural tourism"],
-        "base_cost": 7000, "cost_per_day": 1600,
-        "distance": "~490 km from Chennai", "travel_time": "8 hrs by bus",
-        "highlight": "Abbey Falls, Raja's Seat, Dubare Elephant Camp, Namdroling Monastery",
-        "image_keyword": "coorg coffee plantation mist waterfall karnataka green",
-        "famous_for": "Coffee estates, spice plantations, river rafting, and Kodava cuisine",
-    },
-    {
-        "name": "Wayanad", "location": "Wayanad, Kerala",
-        "tagline": "Lush green hills, tribal heritage, and misty mornings",
-        "styles": ["hill stations", "nature & landscape", "forests & wildlife", "adventure", "caves", "backwaters & lakes", "village/rural tourism"],
-        "base_cost": 7000, "cost_per_day": 1600,
-        "distance": "~640 km from Chennai", "travel_time": "10 hrs by bus",
-        "highlight": "Edakkal Caves, Banasura Sagar Dam, Pookode Lake, Chembra Peak trek",
-        "image_keyword": "wayanad hill station mist tea plantation kerala",
-        "famous_for": "Ancient Edakkal cave carvings, bamboo rafting, and spice gardens",
-    },
 
-    {
-        "name": "Mussoorie", "location": "Mussoorie, Uttarakhand",
-        "tagline": "The Queen of Hills with panoramic Himalayan views",
-        "styles": ["hill stations", "mountains", "nature & landscape", "adventure", "waterfalls"],
-        "base_cost": 8000, "cost_per_day": 1800,
-        "distance": "~290 km from Delhi", "travel_time": "6 hrs by road",
-        "highlight": "Kempty Falls, Gun Hill, Lal Tibba, Camel's Back Road",
-        "image_keyword": "mussoorie hill station valley himalayan view uttarakhand",
-        "famous_for": "British-era architecture, Kempty Fall, and Mall Road views",
-    },
-    {
-        "name": "Meghalaya", "location": "Shillong & Cherrapunji, Meghalaya",
-        "tagline": "The abode of clouds — living root bridges and waterfalls",
-        "styles": ["nature & landscape", "adventure", "forests & wildlife", "water-based", "waterfalls", "caves", "village/rural tourism", "backwaters & lakes"],
-        "base_cost": 15000, "cost_per_day": 3000,
-        "distance": "~1600 km from Delhi", "travel_time": "2.5 hrs by flight",
-        "highlight": "Living Root Bridges, Nohkalikai Falls, Mawlynnong (cleanest village), Umiam Lake",
-        "image_keyword": "meghalaya living root bridge waterfall mist green",
-        "famous_for": "World's wettest place, double-decker root bridges, and pristine caves",
-    },
-    {
-        "name": "Spiti Valley", "location": "Kaza, Himachal Pradesh",
-        "tagline": "Middle land between India and Tibet — raw Himalayan beauty",
-        "styles": ["mountains", "adventure", "nature & landscape", "culture & heritage", "heritage sites", "village/rural tourism", "backwaters & lakes"],
-        "base_cost": 18000, "cost_per_day": 3500,
-        "distance": "~450 km from Shimla", "travel_time": "12+ hrs by road",
-        "highlight": "Key Monastery, Chandratal Lake, Kibber Village, fossil sites",
-        "image_keyword": "spiti valley monastery himalaya barren mountain blue sky",
-        "famous_for": "Buddhist monasteries, fossils at world's highest altitude, and star-gazing",
-    },
+def resolve_origin(from_location):
+    """(place name, lat, lon) for a from_location the gazetteer knows, else None."""
+    index = get_autocomplete()
+    text = str(from_location or '')
+    place = index.lookup(text) or index.lookup(text.split(',')[0])
+    if place is None or 'lat' not in place.info:
+        return None
+    return place.info['name'], place.info['lat'], place.info['lon']
+
+
+def get_suggestion_cache():
+    """Per-process prefix cache in front of the autocomplete index."""
+    global _suggestion_cache
+    if _suggestion_cache is None:
+        index = get_autocomplete()
+        with _static_lock:
+            if _suggestion_cache is None:
+                _suggestion_cache = SuggestionCache(
+                    index, limit=6,
+                    max_entries=getattr(settings, 'AI_SUGGESTIONS_CACHE_MAX_ENTRIES', 4096),
+                )
+    return _suggestion_cache
 
-    # DESERTS & HERITAGE
-    {
-        "name": "Jaisalmer", "location": "Jaisalmer, Rajasthan",
-        "tagline": "The Golden City — sand dunes and medieval magic",
-        "styles": ["deserts", "culture & heritage", "heritage sites", "nature & landscape", "adventure"],
-        "base_cost": 10000, "cost_per_day": 2200,
-        "distance": "~570 km from Jaipur", "travel_time": "10 hrs by train",
-        "highlight": "Sam Sand Dunes, Jaisalmer Fort, Patwon Ki Haveli, desert safari",
-        "image_keyword": "jaisalmer golden fort sand dunes desert rajasthan sunset",
-        "famous_for": "Living fort, camel safaris, and Thar Desert sunsets",
-    },
-    {
-        "name": "Rajasthan — Jaipur & Udaipur", "location": "Jaipur & Udaipur, Rajasthan",
-        "tagline": "Royal grandeur, floating palaces, and desert heritage",
-        "styles": ["culture & heritage", "heritage sites", "deserts", "city life", "food & culinary", "museums & arts", "backwaters & lakes"],
-        "base_cost": 14000, "cost_per_day": 2800,
-        "distance": "~280 km from Delhi to Jaipur", "travel_time": "5 hrs by Shatabdi",
-        "highlight": "Hawa Mahal, Amer Fort, City Palace, Lake Pichola, Mehrangarh Fort",
-        "image_keyword": "jaipur pink city hawa mahal udaipur lake palace rajasthan",
-        "famous_for": "Pink City, Lake Palace, blue pottery, and Rajput history",
-    },
-    {
-        "name": "Rann of Kutch", "location": "Bhuj, Gujarat",
-        "tagline": "The Great White Desert — the world's largest salt flat",
-        "styles": ["deserts", "nature & landscape", "culture & heritage", "heritage sites", "village/rural tourism"],
-        "base_cost": 10000, "cost_per_day": 2200,
-        "distance": "~400 km from Ahmedabad", "travel_time": "6 hrs by road",
-        "highlight": "Rann Utsav festival, white salt flats, flamingo colonies, Banni grasslands",
-        "image_keyword": "rann kutch white salt desert gujarat sunset festival",
-        "famous_for": "White Rann at full moon, crafts of the Kutchi artisans, and Rann Utsav",
-    },
-    {
-        "name": "Hampi", "location": "Hampi, Karnataka",
-        "tagline": "Ruins of the Vijayanagara Empire — a UNESCO World Heritage Site",
-        "styles": ["culture & heritage", "heritage sites", "adventure", "nature & landscape", "temples & spiritual"],
-        "base_cost": 6000, "cost_per_day": 1500,
-        "distance": "~350 km from Bangalore", "travel_time": "7 hrs by road or night train",
-        "highlight": "Virupaksha Temple, Vittala Temple Stone Chariot, boulder landscape, banana plantations",
-        "image_keyword": "hampi vijayanagara ruins temple boulders karnataka",
-        "famous_for": "UNESCO ruins, unique boulder landscape, and sunrise views from Matanga Hill",
-    },
-    {
-        "name": "Varanasi", "location": "Varanasi, Uttar Pradesh",
-        "tagline": "The eternal city — ghats, spirituality, and the Ganges",
-        "styles": ["culture & heritage", "heritage sites", "temples & spiritual", "food & culinary", "museums & arts"],
-        "base_cost": 6000, "cost_per_day": 1500,
-        "distance": "~800 km from Delhi", "travel_time": "10 hrs by Shatabdi or 1.5 hrs by flight",
-        "highlight": "Dashashwamedh Ghat Aarti, Kashi Vishwanath Temple, Sarnath, Manikarnika Ghat",
-        "image_keyword": "varanasi ghat ganges aarti ritual sunset spiritual",
-        "famous_for": "Evening Ganga Aarti, boat rides at sunrise, and Banarasi silk sarees",
-    },
-    {
-        "name": "Agra — Taj Mahal & Fatehpur Sikri", "location": "Agra, Uttar Pradesh",
-        "tagline": "One of the Seven Wonders — a monument to eternal love",
-        "styles": ["culture & heritage", "heritage sites", "city life", "food & culinary", "museums & arts"],
-        "base_cost": 5000, "cost_per_day": 1500,
-        "distance": "~200 km from Delhi", "travel_time": "2 hrs by Gatiman Express train",
-        "highlight": "Taj Mahal at sunrise, Agra Fort, Fatehpur Sikri, Mehtab Bagh moonlight view",
-        "image_keyword": "taj mahal agra sunrise reflection marble white",
-        "famous_for": "Taj Mahal, Mughal architecture, and Petha sweet delicacy",
-    },
 
-    # NATURE / WILDLIFE
-    {
-        "name": "Kerala Backwaters", "location": "Alleppey (Alappuzha), Kerala",
-        "tagline": "Float through a network of canals on a traditional houseboat",
-        "styles": ["nature & landscape", "water-based", "backwaters & lakes", "forests & wildlife", "food & culinary", "village/rural tourism"],
-        "base_cost": 12000, "cost_per_day": 3000,
-        "distance": "~85 km from Kochi", "travel_time": "2 hrs by road",
-        "highlight": "Houseboat cruise, Vembanad Lake, Kuttanad paddy fields, snake boat races",
-        "image_keyword": "kerala backwaters houseboat canal coconut palm green",
-        "famous_for": "Houseboat stays, labyrinthine canals, and Nehru Trophy boat race",
-    },
-    {
-        "name": "Sundarbans", "location": "Gosaba, West Bengal",
-        "tagline": "The world's largest mangrove forest — home of the Royal Bengal Tiger",
-        "styles": ["forests & wildlife", "nature & landscape", "adventure"],
-        "base_cost": 8000, "cost_per_day": 1800,
-        "distance": "~100 km from Kolkata", "travel_time": "3 hrs by road + ferry",
-        "highlight": "Tiger spotting, mangrove jungle safari, Sajnekhali Wildlife Sanctuary",
-        "image_keyword": "sundarbans mangrove tiger bengal forest river boat",
-        "famous_for": "Royal Bengal Tiger, UNESCO heritage mangroves, and unique ecosystem",
-    },
-    {
-        "name": "Ranthambore National Park", "location": "Sawai Madhopur, Rajasthan",
-        "tagline": "India's best tiger safari — spot tigers in a medieval fort setting",
-        "styles": ["forests & wildlife", "adventure", "nature & landscape"],
-        "base_cost": 12000, "cost_per_day": 2800,
-        "distance": "~180 km from Jaipur", "travel_time": "3 hrs by road",
-        "highlight": "Tiger jeep safari, Ranthambore Fort, lake-side sighting zones",
-        "image_keyword": "ranthambore tiger safari jeep rajasthan national park",
-        "famous_for": "Most photographed tigers in India, historical fort within park",
-    },
-    {
-        "name": "Jim Corbett National Park", "location": "Ramnagar, Uttarakhand",
-        "tagline": "India's oldest national park — a haven for tigers and elephants",
-        "styles": ["forests & wildlife", "adventure", "nature & landscape"],
-        "base_cost": 10000, "cost_per_day": 2200,
-        "distance": "~280 km from Delhi", "travel_time": "6 hrs by road",
-        "highlight": "Dhikala zone safari, elephant rides, Corbett Museum, Garjiya Devi Temple",
-        "image_keyword": "jim corbett elephant safari tiger forest uttarakhand",
-        "famous_for": "India's oldest tiger reserve, elephant safaris, and birdwatching",
-    },
-    {
-        "name": "Kaziranga National Park", "location": "Golaghat, Assam",
-        "tagline": "UNESCO World Heritage — home to 2/3 of the world's one-horned rhinos",
-        "styles": ["forests & wildlife", "nature & landscape", "adventure"],
-        "base_cost": 12000, "cost_per_day": 2500,
-        "distance": "~250 km from Guwahati", "travel_time": "4 hrs by road",
-        "highlight": "Elephant-back rhino safari, bird watching, tiger sighting, tea estates",
-        "image_keyword": "kaziranga rhino elephant assam national park",
-        "famous_for": "UNESCO World Heritage, highest density of one-horned rhinos",
-    },
+def get_fallback_grid(wait=False):
+    """
+    Materialized fallback grid (see fallback_grid.py), loaded from
+    AI_FALLBACK_GRID_PATH on first use. A missing file, or one built from an
+    older catalog, is rebuilt in the background (right away with wait=True);
+    until then this returns None and the catalog is ranked per request.
+    """
+    global _fallback_grid, _fallback_grid_checked
+    if not getattr(settings, 'AI_FALLBACK_DETERMINISTIC', True):
+        return None  # random tie-breaks can't be materialized
+    if _fallback_grid is None and not _fallback_grid_checked:
+        catalog = get_catalog()
+        from .fallback_grid import FallbackGrid, fingerprint
+        with _static_lock:
+            if not _fallback_grid_checked:
+                _fallback_grid = FallbackGrid.load(
+                    settings.AI_FALLBACK_GRID_PATH, catalog,
+                    fingerprint(catalog, STYLE_ALIASES, MEDIUM_MULTIPLIERS),
+                )
+                _fallback_grid_checked = True
+                if _fallback_grid is None and not wait:
+                    _BACKGROUND.submit(_rebuild_fallback_grid)
+        if _fallback_grid is None and wait:
+            build_fallback_grid()
+    return _fallback_grid
 
-    # ADVENTURE / SPIRITUAL
-    {
-        "name": "Rishikesh", "location": "Rishikesh, Uttarakhand",
-        "tagline": "Adventure capital of India — rafting, yoga, and Ganges",
-        "styles": ["adventure", "temples & spiritual", "nature & landscape", "mountains"],
-        "base_cost": 6000, "cost_per_day": 1500,
-        "distance": "~240 km from Delhi", "travel_time": "5 hrs by road",
-        "highlight": "River rafting, Laxman Jhula, Beatles Ashram, Ganga Aarti at Triveni Ghat",
-        "image_keyword": "rishikesh river rafting ganga bridge spiritual yoga",
-        "famous_for": "Yoga capital of the world, white water rafting, and ashrams",
-    },
-    {
-        "name": "Amritsar", "location": "Amritsar, Punjab",
-        "tagline": "The Golden Temple — a spiritual haven of gold and devotion",
-        "styles": ["temples & spiritual", "culture & heritage", "heritage sites", "food & culinary", "museums & arts"],
-        "base_cost": 6000, "cost_per_day": 1400,
-        "distance": "~460 km from Delhi", "travel_time": "6 hrs by train",
-        "highlight": "Golden Temple (Harmandir Sahib), Wagah Border ceremony, Jallianwala Bagh",
-        "image_keyword": "amritsar golden temple reflection water spiritual sikh",
-        "famous_for": "Golden Temple, langar (free community meal), and Wagah Border",
-    },
-    {
-        "name": "Tirupati & Madurai", "location": "Tirupati, Andhra Pradesh",
-        "tagline": "India's most visited pilgrimage and the city of the Meenakshi Temple",
-        "styles": ["temples & spiritual", "culture & heritage", "heritage sites"],
-        "base_cost": 5000, "cost_per_day": 1200,
-        "distance": "~550 km from Chennai", "travel_time": "1.5 hrs by flight",
-        "highlight": "Venkateswara Temple (world's richest), Meenakshi Amman Temple",
-        "image_keyword": "tirupati temple gopuram south india spiritual",
-        "famous_for": "Tirumala temple, laddu prasadam, and ancient temple architecture",
-    },
 
-    # CITY LIFE
-    {
-        "name": "Mumbai", "location": "Mumbai, Maharashtra",
-        "tagline": "The city that never sleeps — Bollywood, bazaars, and beaches",
-        "styles": ["city life", "culture & heritage", "heritage sites", "food & culinary", "beaches", "museums & arts"],
-        "base_cost": 12000, "cost_per_day": 2800,
-        "distance": "Hub city", "travel_time": "Direct",
-        "highlight": "Marine Drive, Colaba Causeway, Bollywood Studio Tour, Dharavi",
-        "image_keyword": "mumbai marine drive gateway india city skyline night",
-        "famous_for": "Bollywood, street food (vada pav), and marine drive sunsets",
-    },
+def build_fallback_grid(path=None):
+    """Materialize the fallback grid for the current catalog, save it and serve from it."""
+    global _fallback_grid
+    from .fallback_grid import FallbackGrid
+    grid = FallbackGrid.build(get_catalog(), STYLE_ALIASES, MEDIUM_MULTIPLIERS, ranking_seed)
+    grid.save(path or settings.AI_FALLBACK_GRID_PATH)
+    _fallback_grid = grid
+    return grid
 
-    # INTERNATIONAL DESTINATIONS
-    {
-        "name": "Bali, Indonesia", "location": "Bali, Indonesia",
-        "tagline": "Island of the Gods — temples, rice terraces, and surf",
-        "styles": ["beaches", "islands", "temples & spiritual", "nature & landscape", "adventure", "food & culinary"],
-        "base_cost": 35000, "cost_per_day": 6000,
-        "distance": "~4 hrs by flight from major Indian cities", "travel_time": "4 hrs flight",
-        "highlight": "Ubud rice terraces, Tanah Lot Temple, Seminyak Beach, Mount Batur",
-        "image_keyword": "bali rice terrace temple beach indonesia tropical",
-        "famous_for": "Temple ceremonies, rice terraces, surf culture, and yoga retreats",
-        "international": True,
-    },
-    {
-        "name": "Thailand — Bangkok & Phuket", "location": "Thailand",
-        "tagline": "Land of smiles — golden temples, street food, and tropical beaches",
-        "styles": ["beaches", "islands", "culture & heritage", "food & culinary", "city life", "adventure"],
-        "base_cost": 30000, "cost_per_day": 5000,
-        "distance": "~3 hrs from Chennai/Kolkata", "travel_time": "3-4 hrs flight",
-        "highlight": "Grand Palace Bangkok, Phi Phi Islands, Thai street food, elephant sanctuary",
-        "image_keyword": "thailand bangkok temple beach tropical islands",
-        "famous_for": "Vibrant street food, Buddhist temples, and stunning islands",
-        "international": True,
-    },
-    {
-        "name": "Dubai, UAE", "location": "Dubai, UAE",
-        "tagline": "Where the desert meets the sky — luxury and superlatives",
-        "styles": ["city life", "adventure", "culture & heritage", "deserts", "water-based"],
-        "base_cost": 45000, "cost_per_day": 8000,
-        "distance": "~3 hrs from major Indian cities", "travel_time": "3 hrs flight",
-        "highlight": "Burj Khalifa, Dubai Mall, Desert Safari, Palm Jumeirah",
-        "image_keyword": "dubai burj khalifa skyline desert luxury",
-        "famous_for": "World's tallest building, tax-free shopping, and desert safaris",
-        "international": True,
-    },
-    {
-        "name": "Maldives", "location": "Malé, Maldives",
-        "tagline": "Overwater bungalows, coral reefs, and infinite blue",
-        "styles": ["beaches", "islands", "water-based", "nature & landscape"],
-        "base_cost": 60000, "cost_per_day": 10000,
-        "distance": "~3 hrs from South India", "travel_time": "3 hrs flight",
-        "highlight": "Overwater villas, snorkeling with manta rays, bioluminescent beaches",
-        "image_keyword": "maldives overwater bungalow turquoise ocean coral reef",
-        "famous_for": "Most luxurious island getaway with unparalleled marine life",
-        "international": True,
-    },
-    {
-        "name": "Nepal — Kathmandu & Pokhara", "location": "Nepal",
-        "tagline": "Roof of the world — Himalayas, temples, and trekking",
-        "styles": ["mountains", "adventure", "temples & spiritual", "nature & landscape", "snow"],
-        "base_cost": 18000, "cost_per_day": 3000,
-        "distance": "~1.5 hrs from Delhi/Kolkata", "travel_time": "1.5 hrs flight",
-        "highlight": "Everest Base Camp, Boudhanath Stupa, Phewa Lake, Annapurna Circuit",
-        "image_keyword": "nepal himalayas everest monastery kathmandu temple",
-        "famous_for": "Everest, Himalayan trekking, Buddhist culture, and adventure sports",
-        "international": True,
-    },
-    {
-        "name": "Sri Lanka", "location": "Sri Lanka",
-        "tagline": "Pearl of the Indian Ocean — beaches, ruins, and elephants",
-        "styles": ["beaches", "culture & heritage", "heritage sites", "forests & wildlife", "nature & landscape", "temples & spiritual"],
-        "base_cost": 22000, "cost_per_day": 4000,
-        "distance": "~1 hr from Chennai", "travel_time": "1 hr flight",
-        "highlight": "Sigiriya Rock Fortress, Elephant Orphanage, Mirissa beach, Temple of Tooth",
-        "image_keyword": "sri lanka sigiriya rock fortress elephant beach temple",
-        "famous_for": "Ancient ruins, friendly elephants, Ceylon tea, and whale watching",
-        "international": True,
-    },
-    {
-        "name": "Singapore", "location": "Singapore",
-        "tagline": "The Lion City — futuristic, multicultural, and immaculate",
-        "styles": ["city life", "food & culinary", "nature & landscape", "water-based", "museums & arts"],
-        "base_cost": 40000, "cost_per_day": 7000,
-        "distance": "~5 hrs from major Indian cities", "travel_time": "5 hrs flight",
-        "highlight": "Gardens by the Bay, Marina Bay Sands, Sentosa Island, hawker centers",
-        "image_keyword": "singapore marina bay sands garden city skyline night",
-        "famous_for": "Futuristic architecture, legendary hawker food, and Changi airport",
-        "international": True,
-    },
-    {
-        "name": "Vietnam — Hanoi & Ha Long Bay", "location": "Vietnam",
-        "tagline": "Emerald bay, lantern-lit cities, and banh mi paradise",
-        "styles": ["nature & landscape", "culture & heritage", "food & culinary", "adventure", "water-based"],
-        "base_cost": 28000, "cost_per_day": 4500,
-        "distance": "~4 hrs from Delhi", "travel_time": "4 hrs flight",
-        "highlight": "Ha Long Bay cruise, Hoi An Old Town, Hanoi street food, rice terraces",
-        "image_keyword": "vietnam ha long bay boat karst emerald water",
-        "famous_for": "Halong Bay cruises, lantern festivals, French-Vietnamese cuisine",
-        "international": True,
-    },
-    {
-        "name": "Japan — Tokyo & Kyoto", "location": "Tokyo & Kyoto, Japan",
-        "tagline": "Where ancient tradition meets cutting-edge technology",
-        "styles": ["culture & heritage", "heritage sites", "city life", "food & culinary", "temples & spiritual", "museums & arts", "adventure"],
-        "base_cost": 55000, "cost_per_day": 9000,
-        "distance": "~7 hrs by flight", "travel_time": "7 hrs flight",
-        "highlight": "Tokyo Tower, Fushimi Inari Shrine, Mt. Fuji, Shibuya Crossing, Akihabara",
-        "image_keyword": "japan tokyo temple cherry blossom fuji mountain",
-        "famous_for": "Cherry blossoms, sushi & ramen, bullet trains, and ancient temples",
-        "international": True,
-    },
-    {
-        "name": "Turkey — Istanbul & Cappadocia", "location": "Istanbul & Cappadocia, Turkey",
-        "tagline": "Where East meets West — hot air balloons and ancient empires",
-        "styles": ["culture & heritage", "heritage sites", "adventure", "city life", "food & culinary", "museums & arts"],
-        "base_cost": 40000, "cost_per_day": 6500,
-        "distance": "~5 hrs by flight", "travel_time": "5 hrs flight",
-        "highlight": "Hagia Sophia, Cappadocia balloon rides, Blue Mosque, Grand Bazaar",
-        "image_keyword": "turkey cappadocia hot air balloon istanbul mosque",
-        "famous_for": "Hot air balloon rides, Byzantine architecture, Turkish cuisine",
-        "international": True,
-    },
-    {
-        "name": "Greece — Athens & Santorini", "location": "Athens & Santorini, Greece",
-        "tagline": "Whitewashed islands, ancient ruins, and Mediterranean sunsets",
-        "styles": ["beaches", "islands", "culture & heritage", "heritage sites", "city life", "food & culinary"],
-        "base_cost": 50000, "cost_per_day": 8000,
-        "distance": "~7 hrs by flight", "travel_time": "7 hrs flight",
-        "highlight": "Acropolis of Athens, Santorini blue domes, Mykonos nightlife, Meteora monasteries",
-        "image_keyword": "greece santorini blue dome white church mediterranean sea",
-        "famous_for": "Aegean island hopping, ancient Greek ruins, and world-class sunsets",
-        "international": True,
-    },
-    {
-        "name": "Switzerland — Zurich & Interlaken", "location": "Switzerland",
-        "tagline": "The land of Alps, chocolate, and pristine lakes",
-        "styles": ["mountains", "snow", "nature & landscape", "adventure", "backwaters & lakes", "city life"],
-        "base_cost": 70000, "cost_per_day": 12000,
-        "distance": "~8 hrs by flight", "travel_time": "8 hrs flight",
-        "highlight": "Jungfraujoch, Lake Lucerne, Matterhorn, Swiss Alps railway, Interlaken paragliding",
-        "image_keyword": "switzerland alps snow mountain lake zurich green village",
-        "famous_for": "Swiss Alps, chocolate, cheese, luxury watches, and scenic train rides",
-        "international": True,
-    },
-    {
-        "name": "Egypt — Cairo & Luxor", "location": "Cairo & Luxor, Egypt",
-        "tagline": "Land of the Pharaohs — pyramids, temples, and the Nile",
-        "styles": ["culture & heritage", "heritage sites", "deserts", "adventure", "museums & arts"],
-        "base_cost": 35000, "cost_per_day": 5500,
-        "distance": "~5 hrs by flight", "travel_time": "5 hrs flight",
-        "highlight": "Great Pyramids of Giza, Sphinx, Valley of the Kings, Nile cruise, Karnak Temple",
-        "image_keyword": "egypt pyramids giza sphinx desert cairo ancient",
-        "famous_for": "Ancient pyramids, Pharaonic tombs, Nile River cruises, and hieroglyphs",
-        "international": True,
-    },
-    {
-        "name": "Malaysia — Kuala Lumpur & Langkawi", "location": "Malaysia",
-        "tagline": "Twin towers, tropical islands, and a melting pot of cultures",
-        "styles": ["city life", "beaches", "islands", "food & culinary", "nature & landscape", "adventure"],
-        "base_cost": 25000, "cost_per_day": 4000,
-        "distance": "~4 hrs by flight", "travel_time": "4 hrs flight",
-        "highlight": "Petronas Twin Towers, Langkawi Sky Bridge, Batu Caves, Penang street food",
-        "image_keyword": "malaysia kuala lumpur petronas towers langkawi beach tropical",
-        "famous_for": "Twin towers, Langkawi beaches, multicultural food, and rainforest canopy walks",
-        "international": True,
-    },
-    {
-        "name": "Cambodia — Siem Reap", "location": "Siem Reap, Cambodia",
-        "tagline": "Home of Angkor Wat — the world's largest religious monument",
-        "styles": ["culture & heritage", "heritage sites", "temples & spiritual", "adventure", "food & culinary", "village/rural tourism"],
-        "base_cost": 20000, "cost_per_day": 3000,
-        "distance": "~5 hrs by flight", "travel_time": "5 hrs flight (via Bangkok)",
-        "highlight": "Angkor Wat sunrise, Ta Prohm (Tomb Raider temple), Tonle Sap floating village",
-        "image_keyword": "cambodia angkor wat temple ruins sunrise ancient",
-        "famous_for": "Angkor Wat, ancient Khmer ruins, and vibrant pub street nightlife",
-        "international": True,
-    },
-    {
-        "name": "Morocco — Marrakech & Sahara", "location": "Marrakech, Morocco",
-        "tagline": "Vibrant souks, Saharan dunes, and Moroccan magic",
-        "styles": ["deserts", "culture & heritage", "heritage sites", "adventure", "food & culinary", "city life", "village/rural tourism"],
-        "base_cost": 35000, "cost_per_day": 5000,
-        "distance": "~9 hrs by flight", "travel_time": "9 hrs flight",
-        "highlight": "Jemaa el-Fnaa square, Sahara desert camp, Atlas Mountains, Medina of Fez",
-        "image_keyword": "morocco marrakech sahara desert camel medina souk",
-        "famous_for": "Sahara camel treks, colourful medinas, tagine cuisine, and riads",
-        "international": True,
-    },
-    {
-        "name": "South Korea — Seoul & Jeju", "location": "Seoul & Jeju Island, South Korea",
-        "tagline": "K-pop, ancient palaces, and volcanic island beauty",
-        "styles": ["city life", "culture & heritage", "heritage sites", "food & culinary", "nature & landscape", "islands", "museums & arts"],
-        "base_cost": 45000, "cost_per_day": 7500,
-        "distance": "~6 hrs by flight", "travel_time": "6 hrs flight",
-        "highlight": "Gyeongbokgung Palace, Jeju Hallasan, Myeongdong, DMZ tour, Korean BBQ streets",
-        "image_keyword": "south korea seoul palace cherry blossom jeju island",
-        "famous_for": "K-pop culture, Korean BBQ, ancient palaces, and Jeju volcanic island",
-        "international": True,
-    },
-    {
-        "name": "Australia — Sydney & Melbourne", "location": "Sydney & Melbourne, Australia",
-        "tagline": "Opera House, Great Barrier Reef, and endless coastline",
-        "styles": ["city life", "beaches", "nature & landscape", "adventure", "food & culinary", "museums & arts", "forests & wildlife"],
-        "base_cost": 80000, "cost_per_day": 12000,
-        "distance": "~10 hrs by flight", "travel_time": "10 hrs flight",
-        "highlight": "Sydney Opera House, Great Barrier Reef, Twelve Apostles, Blue Mountains",
-        "image_keyword": "australia sydney opera house harbour bridge beach reef",
-        "famous_for": "Sydney Opera House, Great Barrier Reef, unique wildlife, and surf culture",
-        "international": True,
-    },
-    {
-        "name": "New Zealand", "location": "Auckland & Queenstown, New Zealand",
-        "tagline": "Middle-earth landscapes — mountains, fjords, and adventure capital",
-        "styles": ["mountains", "adventure", "nature & landscape", "forests & wildlife", "backwaters & lakes", "snow"],
-        "base_cost": 85000, "cost_per_day": 13000,
-        "distance": "~12 hrs by flight", "travel_time": "12 hrs flight",
-        "highlight": "Milford Sound, Queenstown bungee jump, Hobbiton, Franz Josef Glacier",
-        "image_keyword": "new zealand milford sound mountains fjord green landscape",
-        "famous_for": "Lord of the Rings filming locations, bungee jumping, and pristine fjords",
-        "international": True,
-    },
-    {
-        "name": "Spain — Barcelona & Madrid", "location": "Barcelona & Madrid, Spain",
-        "tagline": "Flamenco, Gaudí, tapas, and Mediterranean vibes",
-        "styles": ["city life", "culture & heritage", "heritage sites", "beaches", "food & culinary", "museums & arts", "adventure"],
-        "base_cost": 55000, "cost_per_day": 8500,
-        "distance": "~9 hrs by flight", "travel_time": "9 hrs flight",
-        "highlight": "Sagrada Familia, Alhambra Palace, Park Güell, La Rambla, Flamenco shows",
-        "image_keyword": "spain barcelona sagrada familia beach mediterranean",
-        "famous_for": "Gaudí's architecture, tapas culture, flamenco, and La Liga football",
-        "international": True,
-    },
-    {
-        "name": "Italy — Rome & Venice", "location": "Rome & Venice, Italy",
-        "tagline": "Eternal city, floating canals, and the birthplace of the Renaissance",
-        "styles": ["culture & heritage", "heritage sites", "city life", "food & culinary", "museums & arts", "backwaters & lakes"],
-        "base_cost": 60000, "cost_per_day": 9500,
-        "distance": "~8 hrs by flight", "travel_time": "8 hrs flight",
-        "highlight": "Colosseum, Venice gondola rides, Vatican City, Trevi Fountain, Leaning Tower of Pisa",
-        "image_keyword": "italy rome colosseum venice canal gondola florence",
-        "famous_for": "Ancient Roman ruins, Venetian canals, pasta & pizza, and Renaissance art",
-        "international": True,
-    },
-    {
-        "name": "Iceland — Reykjavik", "location": "Reykjavik, Iceland",
-        "tagline": "Land of fire and ice — Northern Lights and volcanic wonders",
-        "styles": ["nature & landscape", "adventure", "snow", "mountains", "waterfalls"],
-        "base_cost": 90000, "cost_per_day": 15000,
-        "distance": "~10 hrs by flight", "travel_time": "10 hrs flight (via Europe)",
-        "highlight": "Northern Lights, Blue Lagoon, Golden Circle, Jökulsárlón Glacier Lagoon",
-        "image_keyword": "iceland northern lights waterfall glacier volcanic landscape",
-        "famous_for": "Aurora Borealis, geothermal hot springs, glaciers, and whale watching",
-        "international": True,
-    },
-    {
-        "name": "Mexico — Cancún & Mexico City", "location": "Cancún & Mexico City, Mexico",
-        "tagline": "Ancient Mayan ruins, turquoise Caribbean, and vibrant culture",
-        "styles": ["beaches", "culture & heritage", "heritage sites", "adventure", "food & culinary", "city life"],
-        "base_cost": 50000, "cost_per_day": 7000,
-        "distance": "~20 hrs by flight", "travel_time": "20 hrs flight (with stopover)",
-        "highlight": "Chichén Itzá pyramid, Cancún beaches, Cenote swimming, Street tacos, Lucha Libre",
-        "image_keyword": "mexico cancun beach chichen itza pyramid mayan ruins",
-        "famous_for": "Mayan pyramids, Caribbean beaches, cenotes for diving, and Mexican street food",
-        "international": True,
-    },
-    {
-        "name": "London, UK", "location": "London, United Kingdom",
-        "tagline": "Royal palaces, world-class museums, and British charm",
-        "styles": ["city life", "culture & heritage", "heritage sites", "museums & arts", "food & culinary"],
-        "base_cost": 65000, "cost_per_day": 11000,
-        "distance": "~9 hrs by flight", "travel_time": "9 hrs flight",
-        "highlight": "Big Ben, Tower of London, British Museum, Buckingham Palace, West End shows",
-        "image_keyword": "london big ben tower bridge palace british skyline",
-        "famous_for": "Royal family heritage, free world-class museums, and West End theatre",
-        "international": True,
-    },
-    {
-        "name": "Paris, France", "location": "Paris, France",
-        "tagline": "City of Love — art, fashion, and the Eiffel Tower",
-        "styles": ["city life", "culture & heritage", "heritage sites", "museums & arts", "food & culinary"],
-        "base_cost": 60000, "cost_per_day": 10000,
-        "distance": "~9 hrs by flight", "travel_time": "9 hrs flight",
-        "highlight": "Eiffel Tower, Louvre Museum, Champs-Élysées, Montmartre, Seine cruise",
-        "image_keyword": "paris eiffel tower seine river louvre french architecture",
-        "famous_for": "Eiffel Tower, Louvre art museum, French cuisine, and romantic ambiance",
-        "international": True,
-    },
-]
+
+def _rebuild_fallback_grid():
+    try:
+        build_fallback_grid()
+    except Exception as e:
+        print(f"[AI] Fallback grid rebuild failed: {e}")
+
+
+def warm_static_data():
+    """Load all static data now (called in the gunicorn master before forking)."""
+    get_catalog()
+    get_festivals()
+    get_autocomplete()
+    # Built here rather than in a background thread, which would not survive the fork
+    get_fallback_grid(wait=True)
 
 
 class GeminiAIService:
@@ -744,67 +300,143 @@ class GeminiAIService:
     Falls back to intelligent static matching if no API key is configured.
     """
 
+    _UNSET = object()
+
     def __init__(self):
         self.available = False
         self.client = None
+        self._lock = threading.Lock()
+        self._env_mtime = _env_file_mtime()
+        self._api_key = self._UNSET
+        self._recommendations_cache = None
+        self._details_cache = None
+        self._refreshing = set()
+        self._enriched = set()      # suggestion prefixes already sent to Gemini
+        self._enriching = set()
         self._configure()
 
     def _configure(self):
-        """Re-read API key and initialize client. Called per-request."""
-        load_dotenv(override=True)
+        """
+        Cheap per-request check: reload .env only if its mtime changed, and
+        rebuild the genai client only if the effective API key changed.
+        """
+        env_mtime = _env_file_mtime()
+        if env_mtime != self._env_mtime:
+            with self._lock:
+                if env_mtime != self._env_mtime:
+                    load_dotenv(ENV_PATH, override=True)
+                    self._env_mtime = env_mtime
+
         key = _read_api_key()
-        if key:
-            client = _build_genai_client(key)
+        if key == self._api_key:
+            return
+
+        with self._lock:
+            if key == self._api_key:
+                return
+            client = _build_genai_client(key) if key else None
             if client:
                 self.client = client
                 self.available = True
+                self._api_key = key
                 print(f"[AI] ✅ Gemini AI ready (key: {key[:8]}...)")
                 return
-        self.client = None
-        self.available = False
-        print("[AI] ⚠️  No valid Gemini API key — using smart fallback mode")
-        print("[AI]    Get a free key at: https://aistudio.google.com/app/apikey")
-        print("[AI]    Then add to .env: GEMINI_API_KEY=AIzaSy...")
-
-    def _call_gemini(self, prompt: str) -> str | None:
-        """Call the Gemini model and return raw text, or None on failure."""
+            self.client = None
+            self.available = False
+            self._api_key = key
+            print("[AI] ⚠️  No valid Gemini API key — using smart fallback mode")
+            print("[AI]    Get a free key at: https://aistudio.google.com/app/apikey")
+            print("[AI]    Then add to .env: GEMINI_API_KEY=AIzaSy...")
+
+    def _generation_config(self, kind):
+        policy = call_policy(kind)
+        config = {
+            'max_output_tokens': policy['max_output_tokens'],
+            'temperature': policy['temperature'],
+            'http_options': types.HttpOptions(timeout=int(_BREAKER.suggested_timeout(kind) * 1000)),
+        }
+        if policy['grounding']:
+            config['tools'] = [types.Tool(google_search=types.GoogleSearch())]
+        elif policy['response_schema'] is not None:
+            config['response_mime_type'] = 'application/json'
+            config['response_schema'] = policy['response_schema']
+        return types.GenerateContentConfig(**config)
+
+    def _call_gemini(self, prompt: str, kind: str = 'default') -> str | None:
+        """Call the Gemini model and return raw text, or None on failure / open circuit."""
+        if not _BREAKER.allow_request():
+            print("[AI] 🔌 Gemini circuit open — skipping straight to fallback")
+            return None
+        started = time.monotonic()
         try:
-            from google import genai
             response = self.client.models.generate_content(
-                model='gemini-2.0-flash',
+                model=call_policy(kind)['model'],
                 contents=prompt,
-                config=types.GenerateContentConfig(
-                    tools=[types.Tool(google_search=types.GoogleSearch())]
-                )
+                config=self._generation_config(kind),
             )
-            return response.text
+            text = response.text
         except Exception as e:
-            print(f"[AI] Gemini call error: {e}")
-            traceback.print_exc()
+            _record_gemini_failure(e)
             return None
+        _BREAKER.record_success(time.monotonic() - started, kind)
+        return text
 
-    def _clean_json(self, text: str):
-        """Extract JSON object or array from Gemini response text."""
-        if not text:
+    async def _acall_gemini(self, prompt: str, kind: str = 'default') -> str | None:
+        """Async twin of _call_gemini using the SDK's aio client (no thread held)."""
+        if not _BREAKER.allow_request():
+            print("[AI] 🔌 Gemini circuit open — skipping straight to fallback")
             return None
-        # Strip markdown code fences
-        text = re.sub(r'```json\s*', '', text)
-        text = re.sub(r'```\s*', '', text)
-        text = text.strip()
-        # Direct parse
+        started = time.monotonic()
         try:
-            return json.loads(text)
-        except Exception:
-            pass
-        # Extract largest JSON block
-        for pattern in [r'\{[\s\S]*\}', r'\[[\s\S]*\]']:
-            match = re.search(pattern, text)
-            if match:
-                try:
-                    return json.loads(match.group())
-                except Exception:
-                    pass
-        return None
+            response = await self.client.aio.models.generate_content(
+                model=call_policy(kind)['model'],
+                contents=prompt,
+                config=self._generation_config(kind),
+            )
+            text = response.text
+        except Exception as e:
+            _record_gemini_failure(e)
+            return None
+        except BaseException:
+            # Cancelled: settle the call so a trial one doesn't hold its slot
+            _BREAKER.record_abandoned()
+            raise
+        _BREAKER.record_success(time.monotonic() - started, kind)
+        return text
+
+    def _generate_json(self, prompt: str, kind: str = 'default', expected=dict):
+        """
+        Call Gemini and parse the JSON reply (the first value of type
+        expected). Identical prompts already in flight in this worker are
+        coalesced into one upstream call.
+        Returns (parsed, raw_text); parsed is None if the call or parse failed.
+        """
+        def call():
+            raw = self._call_gemini(prompt, kind)
+            return (self._clean_json(raw, expected) if raw else None), raw
+
+        (parsed, raw), shared = _IN_FLIGHT.do(prompt_key(prompt, kind), call)
+        if shared:
+            print("[AI] 🔗 Joined an identical in-flight Gemini request")
+        return parsed, raw
+
+    async def _agenerate_json(self, prompt: str, kind: str = 'default', expected=dict):
+        """Async twin of _generate_json."""
+        async def call():
+            raw = await self._acall_gemini(prompt, kind)
+            if not raw:
+                return None, raw
+            # Off the event loop: a large or malformed reply must not stall other requests
+            return await asyncio.to_thread(self._clean_json, raw, expected), raw
+
+        (parsed, raw), shared = await _ASYNC_IN_FLIGHT.do(prompt_key(prompt, kind), call)
+        if shared:
+            print("[AI] 🔗 Joined an identical in-flight Gemini request")
+        return parsed, raw
+
+    def _clean_json(self, text: str, expected=dict):
+        """Extract the first JSON value of type expected (dict or list) from Gemini response text."""
+        return extract_json(text, expected)
 
     # ─────────────────────────────────────────────────────────
     #  PUBLIC: RECOMMENDATIONS
@@ -814,20 +446,123 @@ class GeminiAIService:
         """
         Main entry point — returns recommendations dict always.
         Tries real Gemini AI first, falls back to intelligent static matching.
+        Gemini gets AI_DEADLINES['recommendations'] seconds; past that the
+        fallback (computed while Gemini was working) is returned and the AI
+        result is still cached when it lands.
         """
         self._configure()
 
         if self.available:
-            result = self._get_ai_recommendations(user_prefs)
-            if result and result.get('recommendations'):
-                print(f"[AI] ✅ Gemini returned {len(result['recommendations'])} destinations")
+            cache_key = recommendations_cache_key(user_prefs)
+            cached = self._cached_recommendations(cache_key, user_prefs)
+            if cached:
+                return cached
+
+            future = _AI_POOL.submit(self._fetch_ai_recommendations, cache_key, user_prefs)
+            fallback = self._get_fallback_recommendations(user_prefs)
+            deadline = _deadline('recommendations')
+            try:
+                outcome, shared = future.result(timeout=deadline)
+            except FutureTimeout:
+                print(f"[AI] ⏱️  Gemini missed the {deadline}s deadline — serving fallback (AI result will be cached)")
+                return fallback
+            result = self._accept_recommendations(outcome, shared, user_prefs)
+            if result:
                 return result
             print("[AI] Gemini response was empty — falling back to static database")
+            return fallback
 
         return self._get_fallback_recommendations(user_prefs)
 
+    async def aget_travel_recommendations(self, user_prefs: dict) -> dict:
+        """Async twin of get_travel_recommendations for the ASGI views."""
+        self._configure()
+
+        if self.available:
+            cache_key = recommendations_cache_key(user_prefs)
+            cached = self._cached_recommendations(cache_key, user_prefs)
+            if cached:
+                return cached
+
+            task = asyncio.ensure_future(self._afetch_ai_recommendations(cache_key, user_prefs))
+            fallback = self._get_fallback_recommendations(user_prefs)
+            deadline = _deadline('recommendations')
+            try:
+                outcome, shared = await asyncio.wait_for(asyncio.shield(task), timeout=deadline)
+            except asyncio.TimeoutError:
+                print(f"[AI] ⏱️  Gemini missed the {deadline}s deadline — serving fallback (AI result will be cached)")
+                _keep_running(task)
+                return fallback
+            result = self._accept_recommendations(outcome, shared, user_prefs)
+            if result:
+                return result
+            print("[AI] Gemini response was empty — falling back to static database")
+            return fallback
+
+        return self._get_fallback_recommendations(user_prefs)
+
+    def _fetch_ai_recommendations(self, cache_key, user_prefs):
+        """
+        Coalesced Gemini call. Same trip from several travelers at once → one
+        call; the prompt embeds the name, so coalesce on the preferences key.
+        The leader caches the result itself, so it is kept even if every
+        caller has already given up on the deadline.
+        """
+        def call():
+            result = self._get_ai_recommendations(user_prefs)
+            return self._store_recommendations(cache_key, result, user_prefs)
+
+        return _IN_FLIGHT.do(f'recommendations:{cache_key}', call)
+
+    async def _afetch_ai_recommendations(self, cache_key, user_prefs):
+        async def call():
+            result = await self._aget_ai_recommendations(user_prefs)
+            return self._store_recommendations(cache_key, result, user_prefs)
+
+        return await _ASYNC_IN_FLIGHT.do(f'recommendations:{cache_key}', call)
+
+    def _store_recommendations(self, cache_key, result, user_prefs):
+        name = user_prefs.get('name', '')
+        if result and result.get('recommendations'):
+            print(f"[AI] ✅ Gemini returned {len(result['recommendations'])} destinations")
+            self.recommendations_cache.set(cache_key, {'result': result, 'name': name})
+        return result, name
+
+    def _cached_recommendations(self, cache_key, user_prefs):
+        cached = self.recommendations_cache.get(cache_key)
+        if not cached:
+            return None
+        entry, _ = cached
+        print(f"[AI] ⚡ Cache hit — {len(entry['result']['recommendations'])} destinations")
+        return _personalize(entry['result'], entry['name'], user_prefs.get('name'))
+
+    def _accept_recommendations(self, outcome, shared, user_prefs):
+        """Return a usable Gemini result, re-personalized if it was shared from another request."""
+        result, leader_name = outcome
+        if not result or not result.get('recommendations'):
+            return None
+        if shared:
+            print("[AI] 🔗 Shared an identical in-flight recommendations request")
+            return _personalize(result, leader_name, user_prefs.get('name'))
+        return result
+
+    @property
+    def recommendations_cache(self):
+        """TTL/LRU cache of Gemini recommendation results (built on first use)."""
+        if self._recommendations_cache is None:
+            self._recommendations_cache = build_cache('recommendations')
+        return self._recommendations_cache
+
     def _get_ai_recommendations(self, prefs: dict) -> dict | None:
         """Build the prompt and call Gemini for recommendations."""
+        data, raw = self._generate_json(self._recommendations_prompt(prefs), 'recommendations')
+        return self._validate_recommendations(data, raw, prefs)
+
+    async def _aget_ai_recommendations(self, prefs: dict) -> dict | None:
+        data, raw = await self._agenerate_json(self._recommendations_prompt(prefs), 'recommendations')
+        return self._validate_recommendations(data, raw, prefs)
+
+    def _recommendations_prompt(self, prefs: dict) -> str:
         styles = prefs.get('destination_styles', [])
         styles_str = ', '.join(styles) if styles else 'mixed destinations (beaches, mountains, nature, culture)'
         currency = prefs.get('currency', 'INR')
@@ -956,40 +691,356 @@ CRITICAL RULES:
 
 Return ONLY valid minified JSON (no markdown, no code blocks, no explanations):
 {{"recommendations":[{{"id":1,"name":"Destination","location":"City, State/Country","tagline":"Exciting 1-line description","distance_from_start":"{from_loc} to destination distance in km","travel_time":"X hours by {medium}","within_budget":true,"estimated_total_cost":3500,"currency":"{currency}","cost_per_day":1200,"best_for":["Hill Stations","Nature"],"highlight":"Top 3 must-see attractions","image_keyword":"scenic landscape keyword for image search","famous_for":"What makes this place unique and special","transport_cost":"Round-trip {medium} cost from {from_loc}","over_budget_note":null}},...more...],"ai_summary":"Personalized 2-3 line summary for {prefs.get('name','the traveler')} explaining the recommendations."}}"""
+        return prompt
 
-        raw = self._call_gemini(prompt)
+    def _validate_recommendations(self, data, raw, prefs):
+        """Keep only usable recommendations and fill in defaults."""
+        budget = prefs.get('budget', 50000)
+        currency = prefs.get('currency', 'INR')
         if not raw:
             return None
-        data = self._clean_json(raw)
         if not data or 'recommendations' not in data:
             print(f"[AI] Could not parse Gemini response. Raw (first 500 chars): {raw[:500]}")
             return None
         # Validate each recommendation has required fields
-        valid = []
-        for rec in data.get('recommendations', []):
-            if rec.get('name') and rec.get('estimated_total_cost') is not None:
-                rec.setdefault('within_budget', rec.get('estimated_total_cost', 0) <= float(budget))
-                rec.setdefault('currency', currency)
-                rec.setdefault('over_budget_note', None)
-                rec.setdefault('best_for', [])
-                valid.append(rec)
-        data['recommendations'] = valid
+        data['recommendations'] = [
+            rec for rec in data.get('recommendations', [])
+            if _complete_recommendation(rec, budget, currency)
+        ]
         return data
 
+    # ─────────────────────────────────────────────────────────
+    #  PUBLIC: STREAMED RECOMMENDATIONS
+    # ─────────────────────────────────────────────────────────
+    #  Event sequence (one dict per event):
+    #    {"type": "fallback", "recommendations": [...], "ai_summary": "..."}   ← instant
+    #    {"type": "recommendation", "recommendation": {...}}                 ← per AI pick
+    #    {"type": "summary", "ai_summary": "..."}
+    #    {"type": "done", "source": "ai" | "cache" | "fallback", "count": n}
+
+    def stream_travel_recommendations(self, user_prefs: dict):
+        """Generator of progressive recommendation events (see above)."""
+        self._configure()
+        yield self._fallback_event(user_prefs)
+        if not self.available:
+            yield {'type': 'done', 'source': 'fallback', 'count': 0}
+            return
+
+        cache_key = recommendations_cache_key(user_prefs)
+        cached = self._cached_recommendations(cache_key, user_prefs)
+        if cached:
+            yield from _result_events(cached, 'cache')
+            return
+
+        if not _BREAKER.allow_request():
+            print("[AI] 🔌 Gemini circuit open — keeping the static recommendations")
+            yield {'type': 'done', 'source': 'fallback', 'count': 0}
+            return
+
+        parser = JSONStreamParser(array_key='recommendations')
+        chunks = []
+        try:
+            stream = self.client.models.generate_content_stream(
+                model=call_policy('recommendations')['model'],
+                contents=self._recommendations_prompt(user_prefs),
+                config=self._generation_config('recommendations'),
+            )
+            for chunk in stream:
+                text = chunk.text or ''
+                chunks.append(text)
+                yield from self._stream_item_events(parser.feed(text), user_prefs)
+            _BREAKER.record_success()
+        except Exception as e:
+            _record_gemini_failure(e)
+        except BaseException:
+            # Closed mid-stream (client gone): settle the call so a trial
+            # one doesn't hold its slot
+            _BREAKER.record_abandoned()
+            raise
+        yield from self._finish_stream(cache_key, parser.close(), ''.join(chunks), user_prefs)
+
+    async def astream_travel_recommendations(self, user_prefs: dict):
+        """Async generator twin of stream_travel_recommendations."""
+        self._configure()
+        yield self._fallback_event(user_prefs)
+        if not self.available:
+            yield {'type': 'done', 'source': 'fallback', 'count': 0}
+            return
+
+        cache_key = recommendations_cache_key(user_prefs)
+        cached = self._cached_recommendations(cache_key, user_prefs)
+        if cached:
+            for event in _result_events(cached, 'cache'):
+                yield event
+            return
+
+        if not _BREAKER.allow_request():
+            print("[AI] 🔌 Gemini circuit open — keeping the static recommendations")
+            yield {'type': 'done', 'source': 'fallback', 'count': 0}
+            return
+
+        parser = JSONStreamParser(array_key='recommendations')
+        chunks = []
+        try:
+            stream = await self.client.aio.models.generate_content_stream(
+                model=call_policy('recommendations')['model'],
+                contents=self._recommendations_prompt(user_prefs),
+                config=self._generation_config('recommendations'),
+            )
+            async for chunk in stream:
+                text = chunk.text or ''
+                chunks.append(text)
+                for event in self._stream_item_events(parser.feed(text), user_prefs):
+                    yield event
+            _BREAKER.record_success()
+        except Exception as e:
+            _record_gemini_failure(e)
+        except BaseException:
+            # Closed or cancelled mid-stream: settle the call so a trial one
+            # doesn't hold its slot
+            _BREAKER.record_abandoned()
+            raise
+        parsed = await asyncio.to_thread(parser.close)
+        for event in self._finish_stream(cache_key, parsed, ''.join(chunks), user_prefs):
+            yield event
+
+    def _fallback_event(self, user_prefs):
+        fallback = self._get_fallback_recommendations(user_prefs)
+        return {
+            'type': 'fallback',
+            'recommendations': fallback['recommendations'],
+            'ai_summary': fallback['ai_summary'],
+        }
+
+    def _stream_item_events(self, recs, user_prefs):
+        budget = user_prefs.get('budget', 50000)
+        currency = user_prefs.get('currency', 'INR')
+        for rec in recs:
+            if isinstance(rec, dict) and _complete_recommendation(rec, budget, currency):
+                yield {'type': 'recommendation', 'recommendation': rec}
+
+    def _finish_stream(self, cache_key, parsed, raw, user_prefs):
+        """Emit the summary from the full reply and cache it like a regular AI result."""
+        result = self._validate_recommendations(parsed, raw, user_prefs) if raw else None
+        if not result or not result.get('recommendations'):
+            print("[AI] Gemini stream was empty — keeping the static recommendations")
+            yield {'type': 'done', 'source': 'fallback', 'count': 0}
+            return
+        print(f"[AI] ✅ Gemini streamed {len(result['recommendations'])} destinations")
+        self.recommendations_cache.set(cache_key, {'result': result, 'name': user_prefs.get('name', '')})
+        yield {'type': 'summary', 'ai_summary': result.get('ai_summary', '')}
+        yield {'type': 'done', 'source': 'ai', 'count': len(result['recommendations'])}
+
+    # ─────────────────────────────────────────────────────────
+    #  PUBLIC: BATCH RECOMMENDATIONS
+    # ─────────────────────────────────────────────────────────
+
+    def iter_batch_recommendations(self, prefs_list: list, use_ai: bool = True):
+        """
+        Yield (index, result, source) for every entry of prefs_list as it is
+        ready; source is 'ai', 'cache' or 'fallback'. Identical entries are
+        computed once. Static results for the whole batch come from one
+        get_fallback_batch() pass; with Gemini available (and use_ai), cache
+        hits are yielded first and the rest fanned out with at most
+        AI_BATCH_CONCURRENCY calls in flight. An entry whose call fails or
+        misses AI_DEADLINES['recommendations'] gets its static result; the
+        late call keeps its slot until it finishes (its result is still
+        cached), and once every slot is held by such a call the entries
+        still queued get their static results too.
+        """
+        self._configure()
+        groups = {}
+        for i, prefs in enumerate(prefs_list):
+            groups.setdefault(_batch_key(prefs), []).append(i)
+        indexes = list(groups.values())
+        unique = [prefs_list[ix[0]] for ix in indexes]
+        fallbacks = self.get_fallback_batch(unique)
+
+        def emit(u, result, source):
+            for i in indexes[u]:
+                yield i, result, source
+
+        if not (use_ai and self.available):
+            for u, result in enumerate(fallbacks):
+                yield from emit(u, result, 'fallback')
+            return
+
+        queue = deque()
+        for u, prefs in enumerate(unique):
+            cache_key = recommendations_cache_key(prefs)
+            cached = self._cached_recommendations(cache_key, prefs)
+            if cached:
+                yield from emit(u, cached, 'cache')
+            else:
+                queue.append((u, cache_key))
+
+        limit = max(1, getattr(settings, 'AI_BATCH_CONCURRENCY', 4))
+        deadline = _deadline('recommendations')
+        pending = {}       # future → (unique index, started)
+        abandoned = set()  # past the deadline, still running on _AI_POOL
+        while queue or pending:
+            abandoned = {future for future in abandoned if not future.done()}
+            while queue and len(pending) + len(abandoned) < limit:
+                u, cache_key = queue.popleft()
+                future = _AI_POOL.submit(self._fetch_ai_recommendations, cache_key, unique[u])
+                pending[future] = (u, time.monotonic())
+            if not pending:
+                # Every slot is held by a call that already missed its
+                # deadline: Gemini is too slow for the rest to wait on it
+                while queue:
+                    u, _ = queue.popleft()
+                    yield from emit(u, fallbacks[u], 'fallback')
+                break
+            timeout = None
+            if deadline:
+                oldest = min(started for _, started in pending.values())
+                timeout = max(0.0, oldest + deadline - time.monotonic())
+            # With entries queued, a late call finishing frees a slot too
+            watched = pending.keys() | abandoned if queue else pending
+            done, _ = wait(watched, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future not in pending:
+                    continue
+                u, _ = pending.pop(future)
+                try:
+                    outcome, shared = future.result()
+                    result = self._accept_recommendations(outcome, shared, unique[u])
+                except Exception as e:
+                    print(f"[AI] Batch item failed: {e}")
+                    result = None
+                if result:
+                    yield from emit(u, result, 'ai')
+                else:
+                    yield from emit(u, fallbacks[u], 'fallback')
+            if deadline:
+                now = time.monotonic()
+                for future, (u, started) in list(pending.items()):
+                    if now - started >= deadline:
+                        # Left running on _AI_POOL; its result still lands in the cache
+                        del pending[future]
+                        abandoned.add(future)
+                        yield from emit(u, fallbacks[u], 'fallback')
+
     # ─────────────────────────────────────────────────────────
     #  PUBLIC: DESTINATION DETAILS
     # ─────────────────────────────────────────────────────────
 
     def get_destination_details(self, destination_name: str, user_prefs: dict) -> dict:
         """Get comprehensive details for a specific destination."""
+        details, _ = self.get_destination_details_cached(destination_name, user_prefs)
+        return details
+
+    def get_destination_details_cached(self, destination_name: str, user_prefs: dict) -> tuple:
+        """
+        Stale-while-revalidate lookup. Returns (details, cache_meta) where
+        cache_meta['status'] is 'fresh', 'stale' (refresh running in the
+        background), 'miss' (fetched just now), 'pending' (Gemini missed
+        AI_DEADLINES['details']; static details now, AI result cached later)
+        or 'bypass' (static fallback).
+        """
         self._configure()
         if self.available:
-            result = self._get_ai_destination_details(destination_name, user_prefs)
+            key = details_cache_key(destination_name, user_prefs)
+            cached = self.details_cache.get(key)
+            if cached:
+                details, stored_at = cached
+                age = time.time() - stored_at
+                if age <= settings.AI_DETAILS_FRESH_TTL:
+                    return details, _cache_meta('fresh', age)
+                self._schedule_details_refresh(key, destination_name, user_prefs)
+                return details, _cache_meta('stale', age)
+
+            future = _AI_POOL.submit(self._refresh_destination_details, key, destination_name, user_prefs)
+            fallback = self._get_fallback_destination_details(destination_name, user_prefs)
+            deadline = _deadline('details')
+            try:
+                result = future.result(timeout=deadline)
+            except FutureTimeout:
+                print(f"[AI] ⏱️  Gemini missed the {deadline}s details deadline — serving static details")
+                return fallback, _cache_meta('pending', 0)
             if result:
-                return result
-        return self._get_fallback_destination_details(destination_name, user_prefs)
+                return result, _cache_meta('miss', 0)
+            return fallback, _cache_meta('bypass', 0)
+        return self._get_fallback_destination_details(destination_name, user_prefs), _cache_meta('bypass', 0)
+
+    async def aget_destination_details_cached(self, destination_name: str, user_prefs: dict) -> tuple:
+        """Async twin of get_destination_details_cached (stale refreshes still run on the background pool)."""
+        self._configure()
+        if self.available:
+            key = details_cache_key(destination_name, user_prefs)
+            cached = self.details_cache.get(key)
+            if cached:
+                details, stored_at = cached
+                age = time.time() - stored_at
+                if age <= settings.AI_DETAILS_FRESH_TTL:
+                    return details, _cache_meta('fresh', age)
+                self._schedule_details_refresh(key, destination_name, user_prefs)
+                return details, _cache_meta('stale', age)
+
+            task = asyncio.ensure_future(self._arefresh_destination_details(key, destination_name, user_prefs))
+            fallback = self._get_fallback_destination_details(destination_name, user_prefs)
+            deadline = _deadline('details')
+            try:
+                result = await asyncio.wait_for(asyncio.shield(task), timeout=deadline)
+            except asyncio.TimeoutError:
+                print(f"[AI] ⏱️  Gemini missed the {deadline}s details deadline — serving static details")
+                _keep_running(task)
+                return fallback, _cache_meta('pending', 0)
+            if result:
+                return result, _cache_meta('miss', 0)
+            return fallback, _cache_meta('bypass', 0)
+        return self._get_fallback_destination_details(destination_name, user_prefs), _cache_meta('bypass', 0)
+
+    @property
+    def details_cache(self):
+        """Destination details cache; entries live for the fresh + stale window."""
+        if self._details_cache is None:
+            self._details_cache = build_cache(
+                'details', ttl=settings.AI_DETAILS_FRESH_TTL + settings.AI_DETAILS_STALE_TTL
+            )
+        return self._details_cache
+
+    def _refresh_destination_details(self, key, destination_name, user_prefs):
+        """Fetch details from Gemini and store them; returns None on failure."""
+        result = self._get_ai_destination_details(destination_name, user_prefs)
+        if result:
+            self.details_cache.set(key, result)
+        return result
+
+    async def _arefresh_destination_details(self, key, destination_name, user_prefs):
+        result = await self._aget_ai_destination_details(destination_name, user_prefs)
+        if result:
+            self.details_cache.set(key, result)
+        return result
+
+    def _schedule_details_refresh(self, key, destination_name, user_prefs):
+        """Refresh a stale entry in the background — at most one refresh per key."""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._refresh_destination_details(key, destination_name, user_prefs)
+                print(f"[AI] 🔄 Refreshed cached details for {destination_name}")
+            except Exception as e:
+                print(f"[AI] Background refresh failed for {destination_name}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        _BACKGROUND.submit(refresh)
 
     def _get_ai_destination_details(self, destination_name, prefs):
+        data, _ = self._generate_json(self._details_prompt(destination_name, prefs), 'details')
+        return data
+
+    async def _aget_ai_destination_details(self, destination_name, prefs):
+        data, _ = await self._agenerate_json(self._details_prompt(destination_name, prefs), 'details')
+        return data
+
+    def _details_prompt(self, destination_name, prefs) -> str:
         currency = prefs.get('currency', 'INR')
         num_days = prefs.get('num_days', 5)
         from_loc = prefs.get('from_location', 'India')
@@ -1021,47 +1072,65 @@ IMPORTANT for events_festivals: Search the internet for REAL, WELL-KNOWN festiva
 
 Return ONLY valid minified JSON (no markdown):
 {{"name":"{destination_name}","full_location":"Full city, state/country","distance_from_start":"Exact distance from {from_loc}","overview":"Rich 4-sentence description of why this place is amazing and unique","famous_for":["specific thing 1","specific thing 2","specific thing 3","specific thing 4","specific thing 5"],"best_season":"Specific best months with reason e.g. Oct-Mar (cool, dry weather perfect for sightseeing)","tourist_spots":[{{"name":"Real Attraction Name","description":"What makes it special and must-visit","entry_fee":"{currency} amount or Free"}},...5 spots],"food_spots":[{{"name":"Real Restaurant or Food Street Name","specialty":"Specific local dish","avg_cost":"{currency} per person"}},...4 spots],"travel_options":[{{"mode":"Flight/Train/Bus","duration":"X hrs","cost":"{currency} approx one-way","from":"{from_loc}"}},...3 options],"accommodation":[{{"type":"Budget/Mid-range/Luxury","name":"Real hotel or hostel example","cost_per_night":"{currency} amount"}},...3 options],"events_festivals":[{{"name":"Actual Festival Name (e.g. Onam, Pushkar Camel Fair, Sunburn Festival)","month":"Specific months (e.g. August-September, November, December)","description":"2-3 sentence vivid description of what happens — rituals, performances, food, atmosphere"}},...4 to 5 REAL festivals/cultural events],"cost_breakdown":{{"travel_to_destination":"{currency} round trip from {from_loc}","accommodation_total":"{currency} for {num_days} nights","food_total":"{currency} for {num_days} days","sightseeing_total":"{currency}","miscellaneous":"{currency}","grand_total":"{currency}"}},"travel_tips":["Tip 1: specific actionable tip","Tip 2: best time to visit specific places","Tip 3: what to avoid","Tip 4: local cultural etiquette"],"local_transport":"Specific transport options with costs e.g. Auto-rickshaw: INR 20-50/km, Ola/Uber available"}}"""
-
-        raw = self._call_gemini(prompt)
-        if not raw:
-            return None
-        return self._clean_json(raw)
+        return prompt
 
     # ─────────────────────────────────────────────────────────
     #  PUBLIC: LOCATION SUGGESTIONS
     # ─────────────────────────────────────────────────────────
 
     def get_location_suggestions(self, query: str) -> list:
-        """Autocomplete location suggestions."""
+        """
+        Autocomplete location suggestions from the in-memory index (no network).
+        Prefixes it knows little about are sent to Gemini in the background,
+        and whatever comes back is added to the index for the next keystroke.
+        """
         self._configure()
-        if self.available:
-            prompt = f"""List exactly 6 real Indian cities or popular tourist locations matching "{query}".
+        _seed_known_origins()
+        suggestions = get_suggestion_cache().suggest(query)
+        if len(suggestions) < 6 and self.available:
+            self._schedule_suggestion_enrichment(query)
+        return suggestions
+
+    async def aget_location_suggestions(self, query: str) -> list:
+        """Async twin of get_location_suggestions (the lookup itself never blocks)."""
+        return self.get_location_suggestions(query)
+
+    def remember_origin(self, from_location: str):
+        """Count a trip's origin towards autocomplete popularity."""
+        get_autocomplete().learn(from_location)
+
+    def _schedule_suggestion_enrichment(self, query):
+        prefix = fold_location(query)
+        if len(prefix) < 3:
+            return
+        with self._lock:
+            if prefix in self._enriched or len(self._enriching) >= _MAX_ENRICHING:
+                return
+            if len(self._enriched) >= 5000:
+                self._enriched.clear()
+            self._enriched.add(prefix)
+            self._enriching.add(prefix)
+
+        def enrich():
+            try:
+                data, _ = self._generate_json(self._suggestions_prompt(query), 'suggestions', expected=list)
+                if isinstance(data, list):
+                    index = get_autocomplete()
+                    for label in data[:6]:
+                        if isinstance(label, str):
+                            index.add(label, weight=_ENRICHED_WEIGHT)
+            except Exception as e:
+                print(f"[AI] Suggestion enrichment failed for '{query}': {e}")
+            finally:
+                with self._lock:
+                    self._enriching.discard(prefix)
+
+        _BACKGROUND.submit(enrich)
+
+    def _suggestions_prompt(self, query: str) -> str:
+        return f"""List exactly 6 real Indian cities or popular tourist locations matching "{query}".
 Return ONLY a JSON array of strings, no other text:
 ["Location 1, State", "Location 2, State", ...]"""
-            raw = self._call_gemini(prompt)
-            if raw:
-                data = self._clean_json(raw)
-                if isinstance(data, list):
-                    return data[:6]
-        return self._get_fallback_locations(query)
-
-    def _get_fallback_locations(self, query: str) -> list:
-        """Static location autocomplete."""
-        locations = [
-            "Mumbai, Maharashtra", "Delhi, NCR", "Bangalore, Karnataka",
-            "Chennai, Tamil Nadu", "Kolkata, West Bengal", "Hyderabad, Telangana",
-            "Pune, Maharashtra", "Ahmedabad, Gujarat", "Jaipur, Rajasthan",
-            "Kochi, Kerala", "Goa", "Surat, Gujarat", "Lucknow, Uttar Pradesh",
-            "Coimbatore, Tamil Nadu", "Mysore, Karnataka", "Agra, Uttar Pradesh",
-            "Varanasi, Uttar Pradesh", "Rishikesh, Uttarakhand", "Manali, Himachal Pradesh",
-            "Shimla, Himachal Pradesh", "Darjeeling, West Bengal", "Gangtok, Sikkim",
-            "Leh, Ladakh", "Srinagar, J&K", "Amritsar, Punjab", "Chandigarh",
-            "Udaipur, Rajasthan", "Jodhpur, Rajasthan", "Jaisalmer, Rajasthan",
-            "Munnar, Kerala", "Alleppey, Kerala", "Pondicherry",
-            "Ooty, Tamil Nadu", "Kodaikanal, Tamil Nadu", "Hampi, Karnataka",
-        ]
-        q = query.lower()
-        return [loc for loc in locations if q in loc.lower()][:6]
 
     # ─────────────────────────────────────────────────────────
     #  FALLBACK: SMART STATIC RECOMMENDATIONS
@@ -1072,84 +1141,32 @@ Return ONLY a JSON array of strings, no other text:
         Intelligent static fallback: scores destinations by style match,
         handles currency conversion, always returns within + beyond-budget options.
         """
+        return self.get_fallback_batch([user_prefs])[0]
+
+    def get_fallback_batch(self, prefs_list: list) -> list:
+        """Static recommendations for many preference sets, scored and priced in one pass over the catalog."""
+        queries = [_fallback_query(prefs) for prefs in prefs_list]
+        # Common requests from a hub are looked up in the materialized grid;
+        # the rest are ranked over the catalog in one pass
+        grid = get_fallback_grid()
+        picks = [grid.pick(query, origin and origin[0]) if grid else None for query, origin in queries]
+        missing = [i for i, pick in enumerate(picks) if pick is None]
+        if missing:
+            for i, pick in zip(missing, get_catalog().pick_many([queries[i][0] for i in missing])):
+                picks[i] = pick
+        return [
+            self._fallback_result(prefs, query, origin, *pick)
+            for prefs, (query, origin), pick in zip(prefs_list, queries, picks)
+        ]
+
+    def _fallback_result(self, user_prefs, query, origin, picks_within, picks_over):
         budget_raw = float(user_prefs.get('budget', 50000))
         currency = user_prefs.get('currency', 'INR').upper()
-        styles = [s.lower() for s in user_prefs.get('destination_styles', [])]
-        from_loc = user_prefs.get('from_location', 'India')
-        num_days = int(user_prefs.get('num_days', 5))
-        travel_scope = user_prefs.get('travel_scope', 'within_country')
+        styles = query['styles']
+        budget_inr = query['budget_inr']
+        display_rate = 1.0 / CURRENCY_TO_INR.get(currency, 84)  # INR → user currency
 
-        # Convert user budget to INR for comparison (DB is in INR)
-        inr_rate = CURRENCY_TO_INR.get(currency, 84)
-        budget_inr = budget_raw * inr_rate
-        display_rate = 1.0 / inr_rate  # INR → user currency
-
-        # Filter pool by scope
-        if travel_scope == 'within_country':
-            pool = [d for d in ALL_DESTINATIONS if not d.get('international', False)]
-        else:
-            # User selected International — strictly show international destinations
-            pool_intl = [d for d in ALL_DESTINATIONS if d.get('international', True)]
-            pool = [d for d in pool_intl if d.get('international', False)]
-            if not pool:
-                pool = list(ALL_DESTINATIONS)
-
-        # Style scoring — uses STYLE_ALIASES for robust matching
-        def style_score(dest):
-            if not styles:
-                return 1
-            d_styles = {s.lower().strip() for s in dest.get('styles', [])}
-            score = 0
-            for user_style in styles:
-                expanded = _normalize_style(user_style)
-                if expanded & d_styles:
-                    score += 2
-                else:
-                    user_words = set(user_style.split())
-                    for ds in d_styles:
-                        ds_words = set(ds.split())
-                        common = (user_words & ds_words) - {'&', 'and', 'the'}
-                        if common:
-                            score += 1
-                            break
-            return score
-
-        scored = [(style_score(d), d) for d in pool]
-        
-        # Scale cost by number of days (base is 5-day trip) and travel medium
-        medium = user_prefs.get('travel_medium', 'any')
-        medium_multiplier = 0.60
-        if medium == 'bus': medium_multiplier = 0.50
-        elif medium == 'train': medium_multiplier = 0.55
-        elif medium == 'flight': medium_multiplier = 0.85
-        elif medium == 'travel_agency': medium_multiplier = 1.30
-
-        def compute_cost(dest):
-            base = dest['base_cost']
-            cpd = dest['cost_per_day']
-            adjusted = base + (num_days - 5) * cpd
-            raw_cost = max(adjusted, cpd * num_days)
-            return raw_cost * medium_multiplier
-
-        # Prepare candidates with scores and costs
-        candidates = []
-        for score, dest in scored:
-            cost = compute_cost(dest)
-            candidates.append({
-                'score': score,
-                'dest': dest,
-                'cost': cost
-            })
-
-        # Shuffle candidates to ensure variety within same score levels
-        random.shuffle(candidates)
-        
-        # Sort by score DESC primarily
-        candidates.sort(key=lambda x: -x['score'])
-
-        over_budget_threshold = budget_inr * 1.5
-
-        def make_dest_copy(dest, cost_inr):
+        def make_dest_copy(dest, cost_inr, trip):
             d = dict(dest)
             display_cost = round(cost_inr * display_rate)
             if currency == 'INR':
@@ -1159,59 +1176,24 @@ Return ONLY a JSON array of strings, no other text:
             d['currency'] = currency
             d['best_for'] = [s.title() for s in dest.get('styles', [])[:4]]
             d['distance_from_start'] = dest.get('distance', 'Distance varies')
-            return d
-
-        within_budget = []
-        over_budget = []
-
-        # First pass: Get all viable candidates
-        for cand in candidates:
-            score = cand['score']
-            dest = cand['dest']
-            cost = cand['cost']
-            
-            if score <= 0 and styles:
-                continue # Skip non-matching if styles were selected
-            
-            d = make_dest_copy(dest, cost)
-            if cost <= budget_inr:
+            if trip is not None:
+                d['distance_from_start'] = f"~{trip['km']:,.0f} km from {origin[0]}"
+                fare = int(trip['fare']) if currency == 'INR' else round(trip['fare'] * display_rate)
+                via = f" via {trip['via']}" if trip['via'] and trip['via'] != origin[0] else ''
+                d['transport_cost'] = f"~{currency} {fare:,} round trip by {trip['mode']}{via}"
+                if trip['mode'] is None:
+                    d['transport_cost'] = f"None — you're already in {origin[0]}"
+            if cost_inr <= budget_inr:
                 d['within_budget'] = True
                 d['over_budget_note'] = None
-                if len(within_budget) < 6:
-                    within_budget.append(d)
-            elif cost <= over_budget_threshold:
+            else:
                 d['within_budget'] = False
-                pct = int(((cost - budget_inr) / budget_inr) * 100)
+                pct = int(((cost_inr - budget_inr) / budget_inr) * 100)
                 d['over_budget_note'] = f"~{pct}% over budget — but the experience is absolutely worth it!"
-                if len(over_budget) < 3:
-                    over_budget.append(d)
-
-        # Emergency: if no within-budget matches, relax style filter (ignore score > 0)
-        if not within_budget:
-            for cand in candidates:
-                dest = cand['dest']
-                cost = cand['cost']
-                if cost <= budget_inr and len(within_budget) < 4:
-                    d = make_dest_copy(dest, cost)
-                    d['within_budget'] = True
-                    d['over_budget_note'] = None
-                    within_budget.append(d)
-
-        # Ensure at least 2 over_budget suggestions
-        if len(over_budget) < 2:
-            used = {d['name'] for d in within_budget + over_budget}
-            for cand in candidates:
-                dest = cand['dest']
-                cost = cand['cost']
-                if dest['name'] in used: continue
-                if budget_inr < cost <= over_budget_threshold:
-                    d = make_dest_copy(dest, cost)
-                    d['within_budget'] = False
-                    pct = int(((cost - budget_inr) / budget_inr) * 100)
-                    d['over_budget_note'] = f"~{pct}% over budget — but the experience is absolutely worth it!"
-                    over_budget.append(d)
-                    if len(over_budget) >= 3: break
+            return d
 
+        within_budget = [make_dest_copy(*pick) for pick in picks_within]
+        over_budget = [make_dest_copy(*pick) for pick in picks_over]
 
         result = within_budget + over_budget
         for i, d in enumerate(result, 1):
@@ -1290,152 +1272,191 @@ Return ONLY a JSON array of strings, no other text:
 
     def _get_static_festivals(self, destination_name: str) -> list:
         """Return real festivals/events for a destination from a static DB."""
-        FESTIVALS_DB = {
-            "goa": [
-                {"name": "Carnival of Goa", "month": "February", "description": "A 3-day pre-Lenten celebration with colorful parades, street dancing, live music, and elaborate floats through Panaji. King Momo rules the festivities with revelry and feasting."},
-                {"name": "Sunburn Festival", "month": "December", "description": "Asia's largest electronic dance music festival held on the beaches of Goa, featuring world-class DJs, stunning light shows, and beach parties lasting three days."},
-                {"name": "Shigmo Festival", "month": "March", "description": "Goa's version of Holi — a grand spring festival with traditional folk dances, elaborate street processions, colorful floats, and vibrant cultural performances."},
-                {"name": "Feast of St. Francis Xavier", "month": "December (3rd)", "description": "A major Catholic pilgrimage at Old Goa's Basilica of Bom Jesus, venerating the patron saint's relics with Masses, processions, and a large fair."},
-            ],
-            "manali": [
-                {"name": "Winter Carnival", "month": "January", "description": "A week-long winter celebration featuring skiing competitions, folk dances, music performances, beauty pageants, and bonfire nights against the backdrop of snow-clad Himalayas."},
-                {"name": "Hadimba Devi Festival (Dhungri Mela)", "month": "May", "description": "A vibrant 3-day cultural fair at the Hadimba Temple with traditional Kullu folk dances, local handicraft stalls, and rituals honoring Goddess Hadimba."},
-                {"name": "Dussehra (Kullu Dussehra)", "month": "October", "description": "Unlike the rest of India, Kullu Dussehra BEGINS on Vijayadashami and lasts 7 days. Over 200 village deities are brought in grand processions to Dhalpur Maidan."},
-            ],
-            "kerala": [
-                {"name": "Onam", "month": "August–September", "description": "Kerala's grandest harvest festival spanning 10 days — featuring spectacular Pookalam (flower rangoli), Onasadya (26-course feast on banana leaves), Vallam Kali (snake boat races), and Pulikali (tiger dance)."},
-                {"name": "Nehru Trophy Boat Race", "month": "August (2nd Saturday)", "description": "The most famous snake boat race in India, held on Punnamada Lake in Alleppey. Over 100-foot-long Chundan Vallams race to the deafening cheers of lakhs of spectators."},
-                {"name": "Thrissur Pooram", "month": "April–May", "description": "A spectacular temple festival in Thrissur featuring a grand procession of 30+ caparisoned elephants, traditional Panchavadyam percussion orchestra, and a breathtaking fireworks display at dawn."},
-                {"name": "Theyyam Season", "month": "November–March", "description": "Ancient ritualistic dance form performed in temples across North Kerala. Dancers adorned with elaborate costumes and face paint become living gods in a trance-like devotional performance."},
-            ],
-            "rajasthan": [
-                {"name": "Pushkar Camel Fair", "month": "November", "description": "The world's largest camel fair in Pushkar — thousands of camels traded, decorated, and raced. Includes folk performances, hot air balloon rides, and a surreal moonlit desert atmosphere."},
-                {"name": "Desert Festival Jaisalmer", "month": "February", "description": "A 3-day extravaganza on Sam Sand Dunes featuring camel races, turban-tying contests, folk music, puppet shows, and a mesmerizing Mr. Desert competition."},
-                {"name": "Gangaur Festival", "month": "March–April", "description": "A vibrant Rajasthani festival celebrating Goddess Gauri (Parvati). Women dress in colorful attire, carry decorated idols through processions, and pray for marital bliss."},
-                {"name": "Mewar Festival (Udaipur)", "month": "March–April", "description": "Udaipur's cultural extravaganza welcoming spring with traditional songs, dances, stunning processions to Lake Pichola, and fireworks lighting up the City of Lakes."},
-            ],
-            "jaisalmer": [
-                {"name": "Desert Festival", "month": "February", "description": "A 3-day festival on Sam Sand Dunes with folk music, camel races, turban-tying contests, and Mr. Desert competition. The golden fort glows as the backdrop for cultural performances."},
-                {"name": "Gangaur Festival", "month": "March–April", "description": "Women carry beautifully decorated clay idols of Goddess Gauri through the narrow lanes of Jaisalmer Fort in colorful processions with folk songs."},
-                {"name": "Marwar Festival", "month": "October", "description": "A celebration of Rajasthani folk heroes through music and dance. Performances of Maand (classical singing), folk dances, and puppet shows bring Marwar's heritage alive."},
-            ],
-            "ladakh": [
-                {"name": "Hemis Festival", "month": "June–July", "description": "Ladakh's biggest monastery festival at Hemis Gompa celebrating Guru Padmasambhava's birthday. Monks perform sacred Cham dances with colorful masks and elaborate brocade costumes."},
-                {"name": "Ladakh Festival", "month": "September", "description": "A 15-day government-organized cultural showcase featuring traditional archery, polo matches, masked dances, yak races, and Ladakhi folk performances."},
-                {"name": "Losar (Ladakhi New Year)", "month": "December–January", "description": "The Ladakhi New Year celebration with Buddhist rituals, family gatherings, traditional food like Khapse (fried pastry), and two weeks of merrymaking."},
-            ],
-            "varanasi": [
-                {"name": "Dev Deepawali", "month": "November", "description": "The 'Festival of Lights of the Gods' — over a million earthen lamps (diyas) light up the 80+ ghats of the Ganges. A breathtaking spectacle with fireworks, aarti, and music on full moon night."},
-                {"name": "Ganga Mahotsav", "month": "November", "description": "A 5-day cultural festival coinciding with Dev Deepawali featuring classical music, dance performances, wrestling bouts, and the spectacular illumination of all ghats."},
-                {"name": "Maha Shivaratri", "month": "February–March", "description": "One of the holiest nights at the Kashi Vishwanath Temple. Thousands of devotees throng the temple for night-long prayers, abhishekam, and the sacred procession (Baraat) of Lord Shiva."},
-                {"name": "Holi (Rangbhari Ekadashi)", "month": "March", "description": "Varanasi's unique Holi at Manikarnika Ghat blends colors with spirituality. The entire city erupts in color, thandai (bhang drink), and folk music at every ghat."},
-            ],
-            "rishikesh": [
-                {"name": "International Yoga Festival", "month": "March (1st week)", "description": "A 7-day global yoga gathering at Parmarth Niketan ashram attracting thousands of yoga practitioners. Features sessions by world-renowned yogis, meditation, and Ganga Aarti."},
-                {"name": "Ganga Dussehra", "month": "May–June", "description": "Celebrating the descent of River Ganga to Earth. Thousands float diyas on the Ganges with special puja ceremonies and cultural processions along the riverbanks."},
-                {"name": "Maha Shivaratri", "month": "February–March", "description": "A grand celebration at Ram Jhula and Lakshman Jhula with all-night Shiva chanting, special aarti, and spiritual gatherings at riverside temples."},
-            ],
-            "andaman": [
-                {"name": "Island Tourism Festival", "month": "January", "description": "A 10-day cultural fiesta in Port Blair featuring dance shows from mainland India and Andaman's indigenous tribes, adventure sport exhibitions, and local handicraft bazaars."},
-                {"name": "Beach Festival", "month": "April–May", "description": "Water sports competitions, sandcastle building, beach volleyball, and musical performances along the pristine beaches of the Andaman Islands."},
-                {"name": "Subhash Mela", "month": "January (23rd)", "description": "Commemorating Netaji Subhash Chandra Bose's birth anniversary with a grand fair at Port Blair featuring cultural shows, exhibitions, and patriotic events."},
-            ],
-            "hampi": [
-                {"name": "Hampi Utsav (Vijaya Vittala Festival)", "month": "November", "description": "A grand 3-day cultural extravaganza among the ruins of Vijayanagara Empire. Includes classical dance, music concerts, puppet shows, processions with decorated elephants, and a fireworks finale."},
-                {"name": "Virupaksha Car Festival", "month": "February", "description": "A massive chariot procession at the Virupaksha Temple — the towering wooden chariot is pulled through Hampi's main bazaar street by hundreds of devotees."},
-                {"name": "Purandaradasa Festival", "month": "January–February", "description": "A 3-day Carnatic music festival commemorating the legendary musician Purandaradasa with concerts by top musicians amid Hampi's ancient temple setting."},
-            ],
-            "coorg": [
-                {"name": "Kaveri Sankramana", "month": "October", "description": "The sacred festival marking the rise of River Kaveri at Talakaveri. Thousands gather at the spring's origin to witness the miraculous gush of water at an auspicious moment."},
-                {"name": "Kodava Hockey Festival", "month": "March–April", "description": "The largest hockey tournament in Asia, organized in Kodagu. A major cultural gathering for the Kodava community with folk performances and traditional feasts."},
-                {"name": "Blossom Flower Show", "month": "April", "description": "A vibrant display of Coorg's exotic flowers, coffee blossoms, and ornamental plants at Raja's Seat garden with cultural programs and local food stalls."},
-            ],
-            "meghalaya": [
-                {"name": "Shad Suk Mynsiem (Weiking Dance)", "month": "April", "description": "The Khasi spring thanksgiving festival in Shillong — women dressed in golden silk and coral crowns perform graceful dances while men wear feathered headgear in a spectacular open-air celebration."},
-                {"name": "Behdienkhlam", "month": "July", "description": "The largest Pnar (Jaintia) festival in Jowai — a dramatic rain-invocation ceremony where huge decorated wooden structures are dunked into a mud pit amid frenzied dancing."},
-                {"name": "Nongkrem Dance Festival", "month": "November", "description": "A 5-day Khasi harvest festival near Shillong featuring sacred ritual dances at the Smit village, goat sacrifice, archery competitions, and a vibrant fair."},
-            ],
-            "mumbai": [
-                {"name": "Ganesh Chaturthi (Ganapati Festival)", "month": "August–September", "description": "Mumbai's biggest festival — millions of devotees install Ganesh idols at home and in pandals for 10 days. The grand Visarjan procession goes on for 24+ hours with music, dance, and emotion."},
-                {"name": "Kala Ghoda Arts Festival", "month": "February", "description": "A 9-day art extravaganza in South Mumbai's Kala Ghoda area with street art installations, literature events, music, dance performances, food stalls, and workshops."},
-                {"name": "Navratri & Dandiya Nights", "month": "October", "description": "Mumbai comes alive with organized Dandiya Raas events in grounds across the city. Navratri garba nights at venues like NSCI Dome attract lakhs of dancers."},
-                {"name": "Banganga Festival", "month": "January", "description": "A 2-day classical music festival at the ancient Banganga Tank in Malabar Hill — top Hindustani musicians perform against the backdrop of this 1000-year-old heritage site."},
-            ],
-            "amritsar": [
-                {"name": "Baisakhi", "month": "April (13th)", "description": "The Sikh harvest New Year celebrated grandly at the Golden Temple with special prayers (Akhand Path), vibrant Bhangra, processions (Nagar Kirtan), and a spectacular fireworks display."},
-                {"name": "Guru Nanak Jayanti", "month": "November", "description": "The birth anniversary of Guru Nanak celebrated with a 48-hour Akhand Path, serene Prabhat Pheris (dawn processions), and massive community langars serving millions."},
-                {"name": "Wagah Border Retreat Ceremony", "month": "Daily (year-round)", "description": "Not a festival per se, but an electrifying daily ceremony at the India-Pakistan border with high-stepping soldiers, patriotic fervor, and thousands of cheering spectators."},
-            ],
-            "bali": [
-                {"name": "Nyepi (Day of Silence)", "month": "March", "description": "Bali's unique Hindu New Year — the entire island shuts down for 24 hours. No lights, no travel, no activity. The night before features Ogoh-Ogoh parade with giant demon effigies."},
-                {"name": "Galungan & Kuningan", "month": "Varies (210-day cycle)", "description": "A 10-day Balinese Hindu celebration of good over evil. Temples are decorated with bamboo Penjor poles, families offer prayers, and traditional Barong dances fill the streets."},
-                {"name": "Ubud Writers & Readers Festival", "month": "October", "description": "Southeast Asia's leading literary festival held in Ubud featuring international authors, workshops, cultural performances, and discussions amid rice paddies."},
-            ],
-            "thailand": [
-                {"name": "Songkran (Thai New Year Water Festival)", "month": "April (13–15)", "description": "The world-famous Thai water festival — the entire country erupts in a massive water fight for 3 days. Traditional rituals include pouring water on elders' hands for blessings."},
-                {"name": "Loy Krathong", "month": "November", "description": "The enchanting 'Festival of Lights' where thousands of candle-lit banana leaf boats (krathongs) are released on rivers. In Chiang Mai, sky lanterns (Yi Peng) light up the night sky."},
-                {"name": "Full Moon Party (Koh Phangan)", "month": "Monthly", "description": "The legendary monthly beach party on Haad Rin Beach with 20,000+ revelers, neon body paint, fire dancers, and DJs playing until dawn."},
-            ],
-            "dubai": [
-                {"name": "Dubai Shopping Festival (DSF)", "month": "December–January", "description": "A month-long mega shopping event with massive discounts, daily raffles (win luxury cars and gold!), global village, fireworks, and entertainment shows across the city."},
-                {"name": "Dubai Food Festival", "month": "February–March", "description": "A 23-day culinary celebration with pop-up restaurants, food trucks, celebrity chef events, and the famous 'Beach Canteen' along Jumeirah Beach."},
-                {"name": "Dubai International Film Festival", "month": "December", "description": "A premier regional film festival showcasing Arab and international cinema with red carpet premieres, filmmaker talks, and outdoor screenings under the stars."},
-            ],
-            "nepal": [
-                {"name": "Dashain (Durga Puja)", "month": "October", "description": "Nepal's biggest and longest festival lasting 15 days. Families gather for elaborate feasts, kite flying, animal sacrifices to Goddess Durga, and receiving tika (sacred vermillion) from elders."},
-                {"name": "Holi (Festival of Colors)", "month": "March", "description": "Celebrated with wild enthusiasm in Kathmandu's Durbar Square — water balloons, colored powder, music, and dancing fill the streets for two days."},
-                {"name": "Indra Jatra", "month": "September", "description": "A spectacular 8-day festival in Kathmandu with the chariot procession of the Living Goddess (Kumari), masked dances, and traditional Newari feasting."},
-            ],
-            "singapore": [
-                {"name": "Chinese New Year (Chinatown)", "month": "January–February", "description": "Spectacular celebrations in Chinatown with elaborate street decorations, lion dances, Chingay parade (Asia's largest street performance), and a massive River Hongbao festival."},
-                {"name": "National Day (NDP)", "month": "August (9th)", "description": "Singapore's birthday celebration at Marina Bay with a jaw-dropping military parade, iconic Red Lions sky dive, NDP songs, and Southeast Asia's most impressive fireworks display."},
-                {"name": "Deepavali (Little India)", "month": "October–November", "description": "Little India transforms into a dazzling corridor of lights and decorations. Night bazaars, cultural performances, and the entire Serangoon Road glowing with festive illuminations."},
-            ],
-            "ooty": [
-                {"name": "Ooty Flower Show", "month": "May", "description": "A spectacular 3-day exhibition at the Botanical Gardens showcasing rare and exotic flowers, roses, dahlias, and ornamental plants grown in the Nilgiris. Attracts over 1 lakh visitors."},
-                {"name": "Tea and Tourism Festival", "month": "December–January", "description": "Celebrating Ooty's tea heritage with tea-tasting sessions, estate tours, cultural performances, and nature walks through the rolling tea plantations of the Nilgiris."},
-                {"name": "Summer Festival", "month": "May–June", "description": "A cultural fiesta featuring boat races on Ooty Lake, horticulture exhibitions, tribal dance performances, and night bazaars in the cool Nilgiri summer weather."},
-            ],
-            "kodaikanal": [
-                {"name": "Summer Festival", "month": "May", "description": "A 3-day celebration organized by the Tamil Nadu Tourism Department with flower shows, dog shows, cultural concerts by top artists, and boat races on Kodai Lake."},
-                {"name": "Pongal Celebrations", "month": "January", "description": "The Tamil harvest festival celebrated with traditional rituals, Jallikattu references, Pongal cooking in open pots, folk dances, and kolam art competitions."},
-            ],
-            "pondicherry": [
-                {"name": "Bastille Day", "month": "July (14th)", "description": "A unique French heritage celebration in Pondicherry — the only place in India that celebrates France's national day with parades, French tricolor decorations, and cultural events in the French Quarter."},
-                {"name": "International Yoga Festival", "month": "January", "description": "A 7-day gathering at Sri Aurobindo Ashram and Auroville with yoga workshops, meditation sessions, and spiritual talks by renowned practitioners from around the world."},
-                {"name": "Masquerade Festival", "month": "February–March", "description": "Pondicherry's Mardi Gras-inspired carnival with masked processions, colorful costumes, float parades through the French Quarter, and live music performances on the promenade."},
-            ],
-            "spiti": [
-                {"name": "Losar (Spitian New Year)", "month": "January", "description": "Spiti's Buddhist New Year celebration with devil dances at Ki and Tabo monasteries, special prayers, feasting on traditional dishes like Thukpa, and the entire valley decorated with prayer flags."},
-                {"name": "Cham Dance Festival (at Ki Monastery)", "month": "June–July", "description": "Sacred masked dances performed by monks at the spectacular Ki Monastery depicting the triumph of good over evil. Attended by villagers from across the Spiti Valley."},
-                {"name": "Fagli Festival", "month": "February", "description": "A colorful carnival-like winter festival with masked performances, folk singing, and community feasting — Spiti's way of chasing away winter evil spirits."},
-            ],
-            "darjeeling": [
-                {"name": "Darjeeling Carnival", "month": "November–December", "description": "A week-long winter celebration with parades, live bands, beauty pageants, cultural shows, food stalls, and activities along the mall road and Chowrasta area."},
-                {"name": "Losar (Tibetan New Year)", "month": "February–March", "description": "Celebrated by the Tibetan community in Darjeeling with monastery prayers, Cham dances, butter sculptures, and festive gatherings."},
-                {"name": "Tea Tourism Festival", "month": "October", "description": "Celebrating Darjeeling's legendary tea heritage — tea estate tours, tea tasting, tea plucking experiences, and cultural programs in the misty tea gardens."},
-            ],
-        }
-
-        name_lower = destination_name.lower()
-        # Try to find matching key in the DB
-        for key, festivals in FESTIVALS_DB.items():
-            if key in name_lower or name_lower in key:
-                return festivals
+        # One pass over the name: "Kerala Backwaters" → kerala, "Rajasthan — Jaipur & Udaipur" → rajasthan;
+        # anything unknown gets generic but still real pan-Indian festivals
+        return [dict(f) for f in get_festivals().for_destination(destination_name)]
 
-        # Partial matches (e.g., "Kerala Backwaters" → "kerala", "Rajasthan — Jaipur & Udaipur" → "rajasthan")
-        for key, festivals in FESTIVALS_DB.items():
-            if any(word in name_lower for word in key.split()):
-                return festivals
-
-        # Default generic but still real pan-Indian festivals
+    def get_festivals_by_month(self, month: int) -> list:
+        """Static festivals running in a month (1-12), answered from the reverse month index."""
         return [
-            {"name": "Diwali (Festival of Lights)", "month": "October–November", "description": "India's grandest festival celebrated with millions of oil lamps, fireworks, rangoli art, and sweets. Homes are cleaned and decorated, and families gather for Lakshmi Puja."},
-            {"name": "Holi (Festival of Colors)", "month": "March", "description": "A joyous spring celebration where people drench each other in colored powder and water. Music, dance, and traditional drinks like thandai mark this festival of love and forgiveness."},
-            {"name": "Makar Sankranti / Pongal", "month": "January (14th)", "description": "A harvest festival celebrated across India with kite flying (North) or Pongal cooking (South). Marks the sun's transition into Capricorn and the end of winter."},
+            {'destination': key.title(), **festival}
+            for key, festival in get_festivals().in_month(month)
         ]
 
 
+# ─────────────────────────────────────────────────────────
+#  PROCESS-WIDE SERVICE  (one per gunicorn worker)
+# ─────────────────────────────────────────────────────────
+_service = None
+_service_lock = threading.Lock()
+
+# Background work that must not hold up a response (cache refreshes etc.)
+_BACKGROUND = ThreadPoolExecutor(max_workers=2, thread_name_prefix='ai-background')
+
+# Gemini calls that race the static fallback against a deadline
+_AI_POOL = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'AI_MAX_CONCURRENCY', 16), thread_name_prefix='ai-call'
+)
+
+# Async calls that outlived their deadline — referenced here until they finish
+_PENDING_TASKS = set()
+
+# Opens on upstream trouble so requests skip Gemini instead of queueing on it
+_BREAKER = CircuitBreaker('gemini', **getattr(settings, 'AI_CIRCUIT_BREAKER', {}))
+
+# Coalesces identical concurrent Gemini prompts within this worker
+_IN_FLIGHT = SingleFlight()
+_ASYNC_IN_FLIGHT = AsyncSingleFlight()
+
+# Autocomplete enrichment: Gemini lookups in flight at once, and the weight its
+# places start with (the gazetteer's smallest towns are ~35)
+_MAX_ENRICHING = 2
+_ENRICHED_WEIGHT = 5
+_origins_seeded_pid = None
+
+
+def get_ai_service() -> GeminiAIService:
+    """Return the shared GeminiAIService, creating it on first use and
+    refreshing its key if .env / GEMINI_API_KEY changed since the last call."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = GeminiAIService()
+                return _service
+    _service._configure()
+    return _service
+
+
+def gemini_circuit_status() -> dict:
+    """Circuit breaker state + latency percentiles, for the health endpoint."""
+    return _BREAKER.snapshot()
+
+
+def _seed_known_origins():
+    """Once per worker process: feed past TripRequest origins to the autocomplete index, in the background."""
+    global _origins_seeded_pid
+    if _origins_seeded_pid == os.getpid():
+        return
+    with _service_lock:
+        if _origins_seeded_pid == os.getpid():
+            return
+        _origins_seeded_pid = os.getpid()
+    _BACKGROUND.submit(_load_known_origins)
+
+
+def _load_known_origins():
+    from django.db import connection
+    from django.db.models import Count
+    from .models import TripRequest
+    try:
+        index = get_autocomplete()
+        rows = TripRequest.objects.values_list('from_location').annotate(n=Count('id'))
+        for from_location, n in rows:
+            index.learn(from_location, n)
+        index.rerank()
+    except Exception as e:
+        print(f"[AI] Could not load past trip origins for autocomplete: {e}")
+    finally:
+        connection.close()
+
+
+def _record_gemini_failure(error):
+    """Feed a failed call to the breaker; a 429 opens the circuit immediately."""
+    rate_limited = getattr(error, 'code', None) == 429
+    _BREAKER.record_failure(error, rate_limited=rate_limited)
+    print(f"[AI] Gemini call error: {error}")
+    if settings.DEBUG:
+        traceback.print_exc()
+
+
+def _deadline(endpoint):
+    """Seconds to wait for Gemini before answering with the fallback (None = no limit)."""
+    seconds = settings.AI_DEADLINES.get(endpoint, 0)
+    return seconds if seconds and seconds > 0 else None
+
+
+def _keep_running(task):
+    """Let a timed-out Gemini task finish (and fill the cache) in the background."""
+    _PENDING_TASKS.add(task)
+    task.add_done_callback(_PENDING_TASKS.discard)
+
+
+def _complete_recommendation(rec, budget, currency):
+    """True if a Gemini recommendation is usable; fills in optional fields in place."""
+    if not (rec.get('name') and rec.get('estimated_total_cost') is not None):
+        return False
+    rec.setdefault('within_budget', rec.get('estimated_total_cost', 0) <= float(budget))
+    rec.setdefault('currency', currency)
+    rec.setdefault('over_budget_note', None)
+    rec.setdefault('best_for', [])
+    return True
+
+
+def _result_events(result, source):
+    """Replay a complete result (e.g. from cache) as stream events."""
+    for rec in result['recommendations']:
+        yield {'type': 'recommendation', 'recommendation': rec}
+    yield {'type': 'summary', 'ai_summary': result.get('ai_summary', '')}
+    yield {'type': 'done', 'source': source, 'count': len(result['recommendations'])}
+
+
+def _cache_meta(status, age):
+    return {'status': status, 'age_seconds': int(age)}
+
+
+def _personalize(result, cached_name, name):
+    """
+    Swap the traveler name baked into a cached ai_summary for the current one.
+    Short names are left alone; their requests never share an entry.
+    """
+    summary = result.get('ai_summary', '')
+    if swappable_name(cached_name) and name and cached_name != name and summary:
+        result['ai_summary'] = re.sub(rf'\b{re.escape(cached_name)}\b', lambda _: name, summary)
+    return result
+
+
+def _batch_key(prefs):
+    """Identity of a batch entry: equal preference dicts are computed once."""
+    return json.dumps(prefs, sort_keys=True, default=str)
+
+
+def _fallback_query(user_prefs):
+    """
+    Catalog.pick_many() query for a trip request, plus the resolved origin
+    (name, lat, lon) or None.
+    """
+    budget_raw = float(user_prefs.get('budget', 50000))
+    currency = user_prefs.get('currency', 'INR').upper()
+    styles = [s.lower() for s in user_prefs.get('destination_styles', [])]
+    from_loc = user_prefs.get('from_location', 'India')
+    num_days = int(user_prefs.get('num_days', 5))
+    travel_scope = user_prefs.get('travel_scope', 'within_country')
+
+    # Convert user budget to INR for comparison (DB is in INR)
+    budget_inr = budget_raw * CURRENCY_TO_INR.get(currency, 84)
+
+    # Scale cost by number of days (base is 5-day trip) and travel medium
+    medium = user_prefs.get('travel_medium', 'any')
+    medium_multiplier = MEDIUM_MULTIPLIERS.get(medium, MEDIUM_MULTIPLIERS['any'])
+
+    # A known origin adds the transport fare to each trip and ranks nearer
+    # destinations first within a style-score level
+    origin = resolve_origin(from_loc)
+    # Ties are broken by a seed from the request by default, so identical
+    # prefs rank identically (any spelling of a known origin counts as the same)
+    seed = None
+    if getattr(settings, 'AI_FALLBACK_DETERMINISTIC', True):
+        seed = ranking_seed(dict(user_prefs, from_location=origin[0]) if origin else user_prefs)
+    query = {
+        'travel_scope': travel_scope, 'styles': styles, 'num_days': num_days,
+        'multiplier': medium_multiplier, 'budget_inr': budget_inr, 'seed': seed,
+        'origin': origin[1:] if origin else None, 'origin_name': origin[0] if origin else None,
+        'medium': medium,
+    }
+    return query, origin
+
+
 def prefs_display(prefs):
     """Helper for readable user name in summaries."""
     return prefs.get('name', 'you')
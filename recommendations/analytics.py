@@ -0,0 +1,67 @@
+"""
+Trip request analytics
+======================
+Every trip request leaves two records: a TripRequest row and a line in the
+user data journal (see excel_service). Neither is written on the request
+path: record_trip_request() buffers both in a WriteBehindQueue, whose thread
+writes each batch with one journal append and one bulk_create.
+"""
+
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .excel_service import get_user_data_journal, user_data_record
+from .models import TripRequest
+from .write_behind import WriteBehindQueue
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_trip_request_queue():
+    """Per-process write-behind queue for trip request analytics."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = WriteBehindQueue(
+                    'trip-requests', _flush_trip_requests,
+                    **getattr(settings, 'ANALYTICS_WRITE_BEHIND', {}),
+                )
+    return _queue
+
+
+def record_trip_request(user_prefs, ip_address, ip_location):
+    """Queue the analytics for a trip request and return at once (False if the queue dropped it)."""
+    # The journal row is built now, so its timestamp is the request's
+    return get_trip_request_queue().put(
+        (dict(user_prefs), ip_address, ip_location, user_data_record(user_prefs, ip_address, ip_location))
+    )
+
+
+def analytics_status():
+    """Queue depth, record counters and flush latency (see WriteBehindQueue.status())."""
+    return get_trip_request_queue().status()
+
+
+def _flush_trip_requests(batch):
+    failures = []
+    # Independent sinks: a database outage must not cost the journal its rows
+    try:
+        get_user_data_journal().append_many([row for _, _, _, row in batch])
+    except Exception as e:
+        failures.append(f"journal: {e}")
+
+    close_old_connections()  # long-lived thread: drop connections past CONN_MAX_AGE or broken
+    try:
+        TripRequest.objects.bulk_create([
+            TripRequest(ip_address=ip_address, ip_location=ip_location, **user_prefs)
+            for user_prefs, ip_address, ip_location, _ in batch
+        ])
+    except Exception as e:
+        failures.append(f"DB: {e}")
+
+    if failures:
+        raise RuntimeError('; '.join(failures))
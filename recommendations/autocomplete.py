@@ -0,0 +1,373 @@
+"""
+Location autocomplete
+=====================
+In-memory suggestions for the location search boxes, answered in well under
+a millisecond without calling Gemini.
+
+Sources:
+    data/places.json          bundled gazetteer (Indian + popular world places)
+    TripRequest.from_location origins users actually typed (learn())
+    Gemini                    places it suggested for prefixes we knew little
+                              about (add(), called from a background thread)
+
+Structures:
+    trie      every key (name, alternate names, "name region", and the tail
+              of each from its 2nd word on — "navi mumbai" is found by "mum")
+              → node holding the top entries of its subtree by weight, so a
+              prefix lookup is O(len(prefix))
+    trigrams  gram → keys, for typo-tolerant matches ("banglore", "rishkesh")
+              when the prefix alone finds too little; candidates are verified
+              with a bounded edit distance against the key's prefix
+
+Popularity from learn() is applied in batches, at most once per
+rerank_interval: each re-ranking bumps the index version and so empties
+the SuggestionCache, which must not happen on every trip request. New
+places are added (and the version bumped) immediately.
+
+SuggestionCache sits in front of suggest(). Typing "Coim" asks for "co",
+"coi" and "coim"; once a prefix's answer is complete (some exact prefix hit,
+fewer results than the limit, so nothing was cut off) every longer prefix
+takes its prefix hits from just those few places instead of walking the
+index again. Near misses are still looked up for the full query, so a
+derived answer is always the one a full search would give.
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+
+TOP_N = 10              # entries kept per trie node
+FUZZY_MIN_LENGTH = 3    # shorter queries are prefix-only
+FUZZY_CANDIDATES = 64   # keys verified with edit distance per query
+LEARN_THRESHOLD = 3     # times an unknown origin must be seen before it is suggested
+RERANK_INTERVAL = 300   # seconds between applying learned popularity to the rankings
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def fold(text):
+    """Lowercase, strip accents and punctuation: 'Malé, Maldives' → 'male maldives'."""
+    text = unicodedata.normalize('NFKD', str(text or '').casefold())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(' ', text).strip()
+
+
+def fuzzy_limit(q):
+    """Edit distance allowed for a folded query (0 = prefix matches only)."""
+    if len(q) < FUZZY_MIN_LENGTH:
+        return 0
+    return 1 if len(q) <= 5 else 2
+
+
+def _trigrams(key):
+    padded = '$' + key
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def prefix_distance(query, key, limit):
+    """
+    Smallest edit distance (Damerau/OSA) between query and any prefix of key
+    of similar length; returns limit + 1 as soon as it can't be <= limit.
+    """
+    key = key[:len(query) + limit]
+    prev2 = None
+    prev = list(range(len(key) + 1))
+    for i in range(1, len(query) + 1):
+        row = [i] + [0] * len(key)
+        for j in range(1, len(key) + 1):
+            cost = 0 if query[i - 1] == key[j - 1] else 1
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and j > 1 and query[i - 1] == key[j - 2] and query[i - 2] == key[j - 1]:
+                row[j] = min(row[j], prev2[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+        prev2, prev = prev, row
+    lo = max(0, len(query) - limit)
+    return min(prev[lo:]) if lo < len(prev) else limit + 1
+
+
+class _Node:
+    __slots__ = ('children', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.top = []
+
+
+class _Place:
+    __slots__ = ('label', 'weight', 'info', 'keys', 'fuzzy_keys')
+
+    def __init__(self, label, weight, info=None):
+        self.label = label
+        self.weight = weight
+        self.info = info or {}
+        self.keys = set()
+        self.fuzzy_keys = set()     # the keys in the trigram index
+
+
+class Autocomplete:
+    """Prefix trie + trigram index over places. Reads are lock-free; writes take a lock."""
+
+    def __init__(self, rerank_interval=RERANK_INTERVAL):
+        self.rerank_interval = rerank_interval
+        self.places = []
+        self._root = _Node()
+        self._ids = {}              # folded label / name / alias → place id
+        self._keys = []             # (key, place id) for fuzzy matching
+        self._grams = {}            # trigram → indexes into _keys
+        self._unknown = Counter()   # folded origin → times seen, until LEARN_THRESHOLD
+        self._pending = Counter()   # place id → popularity not yet applied (see rerank())
+        self._reranked_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.version = 0            # bumped whenever an answer could change
+
+    @classmethod
+    def from_places(cls, places, rerank_interval=RERANK_INTERVAL):
+        index = cls(rerank_interval)
+        for p in places:
+            label = f"{p['name']}, {p['region']}" if p.get('region') else p['name']
+            index._add(label, p.get('weight', 1), aliases=p.get('aka', []), info=p)
+        return index
+
+    # ── lookups ──
+
+    def suggest(self, query, limit=6):
+        """Best labels for what the user has typed so far: prefix hits by weight, then near misses."""
+        return self.labels(self.suggest_ids(fold(query), limit))
+
+    def suggest_ids(self, q, limit):
+        """Place ids for a folded query, best first."""
+        if not q:
+            return []
+        return self._add_near_misses(q, list(self._prefix_ids(q)[:limit]), limit)
+
+    def rank_among(self, q, candidates, limit):
+        """
+        suggest_ids(q), with the prefix hits taken from `candidates` — the
+        complete answer for a shorter prefix of q, which holds every place q
+        is a prefix of. Near misses are looked up afresh: which ones the
+        trigram filter finds depends on the whole query, not just its start.
+        """
+        ids = [place_id for place_id in candidates
+               if any(tail.startswith(q) for key in self.places[place_id].keys for tail in _tails(key))]
+        ids.sort(key=lambda i: (-self.places[i].weight, self.places[i].label))
+        return self._add_near_misses(q, ids[:limit], limit)
+
+    def has_prefix(self, q):
+        """True if some place has a key (or key tail) starting with q."""
+        return bool(self._prefix_ids(q))
+
+    def labels(self, ids):
+        return [self.places[i].label for i in ids]
+
+    def lookup(self, text):
+        """The place a label, name or alias refers to exactly, or None."""
+        place_id = self._ids.get(fold(text))
+        return self.places[place_id] if place_id is not None else None
+
+    def _prefix_ids(self, q):
+        node = self._root
+        for ch in q:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        return node.top
+
+    def _add_near_misses(self, q, ids, limit):
+        """Top up prefix hits with near misses while there is room."""
+        if len(ids) < limit and fuzzy_limit(q):
+            seen = set(ids)
+            for place_id in self._fuzzy_ids(q):
+                if place_id not in seen:
+                    ids.append(place_id)
+                    seen.add(place_id)
+                    if len(ids) == limit:
+                        break
+        return ids
+
+    def _fuzzy_ids(self, q):
+        limit = fuzzy_limit(q)
+        shared = Counter()
+        for gram in _trigrams(q):
+            for k in self._grams.get(gram, ()):
+                shared[k] += 1
+        best = {}
+        for k, _ in shared.most_common(FUZZY_CANDIDATES):
+            key, place_id = self._keys[k]
+            d = prefix_distance(q, key, limit)
+            if d <= limit and d < best.get(place_id, limit + 1):
+                best[place_id] = d
+        return sorted(best, key=lambda i: (best[i], -self.places[i].weight, self.places[i].label))
+
+    # ── updates ──
+
+    def add(self, label, weight=1):
+        """Add a place (e.g. one Gemini suggested) unless it is already known."""
+        label = ' '.join(str(label).split())
+        if not fold(label):
+            return
+        with self._lock:
+            if fold(label) not in self._ids:
+                self._add(label, weight)
+                self.version += 1
+
+    def learn(self, text, count=1):
+        """
+        Record an origin a user typed. Known places gain popularity (applied
+        by the next rerank()); unknown text becomes a suggestion once
+        LEARN_THRESHOLD users have typed it.
+        """
+        folded = fold(text)
+        if not folded:
+            return
+        with self._lock:
+            place_id = self._ids.get(folded)
+            if place_id is not None:
+                self._pending[place_id] += count
+                if time.monotonic() - self._reranked_at >= self.rerank_interval:
+                    self._rerank()
+                return
+            if len(self._unknown) >= 10000:
+                self._unknown.clear()  # mostly one-off typos; start counting afresh
+            self._unknown[folded] += count
+            if self._unknown[folded] >= LEARN_THRESHOLD:
+                seen = self._unknown.pop(folded)
+                self._add(' '.join(str(text).split()).title(), seen)
+                self.version += 1
+
+    def rerank(self):
+        """Apply the popularity learned since the last re-ranking now."""
+        with self._lock:
+            self._rerank()
+
+    def _rerank(self):
+        pending, self._pending = self._pending, Counter()
+        self._reranked_at = time.monotonic()
+        changed = False
+        for place_id, count in pending.items():
+            changed |= self._bump(place_id, count)
+        if changed:
+            self.version += 1
+
+    def _add(self, label, weight, aliases=(), info=None):
+        place_id = len(self.places)
+        place = _Place(label, weight, info)
+        self.places.append(place)
+        name = label.split(',')[0]
+        primary = {fold(name)} | {fold(a) for a in aliases}
+        primary.discard('')
+        place.keys = primary | {fold(label)}
+        place.fuzzy_keys = primary
+        for key in place.keys:
+            self._ids.setdefault(key, place_id)
+            for tail in _tails(key):
+                self._insert(tail, place_id)
+        for key in primary:
+            k = len(self._keys)
+            self._keys.append((key, place_id))
+            for gram in _trigrams(key):
+                self._grams.setdefault(gram, []).append(k)
+
+    def _bump(self, place_id, count):
+        """Raise a place's weight; True if any node's ranking changed."""
+        place = self.places[place_id]
+        place.weight += count
+        changed = False
+        for key in place.keys:
+            for tail in _tails(key):
+                changed |= self._insert(tail, place_id)
+        return changed
+
+    def _insert(self, key, place_id):
+        node = self._root
+        changed = self._offer(node, place_id)
+        for ch in key:
+            child = node.children.get(ch)
+            if child is None:
+                child = node.children[ch] = _Node()
+            node = child
+            changed |= self._offer(node, place_id)
+        return changed
+
+    def _offer(self, node, place_id):
+        ids = node.top if place_id in node.top else node.top + [place_id]
+        top = sorted(ids, key=lambda i: (-self.places[i].weight, self.places[i].label))[:TOP_N]
+        if top == node.top:
+            return False
+        # Swap in a new list so concurrent readers never see a half-sorted one
+        node.top = top
+        return True
+
+
+class SuggestionCache:
+    """
+    Size-bounded LRU of folded query → place ids, answering longer prefixes
+    from a complete shorter one. Entries are tagged with the index version,
+    so anything cached before a place was added or re-ranked is ignored.
+    """
+
+    def __init__(self, index, limit=6, max_entries=4096):
+        self.index = index
+        self.limit = limit
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = Counter()      # hit / derived / miss
+
+    def suggest(self, query):
+        q = fold(query)
+        if not q:
+            return []
+        version = self.index.version
+        entry = self._get(q, version)
+        if entry is not None:
+            self.stats['hit'] += 1
+            return self.index.labels(entry[0])
+        base = self._complete_prefix(q, version)
+        if base is not None:
+            ids = self.index.rank_among(q, base, self.limit)
+            self.stats['derived'] += 1
+        else:
+            ids = self.index.suggest_ids(q, self.limit)
+            self.stats['miss'] += 1
+        complete = len(ids) < self.limit and self.index.has_prefix(q)
+        self._set(q, version, ids, complete)
+        return self.index.labels(ids)
+
+    def _complete_prefix(self, q, version):
+        """Ids of the longest cached, complete answer for a shorter prefix of q."""
+        for end in range(len(q) - 1, 0, -1):
+            entry = self._get(q[:end], version)
+            if entry is not None and entry[1]:
+                return entry[0]
+        return None
+
+    def _get(self, q, version):
+        """(ids, complete) for a folded query, or None."""
+        with self._lock:
+            entry = self._data.get(q)
+            if entry is None:
+                return None
+            if entry[0] != version:
+                del self._data[q]
+                return None
+            self._data.move_to_end(q)
+            return entry[1:]
+
+    def _set(self, q, version, ids, complete):
+        with self._lock:
+            self._data[q] = (version, ids, complete)
+            self._data.move_to_end(q)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _tails(key):
+    """The key and each suffix starting at a later word: 'navi mumbai' → ['navi mumbai', 'mumbai']."""
+    words = key.split()
+    return [' '.join(words[i:]) for i in range(len(words))]
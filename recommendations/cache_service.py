@@ -0,0 +1,238 @@
+"""
+GypsyCompass Response Cache
+===========================
+Small TTL + LRU cache used in front of the slow Gemini calls.
+
+Two interchangeable backends:
+    memory  — per-process OrderedDict (default, zero setup)
+    sqlite  — single file shared by every worker on the host
+
+Configure in settings / .env:
+    AI_CACHE_BACKEND=sqlite
+    AI_CACHE_TTL=21600
+    AI_CACHE_MAX_ENTRIES=500
+"""
+
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache with a hard TTL. Thread-safe."""
+
+    def __init__(self, ttl=21600, max_entries=500):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (value, stored_at) or None if missing/expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if time.time() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return copy.deepcopy(value), stored_at
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (copy.deepcopy(value), time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCacheBackend:
+    """
+    File-backed LRU cache with a hard TTL.
+    Survives restarts and is shared by all workers on the same host.
+    """
+
+    def __init__(self, path, namespace='default', ttl=21600, max_entries=500):
+        self.path = str(path)
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " stored_at REAL NOT NULL, accessed_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, stored_at FROM response_cache WHERE namespace=? AND key=?",
+            (self.namespace, key),
+        ).fetchone()
+        if row is None:
+            return None
+        value, stored_at = row
+        if now - stored_at > self.ttl:
+            self.delete(key)
+            return None
+        conn.execute(
+            "UPDATE response_cache SET accessed_at=? WHERE namespace=? AND key=?",
+            (now, self.namespace, key),
+        )
+        return json.loads(value), stored_at
+
+    def set(self, key, value):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO response_cache (namespace, key, value, stored_at, accessed_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (self.namespace, key, json.dumps(value, ensure_ascii=False), now, now),
+        )
+        # Evict expired rows first, then the least recently used beyond the cap
+        conn.execute(
+            "DELETE FROM response_cache WHERE namespace=? AND stored_at < ?",
+            (self.namespace, now - self.ttl),
+        )
+        conn.execute(
+            "DELETE FROM response_cache WHERE namespace=? AND key IN ("
+            " SELECT key FROM response_cache WHERE namespace=?"
+            " ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.max_entries),
+        )
+
+    def delete(self, key):
+        self._conn().execute(
+            "DELETE FROM response_cache WHERE namespace=? AND key=?", (self.namespace, key)
+        )
+
+    def clear(self):
+        self._conn().execute("DELETE FROM response_cache WHERE namespace=?", (self.namespace,))
+
+    def __len__(self):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM response_cache WHERE namespace=?", (self.namespace,)
+        ).fetchone()[0]
+
+
+def build_cache(namespace, ttl=None, max_entries=None):
+    """Create the cache backend selected by settings.AI_CACHE_BACKEND."""
+    backend = getattr(settings, 'AI_CACHE_BACKEND', 'memory').lower()
+    ttl = ttl if ttl is not None else getattr(settings, 'AI_CACHE_TTL', 21600)
+    max_entries = max_entries if max_entries is not None else getattr(settings, 'AI_CACHE_MAX_ENTRIES', 500)
+    if backend == 'sqlite':
+        return SQLiteCacheBackend(settings.AI_CACHE_PATH, namespace=namespace, ttl=ttl, max_entries=max_entries)
+    if backend != 'memory':
+        print(f"[Cache] Unknown AI_CACHE_BACKEND '{backend}' — using memory")
+    return MemoryCacheBackend(ttl=ttl, max_entries=max_entries)
+
+
+# ─────────────────────────────────────────────────────────
+#  CACHE KEYS
+# ─────────────────────────────────────────────────────────
+
+# Traveler names shorter than this are never swapped in cached text
+SWAPPABLE_NAME_MIN_LENGTH = 4
+
+
+def _fold(value):
+    """Case-fold and collapse whitespace so 'Chennai,  tamil nadu' == 'chennai, Tamil Nadu'."""
+    return ' '.join(str(value or '').split()).casefold()
+
+
+def swappable_name(name):
+    """
+    Whether a traveler name is long enough to be swapped in cached text
+    without also rewriting ordinary words ("A", "Al" would). Requests under
+    shorter names get cache entries of their own instead.
+    """
+    return len(str(name or '').strip()) >= SWAPPABLE_NAME_MIN_LENGTH
+
+
+def _hash_key(parts):
+    raw = json.dumps(parts, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def recommendations_cache_key(user_prefs):
+    """
+    Canonical key for a recommendations request.
+    Ignores 'name' (unless it is too short to swap, see swappable_name()),
+    sorts/case-folds styles and case-folds the origin.
+    """
+    is_group = user_prefs.get('travel_type', 'solo') == 'group'
+    styles = user_prefs.get('destination_styles') or []
+    parts = {
+        'budget': float(user_prefs.get('budget', 50000)),
+        'currency': str(user_prefs.get('currency', 'INR')).strip().upper(),
+        'travel_type': _fold(user_prefs.get('travel_type', 'solo')),
+        'group_size': int(user_prefs.get('group_size', 1)) if is_group else 1,
+        'travel_scope': _fold(user_prefs.get('travel_scope', 'within_country')),
+        'num_days': int(user_prefs.get('num_days', 5)),
+        'food_accommodation': _fold(user_prefs.get('food_accommodation', 'with')),
+        'from_location': _fold(user_prefs.get('from_location', '')),
+        'travel_medium': _fold(user_prefs.get('travel_medium', 'any')),
+        'destination_styles': sorted({_fold(s) for s in styles if _fold(s)}),
+    }
+    name = str(user_prefs.get('name') or '').strip()
+    if name and not swappable_name(name):
+        parts['name'] = name
+    return _hash_key(parts)
+
+
+def ranking_seed(user_prefs):
+    """
+    64-bit seed for the static ranker's tie-break. Depends only on what
+    decides the ranking (scope, styles, origin), not on budget or name, so
+    the same trip always ranks the same way at any budget.
+    """
+    digest = _hash_key({
+        'travel_scope': _fold(user_prefs.get('travel_scope', 'within_country')),
+        'from_location': _fold(user_prefs.get('from_location', '')),
+        'destination_styles': sorted({_fold(s) for s in user_prefs.get('destination_styles') or [] if _fold(s)}),
+    })
+    return int(digest[:16], 16)
+
+
+def details_cache_key(destination_name, user_prefs):
+    """Key for destination details: (destination, origin, medium, currency, days, group size)."""
+    is_group = user_prefs.get('travel_type', 'solo') == 'group'
+    return _hash_key({
+        'destination': _fold(destination_name),
+        'from_location': _fold(user_prefs.get('from_location', 'India')),
+        'travel_medium': _fold(user_prefs.get('travel_medium', 'any')),
+        'currency': str(user_prefs.get('currency', 'INR')).strip().upper(),
+        'num_days': int(user_prefs.get('num_days', 5)),
+        'group_size': int(user_prefs.get('group_size', 1)) if is_group else 1,
+    })
@@ -0,0 +1,290 @@
+"""
+Columnar view of the destination catalog
+========================================
+The static recommender only needs a few numbers per destination to rank
+and price it: base cost, cost per day, scope, style mask and coordinates.
+Catalog keeps those as NumPy columns, so a request prices, classifies and
+ranks the whole catalog with array operations. Response dicts are built
+only for the handful of winners.
+
+Base costs assume the traveler starts from the gateway hub nearest the
+destination (the "~600 km from Mumbai" in its distance label). With a known
+origin, the difference between the fare from there and the fare from that
+hub is added to each trip, and destinations within a style-score level are
+ordered by distance band — cheap nearby trips first. A trip never costs less
+than the stay itself, and one to where the traveler already is (the origin's
+own name, or within LOCAL_KM) has no transport leg.
+"""
+
+import hashlib
+import json
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from .geo import (
+    DISTANCE_BANDS_KM, LOCAL_KM, SURFACE_FARE_PER_KM, GeoIndex,
+    distance_bands, haversine_km, transport_fares, transport_mode,
+)
+from .style_index import StyleIndex
+
+DATA_DIR = Path(__file__).resolve().parent / 'data'
+
+_RNG = np.random.default_rng()
+
+
+def load_data(filename):
+    """Parse one of the static JSON files shipped in recommendations/data/."""
+    with open(DATA_DIR / filename, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class Catalog:
+    def __init__(self, destinations, aliases, hubs=()):
+        self.destinations = destinations
+        self.style = StyleIndex(destinations, aliases)
+        self.base_cost = np.array([d['base_cost'] for d in destinations], dtype=np.float64)
+        self.cost_per_day = np.array([d['cost_per_day'] for d in destinations], dtype=np.float64)
+        self.international = np.array([bool(d.get('international', False)) for d in destinations])
+        self.lat = np.array([d.get('lat', np.nan) for d in destinations], dtype=np.float64)
+        self.lon = np.array([d.get('lon', np.nan) for d in destinations], dtype=np.float64)
+        # Islands etc. that can only be reached by flight ("access": "air")
+        self.air_only = np.array([d.get('access') == 'air' for d in destinations])
+        # Style column: row → distinct style mask (see StyleIndex)
+        self.style_mask_id = self.style.mask_ids
+
+        # Stable per-destination hash for seeded tie-breaks (independent of row order)
+        self.name_hash = np.array([_name_hash(d['name']) for d in destinations], dtype=np.uint64)
+        self._rows_by_name = {d['name'].lower(): row for row, d in enumerate(destinations)}
+
+        self.all = np.arange(len(destinations))
+        self.domestic = np.flatnonzero(~self.international)
+        self.abroad = np.flatnonzero(self.international)
+
+        # Gateway hubs (places.json entries marked "hub"), their distance to
+        # every destination, and each destination's nearest one — the trip
+        # its base cost assumes
+        self.hub_names = [h['name'] for h in hubs]
+        self.hubs = GeoIndex([h['lat'] for h in hubs], [h['lon'] for h in hubs])
+        self.hub_dest_km = haversine_km(self.hubs.lat[:, None], self.hubs.lon[:, None], self.lat, self.lon)
+        self.hub_km = self.hub_dest_km.min(axis=0) if len(self.hubs) else np.zeros(len(destinations))
+        self.nearest_hub = lru_cache(maxsize=4096)(self._nearest_hub)
+
+    def __len__(self):
+        return len(self.destinations)
+
+    def pool(self, travel_scope):
+        """Row indices for a travel scope (International strictly shows international destinations)."""
+        if travel_scope == 'within_country':
+            return self.domestic
+        return self.abroad if self.abroad.size else self.all
+
+    def row_named(self, name):
+        """Row of the destination called name (any case), or -1."""
+        return self._rows_by_name.get(str(name or '').lower(), -1)
+
+    def trip_totals(self, num_days, multiplier, extra=0.0):
+        """
+        INR cost of num_days trips (arrays broadcasting against the catalog):
+        the 5-day base scaled by days, then by travel medium, plus the fare
+        difference from fares(); never less than the stay alone.
+        """
+        stay = self.cost_per_day * num_days * multiplier
+        adjusted = np.maximum(self.base_cost + (num_days - 5) * self.cost_per_day, self.cost_per_day * num_days)
+        return np.maximum(adjusted * multiplier + extra, stay)
+
+    def _nearest_hub(self, lat, lon):
+        """(hub row, km) of the gateway hub nearest to a point, or (None, 0.0)."""
+        if not len(self.hubs):
+            return None, 0.0
+        rows, km = self.hubs.nearest(lat, lon)
+        return int(rows[0]), float(km[0])
+
+    def fares(self, km, hubs, leg_km, medium, multiplier=1.0, home=None):
+        """
+        Round-trip fares by one medium for a block of origins: km is
+        (origins × catalog) great-circle distances, hubs / leg_km each
+        origin's nearest hub and the distance to it, multiplier the cost
+        multiplier (scalar or one per origin) and home the row each origin
+        itself is (-1 if none). Returns (fare, extra): the INR fare, and the
+        fare minus the fare from each row's nearest hub, scaled by the
+        multiplier like the base cost that already includes it.
+        """
+        fare = transport_fares(km, medium)
+        reference = transport_fares(self.hub_km, medium)
+
+        air = self.air_only
+        if air.any():
+            fare = np.where(air, transport_fares(km, 'flight'), fare)
+            reference = np.where(air, transport_fares(self.hub_km, 'flight'), reference)
+
+        abroad = self.international
+        if abroad.any() and len(self.hubs):
+            # International trips fly from the origin's nearest hub, after a
+            # surface (or short-hop) leg to get there
+            leg = transport_fares(leg_km, medium if medium in SURFACE_FARE_PER_KM else 'any')
+            flown = transport_fares(self.hub_dest_km[hubs], 'flight')
+            fare = np.where(abroad, leg[:, None] + flown, fare)
+            reference = np.where(abroad, transport_fares(self.hub_km, 'flight'), reference)
+
+        # Already there: no transport leg at all
+        local = km < LOCAL_KM
+        if home is not None:
+            home = np.asarray(home)
+            found = np.flatnonzero(home >= 0)
+            local[found, home[found]] = True
+        fare = np.where(local, 0.0, fare)
+
+        multiplier = np.reshape(np.asarray(multiplier, dtype=np.float64), (-1, 1))
+        # Rows without coordinates keep their catalog price
+        return fare, np.nan_to_num(fare - reference * multiplier)
+
+    def transport_mode(self, row, km, medium, fare):
+        """Mode a trip to one row is priced by (see fares()), or None if it has no transport leg."""
+        if not fare:
+            return None
+        return 'flight' if self.international[row] or self.air_only[row] else transport_mode(km, medium)
+
+    def pick_many(self, queries, within_k=6, over_k=3):
+        """
+        Rank the scope pool by style score and pick the fallback winners for
+        each query, a dict of travel_scope, styles, num_days, multiplier,
+        budget_inr, seed, origin, origin_name and medium. Per query returns (within, over)
+        as lists of (destination, cost_inr, trip): up to within_k that fit
+        the budget and up to over_k at most 50% over it. seed=None breaks
+        ties randomly; otherwise by tie_break(seed).
+
+        With origin=(lat, lon), costs include the transport difference from
+        fares() and nearer distance bands rank first within a score level;
+        trip is then {'km', 'fare', 'mode', 'via'}, otherwise None.
+
+        All queries are answered in one pass: scores, costs, distances, fares
+        and ranking orders are (queries × catalog) matrices, and only the
+        budget fix-ups run per query.
+        """
+        n_queries, n_rows = len(queries), len(self)
+        if not n_queries:
+            return []
+
+        in_pool = np.zeros((n_queries, n_rows), dtype=bool)
+        for i, q in enumerate(queries):
+            in_pool[i, self.pool(q['travel_scope'])] = True
+        # One cached score vector per distinct style selection
+        scores = np.stack([self.style.scores(tuple(sorted(q['styles']))) for q in queries])
+
+        num_days = np.array([q['num_days'] for q in queries], dtype=np.float64)[:, None]
+        multiplier = np.array([q['multiplier'] for q in queries], dtype=np.float64)[:, None]
+        budget = np.array([q['budget_inr'] for q in queries], dtype=np.float64)[:, None]
+        extra = np.zeros((n_queries, n_rows))
+
+        # Distances from every query's origin, then fares per travel medium
+        bands = np.zeros((n_queries, n_rows))
+        km = fare = via = None
+        located = [i for i, q in enumerate(queries) if q.get('origin') is not None]
+        if located:
+            origins = np.array([queries[i]['origin'] for i in located], dtype=np.float64)
+            km = np.full((n_queries, n_rows), np.nan)
+            fare = np.zeros((n_queries, n_rows))
+            km[located] = haversine_km(origins[:, :1], origins[:, 1:], self.lat, self.lon)
+            bands[located] = distance_bands(np.nan_to_num(km[located]))
+            nearest = [self.nearest_hub(float(lat), float(lon)) for lat, lon in origins]
+            hubs = np.array([hub or 0 for hub, _ in nearest], dtype=np.intp)
+            leg_km = np.array([d for _, d in nearest])
+            home = np.array([self.row_named(queries[i].get('origin_name')) for i in located], dtype=np.intp)
+            via = {i: self.hub_names[hub] for i, (hub, _) in zip(located, nearest) if hub is not None}
+            by_medium = {}
+            for j, i in enumerate(located):
+                by_medium.setdefault(queries[i].get('medium', 'any'), []).append(j)
+            for medium, block in by_medium.items():
+                rows = [located[j] for j in block]
+                fare[rows], extra[rows] = self.fares(
+                    km[rows], hubs[block], leg_km[block], medium, multiplier[rows], home[block],
+                )
+        costs = self.trip_totals(num_days, multiplier, extra)
+
+        # Score DESC, then distance band ASC; a fraction in [0, 1) orders
+        # destinations within a band
+        seeds = [q.get('seed') for q in queries]
+        seeded = np.array([s is not None for s in seeds])
+        jitter = np.empty((n_queries, n_rows))
+        if seeded.any():
+            jitter[seeded] = self.tie_break(
+                self.all, np.array([s for s in seeds if s is not None], dtype=np.uint64)[:, None]
+            )
+        if not seeded.all():
+            jitter[~seeded] = _RNG.random((int((~seeded).sum()), n_rows))
+        order = (bands + jitter) / (len(DISTANCE_BANDS_KM) + 1) - scores
+
+        within = in_pool & (costs <= budget)
+        over = in_pool & (costs > budget) & (costs <= budget * 1.5)
+        # Skip non-matching if styles were selected
+        has_styles = np.array([bool(q['styles']) for q in queries])[:, None]
+        matching = (scores > 0) | ~has_styles
+
+        all_within = top_k_rows(order, matching & within, within_k)
+        all_over = top_k_rows(order, matching & over, over_k)
+
+        def picked(i, rows):
+            out = []
+            for row in rows:
+                trip = None
+                if km is not None and not np.isnan(km[i, row]):
+                    trip = {
+                        'km': float(km[i, row]), 'fare': float(fare[i, row]),
+                        'mode': self.transport_mode(row, km[i, row], queries[i].get('medium', 'any'), fare[i, row]),
+                        'via': via.get(i) if self.international[row] else None,
+                    }
+                out.append((self.destinations[row], float(costs[i, row]), trip))
+            return out
+
+        results = []
+        for i in range(n_queries):
+            picks_within, picks_over = all_within[i], all_over[i]
+            # Emergency: if no within-budget matches, relax style filter (ignore score > 0)
+            if not picks_within.size:
+                picks_within = top_k(order[i], np.flatnonzero(within[i]), 4)
+            # Ensure at least 2 over_budget suggestions
+            if picks_over.size < 2:
+                rest = np.setdiff1d(np.flatnonzero(over[i]), picks_over)
+                picks_over = np.concatenate([picks_over, top_k(order[i], rest, over_k - picks_over.size)])
+            results.append((picked(i, picks_within), picked(i, picks_over)))
+        return results
+
+    def tie_break(self, rows, seed):
+        """Per-row fraction in [0, 1) from a stable hash of (seed, destination name)."""
+        x = _mix64(self.name_hash[rows] ^ np.uint64(seed))
+        return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def _name_hash(name):
+    return int.from_bytes(hashlib.blake2b(name.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _mix64(x):
+    """splitmix64 finalizer over a uint64 array (wrapping arithmetic)."""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def top_k_rows(order, mask, k):
+    """Per row of a matrix, top_k() over the columns where mask is True."""
+    if k <= 0 or not order.shape[1]:
+        return [np.empty(0, dtype=np.intp)] * order.shape[0]
+    k = min(k, order.shape[1])
+    masked = np.where(mask, order, np.inf)
+    lines = np.arange(order.shape[0])[:, None]
+    picked = np.argpartition(masked, k - 1, axis=1)[:, :k]
+    picked = picked[lines, np.argsort(masked[lines, picked], axis=1, kind='stable')]
+    found = np.isfinite(masked[lines, picked])
+    return [row[ok] for row, ok in zip(picked, found)]
+
+
+def top_k(order, candidates, k):
+    """The k candidates with the smallest `order`, sorted by it (argpartition, not a full sort)."""
+    if k <= 0 or not candidates.size:
+        return candidates[:0]
+    if candidates.size > k:
+        candidates = candidates[np.argpartition(order[candidates], k - 1)[:k]]
+    return candidates[np.argsort(order[candidates], kind='stable')]
@@ -0,0 +1,171 @@
+"""
+Circuit breaker for upstream AI calls
+=====================================
+Tracks the outcome and latency of recent Gemini calls in a sliding window.
+
+    closed     → calls flow; opens when the recent error rate crosses the
+                 threshold (or immediately on a 429 rate-limit response)
+    open       → calls are refused for `open_seconds`, so requests go
+                 straight to the static fallback instead of piling up
+    half_open  → a few trial calls are let through; success closes the
+                 breaker, failure (or abandoning the call) re-opens it. A
+                 trial still unsettled after `probe_timeout` seconds gives
+                 up its slot, so a lost call can't wedge the breaker
+
+It also suggests a per-call timeout from the observed latency percentiles
+(tracked per call kind, since a grounded recommendations prompt and an
+autocomplete prompt have very different normal latencies), so a degraded
+upstream can't hold a worker for the SDK's full default.
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, window=20, min_calls=5, failure_threshold=0.5,
+                 open_seconds=30, half_open_probes=1, probe_timeout=120.0,
+                 timeout_floor=8.0, timeout_ceiling=60.0, timeout_factor=2.0):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.probe_timeout = probe_timeout
+        self.timeout_floor = timeout_floor
+        self.timeout_ceiling = timeout_ceiling
+        self.timeout_factor = timeout_factor
+
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)     # True = success
+        # kind → seconds of recent successful calls
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_started = 0.0
+        self._rejected = 0
+        self._last_error = ''
+
+    # ── gatekeeping ──
+
+    def allow_request(self):
+        """True if a call may go upstream right now."""
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self._rejected += 1
+                    return False
+                self._state = self.HALF_OPEN
+                self._probes_in_flight = 0
+            if self._state == self.HALF_OPEN:
+                now = time.monotonic()
+                if self._probes_in_flight >= self.half_open_probes:
+                    if now - self._probe_started < self.probe_timeout:
+                        self._rejected += 1
+                        return False
+                    print(f"[Breaker:{self.name}] ⏱️ Trial call never settled — reclaiming its slot")
+                    self._probes_in_flight = 0
+                self._probes_in_flight += 1
+                self._probe_started = now
+            return True
+
+    def record_success(self, latency=None, kind='default'):
+        """latency=None for calls whose duration says nothing about health (streams)."""
+        with self._lock:
+            self._outcomes.append(True)
+            if latency is not None:
+                self._latencies[kind].append(latency)
+            if self._state == self.HALF_OPEN:
+                print(f"[Breaker:{self.name}] ✅ Trial call succeeded — closing circuit")
+                self._state = self.CLOSED
+                self._outcomes.clear()
+                self._outcomes.append(True)
+
+    def record_failure(self, error=None, rate_limited=False):
+        with self._lock:
+            self._outcomes.append(False)
+            self._last_error = str(error or '')[:200]
+            if self._state == self.HALF_OPEN:
+                self._trip('trial call failed')
+            elif self._state == self.CLOSED:
+                if rate_limited:
+                    self._trip('upstream is rate-limiting (429)')
+                elif len(self._outcomes) >= self.min_calls and self._error_rate() >= self.failure_threshold:
+                    self._trip(f'error rate {self._error_rate():.0%}')
+
+    def record_abandoned(self):
+        """
+        A call given up before its outcome was known (client disconnected,
+        task cancelled). A trial call counts as failed, which frees the
+        half-open slot; otherwise it says nothing about upstream health.
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._outcomes.append(False)
+                self._trip('trial call abandoned')
+
+    def _trip(self, reason):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        print(f"[Breaker:{self.name}] 🔌 Circuit OPEN for {self.open_seconds}s — {reason}")
+
+    # ── adaptive timeout ──
+
+    def suggested_timeout(self, kind='default'):
+        """Per-call timeout (seconds): p95 of recent successes of this kind × factor, clamped."""
+        with self._lock:
+            p95 = _percentile(self._latencies.get(kind), 0.95)
+        if p95 is None:
+            return self.timeout_ceiling
+        return min(self.timeout_ceiling, max(self.timeout_floor, p95 * self.timeout_factor))
+
+    # ── reporting ──
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return self.HALF_OPEN
+            return self._state
+
+    def _error_rate(self):
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def snapshot(self):
+        """JSON-friendly state for the health endpoint."""
+        state = self.state
+        with self._lock:
+            snap = {
+                'state': state,
+                'recent_calls': len(self._outcomes),
+                'error_rate': round(self._error_rate(), 3),
+                'rejected_calls': self._rejected,
+                'last_error': self._last_error,
+            }
+            if state != self.CLOSED:
+                snap['retry_in_seconds'] = max(0, round(self.open_seconds - (time.monotonic() - self._opened_at)))
+            latencies = {kind: list(values) for kind, values in self._latencies.items()}
+        snap['latency'] = {
+            kind: {
+                'p50_ms': round(_percentile(values, 0.50) * 1000),
+                'p95_ms': round(_percentile(values, 0.95) * 1000),
+                'timeout_seconds': round(self.suggested_timeout(kind), 1),
+            }
+            for kind, values in latencies.items() if values
+        }
+        return snap
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
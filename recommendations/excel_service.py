@@ -1,24 +1,42 @@
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.utils import get_column_letter
 from django.conf import settings
 from pathlib import Path
 import datetime
-import requests
+import os
+import tempfile
+import threading
+
+from .geoip import get_ip_locator
+from .journal import Journal
+
+# Sheet columns after "S.No": (header, journal record key, width). S.No is
+# the row number, assigned when the journal is compacted into the workbook.
+COLUMNS = [
+    ("User Name", 'name', 20),
+    ("IP Address", 'ip_address', 18),
+    ("IP-Based Location", 'ip_location', 30),
+    ("Start Location (User)", 'from_location', 25),
+    ("Budget", 'budget', 12),
+    ("Currency", 'currency', 10),
+    ("Travel Type", 'travel_type', 12),
+    ("Group Size", 'group_size', 12),
+    ("Travel Scope", 'travel_scope', 18),
+    ("No. of Days", 'num_days', 12),
+    ("Food & Accommodation", 'food_accommodation', 22),
+    ("Travel Medium", 'travel_medium', 15),
+    ("Destination Styles", 'destination_styles', 40),
+    ("Timestamp", 'timestamp', 25),
+]
+
+_journal = None
+_journal_lock = threading.Lock()
 
 def get_user_ip_location(ip_address):
-    """Get user's approximate location from IP address."""
-    try:
-        # Use free ipapi service
-        response = requests.get(f'https://ipapi.co/{ip_address}/json/', timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            city = data.get('city', 'Unknown')
-            region = data.get('region', '')
-            country = data.get('country_name', 'Unknown')
-            return f"{city}, {region}, {country}".strip(', ')
-    except:
-        pass
-    return 'Unknown'
+    """Get user's approximate location from IP address (offline range lookup, cached; see geoip.py)."""
+    return get_ip_locator().locate(ip_address)
 
 def get_client_ip(request):
     """Extract real IP from request."""
@@ -29,113 +47,133 @@ def get_client_ip(request):
         ip = request.META.get('REMOTE_ADDR', '127.0.0.1')
     return ip
 
-def init_excel():
-    """Initialize the Excel workbook with headers if it doesn't exist."""
-    excel_path = Path(settings.USER_DATA_EXCEL)
-    if excel_path.exists():
-        try:
-            return openpyxl.load_workbook(excel_path)
-        except:
-            pass # Corruption perhaps? proceed to recreate
+def get_user_data_journal():
+    """Per-process writer for USER_DATA_JOURNAL, opened on first use."""
+    global _journal
+    if _journal is None:
+        with _journal_lock:
+            if _journal is None:
+                _journal = Journal(
+                    settings.USER_DATA_JOURNAL,
+                    fsync_interval=getattr(settings, 'USER_DATA_JOURNAL_FSYNC_INTERVAL', 1.0),
+                )
+    return _journal
+
+def user_data_record(user_data, ip_address, ip_location):
+    """The journal record (one sheet row, without S.No) for a trip request."""
+    styles_list = user_data.get('destination_styles', [])
+    styles_str = ', '.join(styles_list) if isinstance(styles_list, list) else str(styles_list)
+
+    return {
+        'name': user_data.get('name', 'Unknown'),
+        'ip_address': ip_address,
+        'ip_location': ip_location,
+        'from_location': user_data.get('from_location', 'Not specified'),
+        'budget': user_data.get('budget', 'Not specified'),
+        'currency': user_data.get('currency', 'INR'),
+        'travel_type': user_data.get('travel_type', 'solo').capitalize(),
+        'group_size': user_data.get('group_size', 1) if user_data.get('travel_type') == 'group' else 'Solo',
+        'travel_scope': user_data.get('travel_scope', 'within_country').replace('_', ' ').title(),
+        'num_days': user_data.get('num_days', 'Not specified'),
+        'food_accommodation': user_data.get('food_accommodation', 'Not specified').replace('_', ' ').title(),
+        'travel_medium': user_data.get('travel_medium', 'Not specified').replace('_', ' ').title(),
+        'destination_styles': styles_str,
+        'timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+def compact_user_data():
+    """
+    Move journaled trip requests into USER_DATA_EXCEL. The workbook is
+    rewritten in one streaming pass with openpyxl's write-only mode (existing
+    rows, then the journal's, renumbered and styled) and swapped in
+    atomically; sealed journal segments are deleted only after that.
+    Returns the number of rows added.
+    """
+    journal = get_user_data_journal()
+    with journal.exclusive():
+        journal.rotate()
+        segments = journal.segments()
+        if not segments:
+            return 0
 
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "User Travel Data"
+        excel_path = Path(settings.USER_DATA_EXCEL)
+        old = openpyxl.load_workbook(excel_path, read_only=True) if excel_path.exists() else None
+        try:
+            existing = ()
+            if old is not None:
+                existing = (row[1:len(COLUMNS) + 1] for row in old.active.iter_rows(min_row=2, values_only=True))
+            journaled = (
+                tuple(record.get(key) for _, key, _ in COLUMNS)
+                for segment in segments for record in Journal.read(segment)
+            )
+            added = _write_workbook(excel_path, existing, journaled)
+        finally:
+            if old is not None:
+                old.close()
+
+        for segment in segments:
+            segment.unlink()
+        return added
+
+def _write_workbook(excel_path, existing, journaled):
+    """Write header + rows to excel_path (via a temp file); returns how many journaled rows were written."""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("User Travel Data")
 
     # Style definitions
     header_font = Font(bold=True, color="FFFFFF", size=12)
     header_fill = PatternFill(start_color="1a6b4a", end_color="1a6b4a", fill_type="solid")
     header_alignment = Alignment(horizontal='center', vertical='center')
+    data_alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
     thin_border = Border(
         left=Side(style='thin'),
         right=Side(style='thin'),
         top=Side(style='thin'),
         bottom=Side(style='thin')
     )
-
-    headers = [
-        "S.No", "User Name", "IP Address", "IP-Based Location",
-        "Start Location (User)", "Budget", "Currency", "Travel Type",
-        "Group Size", "Travel Scope", "No. of Days", "Food & Accommodation",
-        "Travel Medium", "Destination Styles", "Timestamp"
+    # Alternate row colors
+    row_fills = [
+        PatternFill(start_color="E8F5E9", end_color="E8F5E9", fill_type="solid"),
+        PatternFill(start_color="FFFFFF", end_color="FFFFFF", fill_type="solid"),
     ]
 
-    col_widths = [6, 20, 18, 30, 25, 12, 10, 12, 12, 18, 12, 22, 15, 40, 25]
-
-    for col_idx, (header, width) in enumerate(zip(headers, col_widths), start=1):
-        cell = ws.cell(row=1, column=col_idx, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
+    headers = ["S.No"] + [header for header, _, _ in COLUMNS]
+    col_widths = [6] + [width for _, _, width in COLUMNS]
+    for col_idx, width in enumerate(col_widths, start=1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = width
+
+    def styled(value, font=None, fill=None, alignment=None):
+        cell = WriteOnlyCell(ws, value=value)
+        if font:
+            cell.font = font
+        cell.fill = fill
+        cell.alignment = alignment
         cell.border = thin_border
-        ws.column_dimensions[ws.cell(row=1, column=col_idx).column_letter].width = width
+        return cell
 
     ws.row_dimensions[1].height = 30
-    wb.save(excel_path)
-    return wb
+    ws.append([styled(h, header_font, header_fill, header_alignment) for h in headers])
 
-def save_user_data(user_data, ip_address, ip_location):
-    """Save user trip planning data to Excel."""
-    try:
-        excel_path = Path(settings.USER_DATA_EXCEL)
+    s_no = 0
+
+    def append_rows(rows):
+        nonlocal s_no
+        start = s_no
+        for row in rows:
+            s_no += 1
+            ws.row_dimensions[s_no + 1].height = 20
+            ws.append([styled(v, fill=row_fills[s_no % 2], alignment=data_alignment) for v in (s_no, *row)])
+        return s_no - start
 
-        if excel_path.exists():
-            wb = openpyxl.load_workbook(excel_path)
-            ws = wb.active
-        else:
-            wb = init_excel()
-            ws = wb.active
-
-        # Get next row
-        next_row = ws.max_row + 1
-        s_no = next_row - 1  # Subtract header row
-
-        # Style for data rows
-        data_alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-
-        # Alternate row colors
-        if s_no % 2 == 0:
-            row_fill = PatternFill(start_color="E8F5E9", end_color="E8F5E9", fill_type="solid")
-        else:
-            row_fill = PatternFill(start_color="FFFFFF", end_color="FFFFFF", fill_type="solid")
-
-        styles_list = user_data.get('destination_styles', [])
-        styles_str = ', '.join(styles_list) if isinstance(styles_list, list) else str(styles_list)
-
-        row_data = [
-            s_no,
-            user_data.get('name', 'Unknown'),
-            ip_address,
-            ip_location,
-            user_data.get('from_location', 'Not specified'),
-            user_data.get('budget', 'Not specified'),
-            user_data.get('currency', 'INR'),
-            user_data.get('travel_type', 'solo').capitalize(),
-            user_data.get('group_size', 1) if user_data.get('travel_type') == 'group' else 'Solo',
-            user_data.get('travel_scope', 'within_country').replace('_', ' ').title(),
-            user_data.get('num_days', 'Not specified'),
-            user_data.get('food_accommodation', 'Not specified').replace('_', ' ').title(),
-            user_data.get('travel_medium', 'Not specified').replace('_', ' ').title(),
-            styles_str,
-            datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        ]
-
-        for col_idx, value in enumerate(row_data, start=1):
-            cell = ws.cell(row=next_row, column=col_idx, value=value)
-            cell.alignment = data_alignment
-            cell.border = thin_border
-            cell.fill = row_fill
-
-        ws.row_dimensions[next_row].height = 20
-
-        wb.save(excel_path)
-        return True
-    except Exception as e:
-        print(f"Error saving to Excel: {e}")
-        return False
+    append_rows(existing)
+    added = append_rows(journaled)
+
+    fd, tmp = tempfile.mkstemp(dir=excel_path.parent, prefix=excel_path.stem, suffix='.xlsx.tmp')
+    os.close(fd)
+    try:
+        wb.save(tmp)
+        os.replace(tmp, excel_path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return added
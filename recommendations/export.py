@@ -0,0 +1,228 @@
+"""
+TripRequest export
+==================
+Streams TripRequest rows in a date range out as CSV, xlsx or Parquet in
+constant memory, however large the table: rows come from
+QuerySet.iterator(chunk_size=…) as tuples and go straight to the writer.
+
+    csv      produced chunk by chunk; an HTTP download starts at once
+    xlsx     openpyxl write-only mode into a temporary file, then streamed
+    parquet  pyarrow ParquetWriter, one row group per chunk, into a
+             temporary file, then streamed (optional: pip install pyarrow)
+
+Used by `manage.py export_trip_requests` and the staff-only
+/api/export/trip-requests/ endpoint.
+"""
+
+import csv
+import datetime
+import io
+import tempfile
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import TripRequest
+
+FIELDS = [
+    'id', 'created_at', 'name', 'ip_address', 'ip_location', 'from_location',
+    'budget', 'currency', 'travel_type', 'group_size', 'travel_scope', 'num_days',
+    'food_accommodation', 'travel_medium', 'destination_styles',
+]
+
+# format → (content type, file extension)
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+_COPY_BLOCK = 64 * 1024
+
+
+class ExportError(ValueError):
+    """Bad export arguments (unknown format, unparseable date, missing pyarrow)."""
+
+
+def parse_bound(value, end=False):
+    """
+    Aware datetime for a date range bound: 'YYYY-MM-DD' or an ISO datetime
+    (naive ones are in TIME_ZONE). An end date covers that whole day.
+    """
+    if not value:
+        return None
+    # Dates first: parse_datetime() also takes a bare date, as midnight,
+    # which would cut the end day off
+    try:
+        day = parse_date(value)
+        moment = None if day else parse_datetime(value)
+    except ValueError:  # well formed but impossible, e.g. 2025-02-30
+        day = moment = None
+    if day is not None:
+        moment = datetime.datetime.combine(day + datetime.timedelta(days=1 if end else 0), datetime.time())
+    elif moment is None:
+        raise ExportError(f"Invalid date: {value!r} (use YYYY-MM-DD)")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def trip_requests(start=None, end=None):
+    """TripRequests created in [start, end), oldest first."""
+    queryset = TripRequest.objects.order_by('created_at', 'id')
+    if start is not None:
+        queryset = queryset.filter(created_at__gte=start)
+    if end is not None:
+        queryset = queryset.filter(created_at__lt=end)
+    return queryset
+
+
+def iter_rows(queryset, chunk_size=None):
+    """Row tuples (FIELDS order), fetched chunk_size at a time."""
+    chunk_size = chunk_size or getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    return queryset.values_list(*FIELDS).iterator(chunk_size=chunk_size)
+
+
+def check_format(fmt):
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format {fmt!r} (choose from {', '.join(FORMATS)})")
+    if fmt == 'parquet':
+        _pyarrow()
+
+
+def write_export(fmt, rows, out, chunk_size=None):
+    """Write rows to out: a text stream for csv, a binary file or path for xlsx / parquet."""
+    check_format(fmt)
+    if fmt == 'csv':
+        for block in iter_csv(rows, chunk_size):
+            out.write(block)
+    elif fmt == 'xlsx':
+        _write_xlsx(rows, out)
+    else:
+        _write_parquet(rows, out, chunk_size)
+
+
+def stream_export(fmt, rows, chunk_size=None):
+    """Bytes of the export, produced incrementally (for StreamingHttpResponse)."""
+    check_format(fmt)
+    if fmt == 'csv':
+        for block in iter_csv(rows, chunk_size):
+            yield block.encode('utf-8')
+        return
+    # Zip (xlsx) and Parquet footers are written last: build the file on
+    # disk, then send it in blocks
+    with tempfile.TemporaryFile() as f:
+        write_export(fmt, rows, f, chunk_size)
+        f.seek(0)
+        while True:
+            block = f.read(_COPY_BLOCK)
+            if not block:
+                return
+            yield block
+
+
+def iter_csv(rows, chunk_size=None):
+    """CSV text (header first) in blocks of chunk_size rows."""
+    chunk_size = chunk_size or getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    pending = 0
+    for row in rows:
+        writer.writerow(_flat(row, _iso))
+        pending += 1
+        if pending >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def _write_xlsx(rows, out):
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Trip Requests')
+    header = []
+    for name in FIELDS:
+        cell = WriteOnlyCell(ws, value=name)
+        cell.font = Font(bold=True)
+        header.append(cell)
+    ws.append(header)
+    for row in rows:
+        ws.append(_flat(row, _local_naive))
+    wb.save(out)
+
+
+def _write_parquet(rows, out, chunk_size=None):
+    pa, pq = _pyarrow()
+    chunk_size = chunk_size or getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('created_at', pa.timestamp('us', tz='UTC')),
+        ('name', pa.string()),
+        ('ip_address', pa.string()),
+        ('ip_location', pa.string()),
+        ('from_location', pa.string()),
+        ('budget', pa.float64()),
+        ('currency', pa.string()),
+        ('travel_type', pa.string()),
+        ('group_size', pa.int64()),
+        ('travel_scope', pa.string()),
+        ('num_days', pa.int64()),
+        ('food_accommodation', pa.string()),
+        ('travel_medium', pa.string()),
+        ('destination_styles', pa.list_(pa.string())),
+    ])
+    styles_at = FIELDS.index('destination_styles')
+
+    def row_group(chunk):
+        columns = [list(col) for col in zip(*chunk)]
+        columns[styles_at] = [_styles(v) for v in columns[styles_at]]
+        return pa.Table.from_arrays([pa.array(col, type=f.type) for col, f in zip(columns, schema)], schema=schema)
+
+    with pq.ParquetWriter(out, schema) as writer:
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                writer.write_table(row_group(chunk))
+                chunk = []
+        if chunk:
+            writer.write_table(row_group(chunk))
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError("Parquet export needs pyarrow (pip install pyarrow)") from None
+    return pa, pq
+
+
+def _flat(row, when):
+    """A row with created_at converted by `when` and styles joined, for csv / xlsx."""
+    row = list(row)
+    row[1] = when(row[1])
+    row[-1] = ', '.join(_styles(row[-1]))
+    return row
+
+
+def _styles(value):
+    if isinstance(value, list):
+        return [str(s) for s in value]
+    return [str(value)] if value else []
+
+
+def _iso(moment):
+    return timezone.localtime(moment).isoformat() if moment else ''
+
+
+def _local_naive(moment):
+    # Excel has no time zones: local wall-clock time
+    return timezone.localtime(moment).replace(tzinfo=None) if moment else None
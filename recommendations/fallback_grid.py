@@ -0,0 +1,267 @@
+"""
+Materialized fallback grid
+==========================
+Catalog.pick_many() prices, classifies and ranks the whole catalog per request.
+Most requests come from one of the gateway hubs with a common preference
+set, so the grid does that work once, offline, for every cell of
+
+    travel scope × style selection (up to GRID_MAX_STYLES of STYLE_ALIASES)
+                 × travel medium × days (1..GRID_DAYS) × hub origin
+
+and serving a covered request is two table lookups and two bisections. The
+grid is stored factored, since ranking and pricing depend on different
+parts of a request:
+
+    rank        (scope, styles, hub)         pool rows in ranking order,
+                                             plus whether each matches
+    cost_rows   (scope, medium, days, hub)   pool rows sorted by trip cost,
+    cost_sorted                              and those costs ascending
+
+Budget is the only continuous input: within-budget rows are the prefix of
+cost_rows up to bisect(budget), over-budget ones the slice up to
+bisect(1.5 × budget); the winners are the first of each set in rank order.
+The result is identical to Catalog.pick_many() for the same query.
+
+Built by `manage.py materialize_fallback` (or automatically, see
+ai_service.get_fallback_grid()) into one compressed .npz, stamped with a
+fingerprint of everything the answers depend on; a file whose fingerprint
+no longer matches the catalog is ignored and rebuilt.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from itertools import combinations
+from pathlib import Path
+
+import numpy as np
+
+from . import geo
+from .geo import DISTANCE_BANDS_KM, distance_bands, haversine_km
+
+GRID_FORMAT = 2
+GRID_DAYS = 30
+GRID_MAX_STYLES = 2
+SCOPES = ('within_country', 'international')
+
+
+def style_signatures(style_keys, max_styles=GRID_MAX_STYLES):
+    """Every selection of up to max_styles distinct keys, as sorted tuples."""
+    keys = sorted({str(k).lower() for k in style_keys})
+    return [sig for n in range(max_styles + 1) for sig in combinations(keys, n)]
+
+
+def fingerprint(catalog, aliases, multipliers):
+    """Hash of the catalog, hubs, style aliases and pricing model a grid is built from."""
+    payload = json.dumps({
+        'format': GRID_FORMAT,
+        'destinations': catalog.destinations,
+        'hubs': [catalog.hub_names, catalog.hubs.lat.tolist(), catalog.hubs.lon.tolist()],
+        'aliases': aliases,
+        'multipliers': multipliers,
+        'fares': [geo.FLIGHT_FARE, geo.SURFACE_FARE_PER_KM, geo.SURFACE_DETOUR, geo.MAX_SURFACE_KM, geo.LOCAL_KM],
+        'bands': DISTANCE_BANDS_KM,
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class FallbackGrid:
+    def __init__(self, catalog, meta, arrays):
+        self.catalog = catalog
+        self.meta = meta
+        self.rank = arrays['rank']                  # (scope, styles, hub, width) int32, -1 padded
+        self.matching = arrays['matching']          # same shape, bool
+        self.seeds = arrays['seeds']                # (scope, styles, hub) tie-break seed ranked with
+        self.cost_rows = arrays['cost_rows']        # (scope, medium, days, hub, width) int32, -1 padded
+        self.cost_sorted = arrays['cost_sorted']    # same shape, float64, inf padded
+        self.km = arrays['km']                      # (hub, catalog)
+        self.fare = arrays['fare']                  # (hub, medium, catalog)
+        self.via = arrays['via']                    # (hub,) hub international trips fly from, -1 if none
+        self.hub_origin = arrays['hub_origin']      # (hub, 2) lat, lon
+
+        self.fingerprint = meta['fingerprint']
+        self.days = meta['days']
+        self._scopes = {s: i for i, s in enumerate(meta['scopes'])}
+        self._mediums = {m: i for i, m in enumerate(meta['mediums'])}
+        self._hubs = {h: i for i, h in enumerate(meta['hubs'])}
+        self._signatures = {tuple(sig): i for i, sig in enumerate(meta['signatures'])}
+        self._pool_size = [len(catalog.pool(s)) for s in meta['scopes']]
+
+    @classmethod
+    def build(cls, catalog, aliases, multipliers, seed_fn):
+        """
+        Materialize every cell for a catalog. multipliers maps travel medium
+        → cost multiplier; seed_fn(prefs) is the tie-break seed of a request.
+        """
+        signatures = style_signatures(aliases)
+        mediums = sorted(multipliers)
+        hubs = list(catalog.hub_names)
+        n_rows = len(catalog)
+        width = max(len(catalog.pool(s)) for s in SCOPES)
+
+        # Distances, bands and fares from each hub, exactly as pick_many()
+        # computes them for a query located there
+        origins = np.column_stack([catalog.hubs.lat, catalog.hubs.lon])
+        km = haversine_km(origins[:, :1], origins[:, 1:], catalog.lat, catalog.lon)
+        bands = distance_bands(np.nan_to_num(km))
+        nearest = [catalog.nearest_hub(float(lat), float(lon)) for lat, lon in origins]
+        via = np.array([-1 if hub is None else hub for hub, _ in nearest], dtype=np.int32)
+        hub_rows = np.array([hub or 0 for hub, _ in nearest], dtype=np.intp)
+        leg_km = np.array([d for _, d in nearest])
+        home = np.array([catalog.row_named(hub) for hub in hubs], dtype=np.intp)
+        fare = np.empty((len(hubs), len(mediums), n_rows))
+        extra = np.empty_like(fare)
+        for m, medium in enumerate(mediums):
+            fare[:, m], extra[:, m] = catalog.fares(km, hub_rows, leg_km, medium, float(multipliers[medium]), home)
+
+        rank = np.full((len(SCOPES), len(signatures), len(hubs), width), -1, dtype=np.int32)
+        matching = np.zeros(rank.shape, dtype=bool)
+        seeds = np.zeros(rank.shape[:3], dtype=np.uint64)
+        for s, scope in enumerate(SCOPES):
+            pool = catalog.pool(scope)
+            for g, sig in enumerate(signatures):
+                scores = catalog.style.scores(sig)
+                for h, hub in enumerate(hubs):
+                    seed = seed_fn({'travel_scope': scope, 'from_location': hub, 'destination_styles': list(sig)})
+                    jitter = catalog.tie_break(catalog.all, np.uint64(seed))
+                    order = (bands[h] + jitter) / (len(DISTANCE_BANDS_KM) + 1) - scores
+                    ranked = pool[np.argsort(order[pool], kind='stable')]
+                    rank[s, g, h, :ranked.size] = ranked
+                    matching[s, g, h, :ranked.size] = scores[ranked] > 0 if sig else True
+                    seeds[s, g, h] = seed
+
+        cost_rows = np.full((len(SCOPES), len(mediums), GRID_DAYS, len(hubs), width), -1, dtype=np.int32)
+        cost_sorted = np.full(cost_rows.shape, np.inf)
+        for m, medium in enumerate(mediums):
+            for day in range(1, GRID_DAYS + 1):
+                costs = catalog.trip_totals(float(day), float(multipliers[medium]), extra[:, m])
+                for s, scope in enumerate(SCOPES):
+                    pool = catalog.pool(scope)
+                    by_cost = np.argsort(costs[:, pool], axis=1, kind='stable')
+                    cost_rows[s, m, day - 1, :, :pool.size] = pool[by_cost]
+                    cost_sorted[s, m, day - 1, :, :pool.size] = np.take_along_axis(costs[:, pool], by_cost, axis=1)
+
+        meta = {
+            'format': GRID_FORMAT,
+            'fingerprint': fingerprint(catalog, aliases, multipliers),
+            'scopes': list(SCOPES), 'mediums': mediums, 'multipliers': multipliers, 'days': GRID_DAYS,
+            'hubs': hubs, 'signatures': [list(sig) for sig in signatures],
+        }
+        arrays = {
+            'rank': rank, 'matching': matching, 'seeds': seeds,
+            'cost_rows': cost_rows, 'cost_sorted': cost_sorted,
+            'km': km, 'fare': fare, 'via': via, 'hub_origin': origins,
+        }
+        return cls(catalog, meta, arrays)
+
+    # ── storage ──
+
+    def save(self, path):
+        """Write the grid to path atomically (readers see the old file or the new one)."""
+        path = Path(path)
+        arrays = {
+            'meta': np.array(json.dumps(self.meta)),
+            'rank': self.rank, 'matching': self.matching, 'seeds': self.seeds,
+            'cost_rows': self.cost_rows, 'cost_sorted': self.cost_sorted,
+            'km': self.km, 'fare': self.fare, 'via': self.via, 'hub_origin': self.hub_origin,
+        }
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path, catalog, expected_fingerprint):
+        """The grid stored at path, or None if it is missing, unreadable or built from another catalog."""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                if meta.get('format') != GRID_FORMAT or meta.get('fingerprint') != expected_fingerprint:
+                    return None
+                arrays = {name: data[name] for name in data.files if name != 'meta'}
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(catalog, meta, arrays)
+
+    # ── serving ──
+
+    def pick(self, query, origin_name, within_k=6, over_k=3):
+        """
+        Catalog.pick_many()'s answer for one of its query dicts from a hub
+        origin, or None if the query is outside the grid.
+        """
+        cells = self._cells(query, origin_name)
+        if cells is None:
+            return None
+        (s, g, h), (m, d) = cells
+        size = self._pool_size[s]
+        ranked = self.rank[s, g, h, :size]
+        matching = self.matching[s, g, h, :size]
+        by_cost = self.cost_rows[s, m, d, h, :size]
+        costs = self.cost_sorted[s, m, d, h, :size]
+
+        budget = float(query['budget_inr'])
+        fits = int(np.searchsorted(costs, budget, side='right'))
+        stretch = int(np.searchsorted(costs, budget * 1.5, side='right'))
+        # 0 = within budget, 1 = at most 50% over, 2 = neither
+        status = np.full(len(self.catalog), 2, dtype=np.int8)
+        status[by_cost[:fits]] = 0
+        status[by_cost[fits:stretch]] = 1
+        ranked_status = status[ranked]
+
+        within = ranked[(ranked_status == 0) & matching][:within_k]
+        # Emergency: if no within-budget matches, relax style filter
+        if not within.size:
+            within = ranked[ranked_status == 0][:4]
+        over = ranked[(ranked_status == 1) & matching][:over_k]
+        # Ensure at least 2 over_budget suggestions
+        if over.size < 2:
+            over = np.concatenate([over, ranked[(ranked_status == 1) & ~matching][:over_k - over.size]])
+
+        cost_of = dict(zip(by_cost[:stretch].tolist(), costs[:stretch].tolist()))
+        medium = query.get('medium', 'any')
+
+        def picked(rows):
+            out = []
+            for row in rows.tolist():
+                trip = None
+                if not np.isnan(self.km[h, row]):
+                    trip = {
+                        'km': float(self.km[h, row]), 'fare': float(self.fare[h, m, row]),
+                        'mode': self.catalog.transport_mode(row, self.km[h, row], medium, self.fare[h, m, row]),
+                        'via': self._via(h) if self.catalog.international[row] else None,
+                    }
+                out.append((self.catalog.destinations[row], cost_of[row], trip))
+            return out
+
+        return picked(within), picked(over)
+
+    def _via(self, h):
+        hub = int(self.via[h])
+        return self.meta['hubs'][hub] if hub >= 0 else None
+
+    def _cells(self, query, origin_name):
+        """((scope, styles, hub), (medium, days)) indexes of a query, or None if not materialized."""
+        seed, origin = query.get('seed'), query.get('origin')
+        h = self._hubs.get(origin_name)
+        if seed is None or origin is None or h is None:
+            return None
+        if tuple(float(v) for v in origin) != tuple(self.hub_origin[h].tolist()):
+            return None
+        s = self._scopes.get(query['travel_scope'])
+        m = self._mediums.get(query.get('medium', 'any'))
+        g = self._signatures.get(tuple(sorted(query['styles'])))
+        days = query['num_days']
+        if s is None or m is None or g is None or not 1 <= days <= self.days:
+            return None
+        if query['multiplier'] != self.meta['multipliers'][self.meta['mediums'][m]]:
+            return None
+        # Ranked with a different tie-break (e.g. seed scheme changed): not ours
+        if int(self.seeds[s, g, h]) != seed:
+            return None
+        return (s, g, h), (m, days - 1)
@@ -0,0 +1,127 @@
+"""
+Festival lookup indexes
+=======================
+Built once from data/festivals.json.
+
+    for_destination(name)  destination name → festival list, resolved by one
+                           regex pass over the name (all keys and key words
+                           compiled into a single alternation) instead of
+                           two substring scans over every key
+    in_month(month)        month → [(destination key, festival), ...] from a
+                           reverse index, e.g. "what's on in November"
+
+Match priority is the same as the old scans: a key found whole in the name
+(or the name found inside a key) wins over a key that only shares a word,
+and among several hits the key listed first in the file wins.
+"""
+
+import bisect
+import re
+
+MONTHS = [
+    'january', 'february', 'march', 'april', 'may', 'june',
+    'july', 'august', 'september', 'october', 'november', 'december',
+]
+_MONTH_NUMBER = {name: i for i, name in enumerate(MONTHS, 1)}
+_MONTH_NAME = re.compile('|'.join(MONTHS), re.I)
+# "February–March", "November-March": a span of months
+_MONTH_SPAN = re.compile(rf'({_MONTH_NAME.pattern})\s*[–-]\s*({_MONTH_NAME.pattern})', re.I)
+_ALL_YEAR = re.compile(r'daily|monthly|year-round', re.I)
+
+
+def month_number(value):
+    """1-12 from a month number or (partial) month name like 'nov'; None if unknown."""
+    value = str(value).strip().lower()
+    if value.isdigit():
+        return int(value) if 1 <= int(value) <= 12 else None
+    if len(value) >= 3:
+        for name, number in _MONTH_NUMBER.items():
+            if name.startswith(value):
+                return number
+    return None
+
+
+def months_of(label):
+    """Months a festival's free-text 'month' label covers, e.g. 'November–March' → [11, 12, 1, 2, 3]."""
+    if _ALL_YEAR.search(label):
+        return list(range(1, 13))
+    span = _MONTH_SPAN.search(label)
+    if span:
+        start = _MONTH_NUMBER[span.group(1).lower()]
+        end = _MONTH_NUMBER[span.group(2).lower()]
+        length = (end - start) % 12
+        return [(start - 1 + i) % 12 + 1 for i in range(length + 1)]
+    return sorted({_MONTH_NUMBER[m.lower()] for m in _MONTH_NAME.findall(label)})
+
+
+class FestivalIndex:
+    def __init__(self, festivals_db, default):
+        self.by_key = festivals_db
+        self.default = default
+        self.keys = list(festivals_db)
+
+        # pattern text → (rank if it is a whole key, best rank of keys containing it as a word)
+        patterns = {}
+        for rank, key in enumerate(self.keys):
+            whole, word = patterns.get(key, (None, None))
+            patterns[key] = (rank if whole is None else whole, word)
+            for w in key.split():
+                whole, word = patterns.get(w, (None, None))
+                patterns[w] = (whole, rank if word is None else min(word, rank))
+        # The regex reports only the longest pattern at each position, so fold
+        # in the ranks of every shorter pattern that is its prefix
+        self._ranks = {
+            p: (
+                _min_rank(r[0] for q, r in patterns.items() if p.startswith(q)),
+                _min_rank(r[1] for q, r in patterns.items() if p.startswith(q)),
+            )
+            for p in patterns
+        }
+        # Longest first; the lookahead lets matches overlap
+        alternation = '|'.join(re.escape(p) for p in sorted(patterns, key=len, reverse=True))
+        self._matcher = re.compile(f'(?=({alternation}))') if patterns else None
+        # Keys joined in rank order: the first find() of a name inside it is the best key
+        self._blob = '\0'.join(self.keys)
+        self._starts = []
+        offset = 0
+        for key in self.keys:
+            self._starts.append(offset)
+            offset += len(key) + 1
+
+        self.by_month = {m: [] for m in range(1, 13)}
+        for key, festivals in festivals_db.items():
+            for festival in festivals:
+                for m in months_of(festival.get('month', '')):
+                    self.by_month[m].append((key, festival))
+
+    def resolve(self, destination_name):
+        """Festival key for a destination name, or None."""
+        name = destination_name.lower()
+        whole = word = None
+        if self._matcher:
+            for match in self._matcher.finditer(name):
+                w_rank, word_rank = self._ranks[match.group(1)]
+                if w_rank is not None and (whole is None or w_rank < whole):
+                    whole = w_rank
+                if word_rank is not None and (word is None or word_rank < word):
+                    word = word_rank
+        at = self._blob.find(name) if '\0' not in name else -1
+        if at >= 0:
+            contained = bisect.bisect_right(self._starts, at) - 1
+            if whole is None or contained < whole:
+                whole = contained
+        best = whole if whole is not None else word
+        return None if best is None else self.keys[best]
+
+    def for_destination(self, destination_name):
+        key = self.resolve(destination_name)
+        return self.by_key[key] if key is not None else self.default
+
+    def in_month(self, month):
+        """[(destination key, festival), ...] for a month number 1-12."""
+        return self.by_month.get(month, [])
+
+
+def _min_rank(ranks):
+    ranks = [r for r in ranks if r is not None]
+    return min(ranks) if ranks else None
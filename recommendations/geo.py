@@ -0,0 +1,139 @@
+"""
+Distances and transport fares for the static recommender
+========================================================
+Coordinates come from data/destinations.json (lat/lon per destination) and
+data/places.json (the origin gazetteer; entries marked "hub" are the
+international gateway cities).
+
+    haversine_km(...)   great-circle km, vectorized over NumPy arrays
+    GeoIndex            k-d tree over unit vectors → nearest-N points
+    transport_fares()   round-trip INR fare per km of trip and travel medium
+
+The fare model is deliberately simple (per-km rates plus a fixed flight
+component), but it is enough to tell a ₹600 bus ride from a ₹12,000 flight,
+so the fallback can put cheap nearby trips first like the Gemini prompt asks.
+"""
+
+import heapq
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+# Road/rail distance is longer than the great circle
+SURFACE_DETOUR = 1.25
+
+# Round-trip INR per person: (fixed, per great-circle km)
+FLIGHT_FARE = (4000.0, 8.0)
+SURFACE_FARE_PER_KM = {
+    'bus': 3.0,
+    'train': 2.0,
+}
+# Above this distance 'any' (and anything else without a surface rate) flies
+MAX_SURFACE_KM = 1200.0
+
+# A destination this close to the origin needs no transport leg (a city's
+# gazetteer point and a destination's centre can be a few km apart)
+LOCAL_KM = 25.0
+
+# Great-circle km bands that order destinations within a style-score level
+DISTANCE_BANDS_KM = (300.0, 800.0, 2000.0, 5000.0)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; any argument may be a NumPy array."""
+    lat1, lon1, lat2, lon2 = (np.radians(v) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _unit_vectors(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def _chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0.0, 1.0))
+
+
+class GeoIndex:
+    """
+    k-d tree over points on the sphere. Points are stored as 3-D unit
+    vectors, where straight-line (chord) distance orders points exactly like
+    great-circle distance, so the usual Euclidean pruning applies.
+    """
+
+    def __init__(self, lat, lon, leaf_size=8):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self._xyz = _unit_vectors(self.lat, self.lon)
+        self.leaf_size = leaf_size
+        self._root = self._build(np.arange(len(self.lat))) if len(self.lat) else None
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _build(self, rows):
+        if rows.size <= self.leaf_size:
+            return rows
+        points = self._xyz[rows]
+        axis = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+        order = rows[np.argsort(points[:, axis], kind='stable')]
+        mid = order.size // 2
+        split = float(self._xyz[order[mid], axis])
+        return (axis, split, self._build(order[:mid]), self._build(order[mid:]))
+
+    def nearest(self, lat, lon, n=1):
+        """(rows, km) of the n points nearest to (lat, lon), closest first."""
+        if self._root is None or n <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        target = _unit_vectors(np.array([lat]), np.array([lon]))[0]
+        best = []  # max-heap of (-chord, row)
+
+        def visit(node):
+            if isinstance(node, np.ndarray):
+                chords = np.linalg.norm(self._xyz[node] - target, axis=1)
+                for row, chord in zip(node.tolist(), chords.tolist()):
+                    if len(best) < n:
+                        heapq.heappush(best, (-chord, row))
+                    elif chord < -best[0][0]:
+                        heapq.heapreplace(best, (-chord, row))
+                return
+            axis, split, left, right = node
+            gap = target[axis] - split
+            near, far = (left, right) if gap < 0 else (right, left)
+            visit(near)
+            if len(best) < n or abs(gap) < -best[0][0]:
+                visit(far)
+
+        visit(self._root)
+        found = sorted((-c, row) for c, row in best)
+        rows = np.array([row for _, row in found], dtype=np.intp)
+        return rows, _chord_to_km(np.array([c for c, _ in found]))
+
+
+def transport_fares(km, medium):
+    """
+    Round-trip INR fare for great-circle distances `km` (array) by travel
+    medium. Bus/train pay per road km up to MAX_SURFACE_KM and fly beyond;
+    'flight' and 'travel_agency' always fly.
+    """
+    km = np.asarray(km, dtype=np.float64)
+    fixed, per_km = FLIGHT_FARE
+    flight = fixed + per_km * km
+    if medium in ('flight', 'travel_agency'):
+        return flight
+    surface = SURFACE_FARE_PER_KM.get(medium, SURFACE_FARE_PER_KM['train']) * SURFACE_DETOUR * km
+    return np.where(km <= MAX_SURFACE_KM, surface, flight)
+
+
+def transport_mode(km, medium):
+    """Mode transport_fares() prices a trip of `km` by: 'bus', 'train' or 'flight'."""
+    if medium in ('flight', 'travel_agency') or km > MAX_SURFACE_KM:
+        return 'flight'
+    return medium if medium in SURFACE_FARE_PER_KM else 'train'
+
+
+def distance_bands(km):
+    """0 for trips under DISTANCE_BANDS_KM[0], 1 for the next band, and so on."""
+    return np.searchsorted(np.asarray(DISTANCE_BANDS_KM), km, side='right')
@@ -0,0 +1,334 @@
+"""
+Offline IP geolocation
+======================
+Trip requests are tagged with an approximate location for the client IP.
+It used to come from a blocking ipapi.co call per request (5 s timeout,
+quickly rate-limited); now it is a local lookup:
+
+    GeoIPIndex      sorted, non-overlapping IPv4 / IPv6 ranges → location
+                    label; a lookup is one bisection (np.searchsorted) over
+                    the range starts. Built by `manage.py import_geoip` from a
+                    CIDR or DB-IP-style range CSV into GEOIP_DATABASE (.npz)
+    OfflineResolver resolver over that file (default GEOIP_RESOLVER)
+    IpapiResolver   the old HTTPS lookup, used only as GEOIP_ENRICHER: when
+                    the offline data has no answer it runs in the background,
+                    and its answer is cached for the next request from that IP
+    IPLocator       LRU + TTL cache (MemoryCacheBackend) in front of both;
+                    misses are remembered for a short negative_ttl only, so
+                    a skipped or failed enrichment is retried soon
+
+Resolvers are pluggable: any class with locate(ip) → label or None, named
+by dotted path in settings.
+"""
+
+import csv
+import gzip
+import ipaddress
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .cache_service import MemoryCacheBackend
+
+UNKNOWN = 'Unknown'
+_MASK64 = (1 << 64) - 1
+
+
+def location_label(city, region, country):
+    """'City, Region, Country' with empty parts dropped."""
+    return ', '.join(str(p).strip() for p in (city, region, country) if p and str(p).strip()) or UNKNOWN
+
+
+def _parse_ip(ip):
+    """ipaddress object (IPv4-mapped IPv6 unwrapped), or None if ip is not an address."""
+    try:
+        addr = ipaddress.ip_address(str(ip).strip())
+    except ValueError:
+        return None
+    if addr.version == 6 and addr.ipv4_mapped:
+        return addr.ipv4_mapped
+    return addr
+
+
+class GeoIPIndex:
+    """IP ranges → location labels, one sorted start/end column pair per address family."""
+
+    def __init__(self, v4, v6, locations):
+        # v4: start, end (uint32), loc (uint32); v6: start_hi, start_lo,
+        # end_hi, end_lo (uint64 halves of the 128-bit address), loc
+        self.v4 = v4
+        self.v6 = v6
+        self.locations = locations
+
+    def __len__(self):
+        return len(self.v4['start']) + len(self.v6['start_hi'])
+
+    @classmethod
+    def from_ranges(cls, ranges):
+        """
+        Build from (first address, last address, label) tuples in any order.
+        Ranges overlapping an earlier-starting one are dropped.
+        """
+        locations, loc_ids = [], {}
+        by_family = {4: [], 6: []}
+        for first, last, label in ranges:
+            first, last = _parse_ip(first), _parse_ip(last)
+            if first is None or last is None or first.version != last.version or first > last:
+                continue
+            loc = loc_ids.get(label)
+            if loc is None:
+                loc = loc_ids[label] = len(locations)
+                locations.append(label)
+            by_family[first.version].append((int(first), int(last), loc))
+
+        for rows in by_family.values():
+            rows.sort()
+            kept, end = [], -1
+            for row in rows:
+                if row[0] > end:
+                    kept.append(row)
+                    end = row[1]
+            rows[:] = kept
+
+        v4_rows, v6_rows = by_family[4], by_family[6]
+        v4 = {
+            'start': np.array([r[0] for r in v4_rows], dtype=np.uint32),
+            'end': np.array([r[1] for r in v4_rows], dtype=np.uint32),
+            'loc': np.array([r[2] for r in v4_rows], dtype=np.uint32),
+        }
+        v6 = {
+            'start_hi': np.array([r[0] >> 64 for r in v6_rows], dtype=np.uint64),
+            'start_lo': np.array([r[0] & _MASK64 for r in v6_rows], dtype=np.uint64),
+            'end_hi': np.array([r[1] >> 64 for r in v6_rows], dtype=np.uint64),
+            'end_lo': np.array([r[1] & _MASK64 for r in v6_rows], dtype=np.uint64),
+            'loc': np.array([r[2] for r in v6_rows], dtype=np.uint32),
+        }
+        return cls(v4, v6, locations)
+
+    def save(self, path):
+        arrays = {f'v4_{k}': v for k, v in self.v4.items()}
+        arrays.update({f'v6_{k}': v for k, v in self.v6.items()})
+        arrays['locations'] = np.array(json.dumps(self.locations, ensure_ascii=False))
+        # Written aside and swapped in, so a worker never loads half a file
+        path = Path(path)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            v4 = {k[3:]: data[k] for k in data.files if k.startswith('v4_')}
+            v6 = {k[3:]: data[k] for k in data.files if k.startswith('v6_')}
+            locations = json.loads(str(data['locations']))
+        return cls(v4, v6, locations)
+
+    def lookup(self, ip):
+        """Location label for an address (str or ipaddress object), or None."""
+        addr = ip if isinstance(ip, (ipaddress.IPv4Address, ipaddress.IPv6Address)) else _parse_ip(ip)
+        if addr is None:
+            return None
+        n = int(addr)
+        if addr.version == 4:
+            cols = self.v4
+            i = int(np.searchsorted(cols['start'], np.uint32(n), side='right')) - 1
+            if i < 0 or int(cols['end'][i]) < n:
+                return None
+        else:
+            cols = self.v6
+            hi, lo = np.uint64(n >> 64), np.uint64(n & _MASK64)
+            # Last range starting at or before (hi, lo): bisect the high
+            # halves, then the low halves among ranges sharing this one
+            left = int(np.searchsorted(cols['start_hi'], hi, side='left'))
+            right = int(np.searchsorted(cols['start_hi'], hi, side='right'))
+            i = left + int(np.searchsorted(cols['start_lo'][left:right], lo, side='right')) - 1
+            if i < 0 or (int(cols['end_hi'][i]) << 64 | int(cols['end_lo'][i])) < n:
+                return None
+        return self.locations[int(cols['loc'][i])]
+
+
+def read_ranges(path, fmt='auto'):
+    """
+    (first, last, label) tuples from a range CSV (optionally .gz):
+
+        cidr   network,city,region,country          e.g. 49.36.0.0/14,Mumbai,Maharashtra,India
+        dbip   first,last,continent,country,region,city[,...]   (DB-IP "IP to City Lite")
+
+    'auto' picks cidr when the first column holds a '/'. Header lines are skipped.
+    """
+    opener = gzip.open if str(path).endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as f:
+        for row in csv.reader(f):
+            if not row or _parse_ip(row[0].split('/')[0]) is None:
+                continue  # header / blank line
+            row_fmt = fmt if fmt != 'auto' else ('cidr' if '/' in row[0] else 'dbip')
+            if row_fmt == 'cidr':
+                try:
+                    network = ipaddress.ip_network(row[0].strip(), strict=False)
+                except ValueError:
+                    continue
+                city, region, country = (row[1:4] + ['', '', ''])[:3]
+                yield network[0], network[-1], location_label(city, region, country)
+            else:
+                if len(row) < 6:
+                    continue
+                yield row[0], row[1], location_label(row[5], row[4], row[3])
+
+
+# ── resolvers ──
+
+class OfflineResolver:
+    """Looks addresses up in the GeoIPIndex at GEOIP_DATABASE (no answers if the file is missing)."""
+
+    def __init__(self, path=None):
+        self.path = path or settings.GEOIP_DATABASE
+        self._index = None
+        self._lock = threading.Lock()
+
+    @property
+    def index(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    try:
+                        self._index = GeoIPIndex.load(self.path)
+                        print(f"[GeoIP] Loaded {len(self._index):,} ranges from {self.path}")
+                    except (OSError, ValueError, KeyError) as e:
+                        print(f"[GeoIP] No offline database ({e}) — run manage.py import_geoip")
+                        self._index = GeoIPIndex.from_ranges([])
+        return self._index
+
+    def locate(self, ip):
+        return self.index.lookup(ip)
+
+
+class IpapiResolver:
+    """ipapi.co over HTTPS. Slow and rate-limited: meant as GEOIP_ENRICHER, not on the request path."""
+
+    timeout = 5
+
+    def __init__(self):
+        # Keep-alive connections shared by the enrichment threads
+        self.session = requests.Session()
+        self.session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+    def locate(self, ip):
+        response = self.session.get(f'https://ipapi.co/{ip}/json/', timeout=self.timeout)
+        if response.status_code == 429:
+            raise RateLimited()
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        if data.get('error') or not data.get('country_name'):
+            return None
+        return location_label(data.get('city'), data.get('region'), data.get('country_name'))
+
+
+class RateLimited(Exception):
+    """Raised by an enricher when the provider asks us to slow down."""
+
+
+class IPLocator:
+    """
+    Cached IP → location label. The offline resolver answers on the request
+    path; on a miss the enricher (if any) runs in the background and its
+    answer is cached for the next request. Misses answer 'Unknown' for
+    negative_ttl seconds, after which the address is looked up again.
+    """
+
+    def __init__(self, resolver, enricher=None, ttl=86400, max_entries=10000,
+                 negative_ttl=300, max_enriching=16, backoff_seconds=300):
+        self.resolver = resolver
+        self.enricher = enricher
+        self.cache = MemoryCacheBackend(ttl=ttl, max_entries=max_entries)
+        self.misses = MemoryCacheBackend(ttl=negative_ttl, max_entries=max_entries)
+        self.max_enriching = max_enriching
+        self.backoff_seconds = backoff_seconds
+        self._enriching = set()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='geoip-enrich') if enricher else None
+
+    def locate(self, ip):
+        addr = _parse_ip(ip)
+        # Private, loopback and reserved addresses have no location to find
+        if addr is None or not addr.is_global:
+            return UNKNOWN
+        key = str(addr)
+        hit = self.cache.get(key)
+        if hit is not None:
+            return hit[0]
+        if self.misses.get(key) is not None:
+            return UNKNOWN
+        label = None
+        try:
+            label = self.resolver.locate(addr)
+        except Exception as e:
+            print(f"[GeoIP] Lookup failed for {key}: {e}")
+        if label:
+            self.cache.set(key, label)
+            return label
+        self.misses.set(key, True)
+        self._schedule_enrichment(key)
+        return UNKNOWN
+
+    def _schedule_enrichment(self, key):
+        if self._pool is None:
+            return
+        with self._lock:
+            if (key in self._enriching or len(self._enriching) >= self.max_enriching
+                    or time.monotonic() < self._paused_until):
+                return
+            self._enriching.add(key)
+        self._pool.submit(self._enrich, key)
+
+    def _enrich(self, key):
+        try:
+            label = self.enricher.locate(key)
+            if label:
+                self.cache.set(key, label)
+                self.misses.delete(key)
+        except RateLimited:
+            print(f"[GeoIP] Enricher rate-limited — pausing it for {self.backoff_seconds}s")
+            with self._lock:
+                self._paused_until = time.monotonic() + self.backoff_seconds
+        except Exception as e:
+            print(f"[GeoIP] Enrichment failed for {key}: {e}")
+        finally:
+            with self._lock:
+                self._enriching.discard(key)
+
+
+_locator = None
+_locator_lock = threading.Lock()
+
+
+def get_ip_locator():
+    """Per-process IPLocator configured by the GEOIP_* settings."""
+    global _locator
+    if _locator is None:
+        with _locator_lock:
+            if _locator is None:
+                enricher = getattr(settings, 'GEOIP_ENRICHER', '')
+                _locator = IPLocator(
+                    import_string(getattr(settings, 'GEOIP_RESOLVER', 'recommendations.geoip.OfflineResolver'))(),
+                    import_string(enricher)() if enricher else None,
+                    ttl=getattr(settings, 'GEOIP_CACHE_TTL', 86400),
+                    max_entries=getattr(settings, 'GEOIP_CACHE_MAX_ENTRIES', 10000),
+                    negative_ttl=getattr(settings, 'GEOIP_NEGATIVE_CACHE_TTL', 300),
+                )
+    return _locator
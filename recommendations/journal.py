@@ -0,0 +1,149 @@
+"""
+Append-only JSONL journal
+=========================
+One JSON object per line, appended with a single O_APPEND write (per
+record, or per batch with append_many()), so
+concurrent gunicorn workers never overwrite or interleave each other's rows
+and an append costs the same however long the history is. fsync runs at
+most once per fsync_interval seconds per process (and at exit) rather than
+per row: a crash loses at most that window, not the file.
+
+Compaction (see excel_service.compact_user_data) calls rotate(), which
+renames the live file to a sealed segment "<name>.<time_ns>" while holding
+an exclusive flock on it. Writers take a shared flock for each append and
+reopen the path if their file was renamed meanwhile, so no row ever lands
+in a segment that is being compacted.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock; rotate() only while the server is stopped
+    fcntl = None
+
+
+class Journal:
+    def __init__(self, path, fsync_interval=1.0):
+        self.path = Path(path)
+        self.fsync_interval = fsync_interval
+        self._fd = None
+        self._unsynced = False
+        self._synced_at = time.monotonic()
+        self._lock = threading.Lock()
+        atexit.register(self.sync)
+
+    def append(self, record):
+        """Append one record (a JSON-serializable dict)."""
+        self.append_many([record])
+
+    def append_many(self, records):
+        """Append several records with one write."""
+        if not records:
+            return
+        line = ''.join(json.dumps(r, ensure_ascii=False, default=str) + '\n' for r in records).encode('utf-8')
+        with self._lock:
+            while True:
+                fd = self._open()
+                _flock(fd, 'LOCK_SH')
+                if self._is_live(fd):
+                    try:
+                        os.write(fd, line)
+                    finally:
+                        _flock(fd, 'LOCK_UN')
+                    break
+                # Rotated away by compaction: move on to the fresh file
+                _flock(fd, 'LOCK_UN')
+                self._close()
+            self._unsynced = True
+            if time.monotonic() - self._synced_at >= self.fsync_interval:
+                self._sync()
+
+    def sync(self):
+        """fsync anything appended since the last sync."""
+        with self._lock:
+            self._sync()
+
+    def rotate(self):
+        """
+        Seal the live file as a segment and return its path (None if nothing
+        was journaled); the next append starts a new file.
+        """
+        segment = self.path.with_name(f'{self.path.name}.{time.time_ns()}')
+        if fcntl is None:
+            try:
+                os.replace(self.path, segment)
+            except FileNotFoundError:
+                return None
+            return segment
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            _flock(fd, 'LOCK_EX')
+            os.replace(self.path, segment)
+        finally:
+            os.close(fd)
+        return segment
+
+    @contextmanager
+    def exclusive(self):
+        """Held by one compaction at a time (flock on "<name>.lock")."""
+        fd = os.open(self.path.with_name(self.path.name + '.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            _flock(fd, 'LOCK_EX')
+            yield
+        finally:
+            os.close(fd)
+
+    def segments(self):
+        """Sealed segments waiting for compaction, oldest first."""
+        prefix = self.path.name + '.'
+        found = [p for p in self.path.parent.glob(prefix + '*') if p.name[len(prefix):].isdigit()]
+        return sorted(found, key=lambda p: int(p.name[len(prefix):]))
+
+    @staticmethod
+    def read(segment):
+        """Records in a segment; a torn last line (crash mid-write) is skipped."""
+        with open(segment, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    print(f"[journal] Skipping unreadable line in {segment.name}")
+
+    def _open(self):
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        return self._fd
+
+    def _is_live(self, fd):
+        """True if fd is still the file at self.path."""
+        try:
+            return os.path.samestat(os.fstat(fd), os.stat(self.path))
+        except FileNotFoundError:
+            return False
+
+    def _close(self):
+        if self._fd is not None:
+            self._sync()
+            os.close(self._fd)
+            self._fd = None
+
+    def _sync(self):
+        if self._unsynced and self._fd is not None:
+            os.fsync(self._fd)
+            self._unsynced = False
+        self._synced_at = time.monotonic()
+
+
+def _flock(fd, op):
+    if fcntl is not None:
+        fcntl.flock(fd, getattr(fcntl, op))
@@ -0,0 +1,214 @@
+"""
+Incremental JSON extraction for Gemini output
+=============================================
+Gemini replies are "mostly JSON": sometimes wrapped in ``` fences, sometimes
+preceded by a sentence of prose, sometimes streamed in arbitrary chunks.
+
+JSONStreamParser makes one left-to-right pass over that text. It matches
+brackets with a single stack (jumping over string literals with a compiled
+regex rather than char by char), so every '{' or '[' learns where its value
+ends — or that it never does — exactly once. Candidates are then tried in
+order: the first balanced one that the C json decoder accepts and that is of
+the expected type (a dict unless told otherwise) wins. A malformed balanced
+value is skipped whole; a bracket that never closes ("[approx" in prose, or
+a truncated reply) is given up on at the end of the input, and the values
+after it that aren't its own members are tried instead. Nothing is scanned
+twice, so the work stays linear however the brackets are arranged, and a
+value nested deeper than MAX_DEPTH counts as malformed rather than
+exhausting the decoder's recursion limit.
+
+While streaming it can also hand back each element of one top-level array
+(e.g. "recommendations") the moment its closing brace arrives.
+
+    parser = JSONStreamParser(array_key='recommendations')
+    for chunk in stream:
+        for rec in parser.feed(chunk):
+            ...                      # one complete recommendation
+    result = parser.close()          # the whole decoded object, or None
+"""
+
+import json
+import re
+from collections import deque
+
+# Everything up to the next bracket or unterminated quote: plain text and
+# whole string literals, consumed in one C-level match, never char by char.
+_SKIP = re.compile(r'(?:[^"{}\[\]]+|"[^"\\]*(?:\\.[^"\\]*)*")*', re.S)
+_VALUE_START = re.compile(r'[{\[]')
+# Text before a bracket that makes it a member of an enclosing value
+_MEMBER_PREFIX = re.compile(r'[:,{\[]\s*$')
+_OPENERS = {'}': '{', ']': '['}
+
+# Deepest nesting decoded; Gemini replies use four or five levels
+MAX_DEPTH = 64
+
+_MISSING = object()
+_BROKEN = -1       # closed by the wrong bracket, or nested too deep
+_UNCLOSED = None   # still open at the end of the input
+
+
+def _decode(text):
+    """json.loads(), with malformed or pathologically nested input as _MISSING."""
+    try:
+        return json.loads(text)
+    except (ValueError, RecursionError):
+        return _MISSING
+
+
+def _is_expected(value, expected):
+    return expected is None or isinstance(value, expected)
+
+
+class JSONStreamParser:
+    """Single-pass extractor of the first complete top-level JSON value of type `expected` (None: any)."""
+
+    def __init__(self, array_key=None, expected=dict):
+        self.array_key = array_key
+        self.expected = expected
+        if array_key is not None:
+            self._key_prefix = re.compile(re.escape(json.dumps(array_key)) + r'\s*:\s*$')
+        self._text = ''
+        self._pos = 0                  # scan position in _text
+        self._stack = deque()          # _text indexes of the open brackets, at most MAX_DEPTH
+        self._starts = []              # every bracket seen, in order
+        self._ends = {}                # bracket index → end index, _BROKEN or _UNCLOSED
+        self._next = 0                 # next entry of _starts to try
+        self._skip_to = 0              # candidates before this are inside a rejected value
+        self._recovering = False       # an earlier candidate never closed
+        self._in_target = False        # inside bottom[array_key]
+        self._item_start = None        # _text index where the current array element began
+        self._value = _MISSING
+
+    @property
+    def done(self):
+        return self._value is not _MISSING
+
+    def feed(self, chunk):
+        """Consume more text. Returns the array_key elements completed by this chunk."""
+        if self.done or not chunk:
+            return []
+        self._text += chunk
+        items = self._scan()
+        if not self.done:
+            self._decide()
+        return items
+
+    def close(self):
+        """End of input: return the decoded value, or None if none was found."""
+        if not self.done:
+            for start in self._stack:
+                self._ends[start] = _UNCLOSED
+            self._stack.clear()
+            self._decide()
+        return None if self._value is _MISSING else self._value
+
+    def _scan(self):
+        items = []
+        text = self._text
+        pos = self._pos
+        stack = self._stack
+        while True:
+            if stack:
+                at = _SKIP.match(text, pos).end()
+            else:
+                # Outside every bracket a quote is prose, not a string
+                match = _VALUE_START.search(text, pos)
+                at = match.start() if match else len(text)
+            if at == len(text) or text[at] == '"':
+                pos = at  # wait for more text; a string may continue in the next chunk
+                break
+            ch = text[at]
+            pos = at + 1
+            if ch in '{[':
+                stack.append(at)
+                self._starts.append(at)
+                depth = len(stack)
+                if depth > MAX_DEPTH:
+                    # The outermost open value is too deep to decode; the
+                    # ones inside it may still be fine on their own
+                    self._ends[stack.popleft()] = _BROKEN
+                    self._in_target = False
+                    self._item_start = None
+                elif depth == 2 and ch == '[' and text[stack[0]] == '{' and self._is_target(at):
+                    self._in_target = True
+                elif depth == 3 and self._in_target:
+                    self._item_start = at
+                continue
+
+            # closing bracket
+            if text[stack[-1]] != _OPENERS[ch]:
+                # Mismatched close: no value open here can be valid JSON
+                self._break_all()
+                continue
+            self._ends[stack.pop()] = pos
+            depth = len(stack)
+            if depth == 2 and self._item_start is not None:
+                item = _decode(text[self._item_start:pos])
+                if item is not _MISSING:
+                    items.append(item)
+                self._item_start = None
+            elif depth == 1 and self._in_target and ch == ']':
+                self._in_target = False
+            elif depth == 0:
+                self._in_target = False
+                self._decide()
+                if self.done:
+                    break
+
+        self._pos = pos
+        return items
+
+    def _is_target(self, at):
+        """Whether the array opening at text[at] is the value of array_key."""
+        if self.array_key is None:
+            return False
+        return bool(self._key_prefix.search(self._text, max(0, at - len(self.array_key) - 64), at))
+
+    def _break_all(self):
+        """Every open bracket's value is malformed: the closing bracket each one would meet is wrong."""
+        for start in self._stack:
+            self._ends[start] = _BROKEN
+        self._stack.clear()
+        self._in_target = False
+        self._item_start = None
+
+    def _decide(self):
+        """Try the candidates whose fate is known, in order, until one is accepted."""
+        text = self._text
+        starts = self._starts
+        while self._next < len(starts):
+            start = starts[self._next]
+            if start < self._skip_to or (
+                    self._recovering and _MEMBER_PREFIX.search(text, max(0, start - 64), start)):
+                self._next += 1
+                continue
+            end = self._ends.get(start, _MISSING)
+            if end is _MISSING:
+                return  # still open; nothing after it can be decided yet
+            self._next += 1
+            if end is _UNCLOSED or end == _BROKEN:
+                # Never closes: a stray bracket in prose, or a truncated
+                # reply whose own members must not be taken for the value
+                self._recovering = self._recovering or end is _UNCLOSED
+                continue
+            value = _decode(text[start:end])
+            if value is not _MISSING and _is_expected(value, self.expected):
+                self._value = value
+                self._text = ''
+                self._stack.clear()
+                return
+            # Balanced but not JSON (prose like "{like this}") or of the
+            # wrong type: skip it whole
+            self._skip_to = end
+
+
+def extract_json(text, expected=dict):
+    """
+    Decode the first complete JSON value of type `expected` (dict, list, or
+    None for either) found in `text`, or None.
+    """
+    if not text:
+        return None
+    parser = JSONStreamParser(expected=expected)
+    parser.feed(text)
+    return parser.close()
@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Move journaled trip requests (USER_DATA_JOURNAL) into the styled USER_DATA_EXCEL workbook. Safe to run from cron while the server is up.'
+
+    def handle(self, *args, **options):
+        from recommendations.excel_service import compact_user_data
+
+        added = compact_user_data()
+        self.stdout.write(self.style.SUCCESS(f'Compacted {added} journaled rows into {settings.USER_DATA_EXCEL}'))
@@ -0,0 +1,57 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Export TripRequest rows in a date range to CSV, xlsx or Parquet, streaming in chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="File to write ('-' for stdout, csv only)")
+        parser.add_argument('--format', choices=['csv', 'xlsx', 'parquet'],
+                            help='Default: from the output file extension, else csv')
+        parser.add_argument('--start', help='First day (YYYY-MM-DD or ISO datetime)')
+        parser.add_argument('--end', help='Last day, inclusive (YYYY-MM-DD or ISO datetime)')
+        parser.add_argument('--chunk-size', type=int, help='Rows per database round trip (default: EXPORT_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        from recommendations.export import (
+            ExportError, check_format, iter_rows, parse_bound, trip_requests, write_export,
+        )
+
+        output = options['output']
+        fmt = options['format'] or (output.rsplit('.', 1)[-1].lower() if '.' in output else 'csv')
+        try:
+            check_format(fmt)
+            queryset = trip_requests(parse_bound(options['start']), parse_bound(options['end'], end=True))
+        except ExportError as e:
+            raise CommandError(str(e))
+        if output == '-' and fmt != 'csv':
+            raise CommandError(f'{fmt} cannot be written to stdout')
+
+        count = _Counted(iter_rows(queryset, options['chunk_size']))
+        if output == '-':
+            write_export(fmt, count, sys.stdout, options['chunk_size'])
+            return
+        if fmt == 'csv':
+            with open(output, 'w', encoding='utf-8', newline='') as f:
+                write_export(fmt, count, f, options['chunk_size'])
+        else:
+            write_export(fmt, count, output, options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Exported {count.n:,} trip requests → {output}'))
+
+
+class _Counted:
+    """Iterator wrapper counting the rows that pass through."""
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.n = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = next(self.rows)
+        self.n += 1
+        return row
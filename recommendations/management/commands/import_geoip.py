@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Build the offline IP → location database (GEOIP_DATABASE) from a range CSV: '
+            'CIDR rows (network,city,region,country) or DB-IP "IP to City Lite" rows. .gz is fine.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='CSV file of IP ranges')
+        parser.add_argument('--format', choices=['auto', 'cidr', 'dbip'], default='auto')
+        parser.add_argument('--output', help='Where to write the database (default: GEOIP_DATABASE)')
+
+    def handle(self, *args, **options):
+        from recommendations.geoip import GeoIPIndex, read_ranges
+
+        path = options['output'] or settings.GEOIP_DATABASE
+        started = time.perf_counter()
+        try:
+            index = GeoIPIndex.from_ranges(read_ranges(options['source'], options['format']))
+        except OSError as e:
+            raise CommandError(f'Could not read {options["source"]}: {e}')
+        if not len(index):
+            raise CommandError(f'No IP ranges found in {options["source"]}')
+        index.save(path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {len(index.v4["start"]):,} IPv4 and {len(index.v6["start_hi"]):,} IPv6 ranges '
+            f'({len(index.locations):,} locations) in {time.perf_counter() - started:.1f}s → {path}'
+        ))
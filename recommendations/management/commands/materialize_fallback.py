@@ -0,0 +1,23 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Precompute fallback recommendations for the common preference grid (see recommendations/fallback_grid.py).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Where to write the grid (default: AI_FALLBACK_GRID_PATH)')
+
+    def handle(self, *args, **options):
+        from recommendations.ai_service import build_fallback_grid
+
+        path = options['output'] or settings.AI_FALLBACK_GRID_PATH
+        started = time.perf_counter()
+        grid = build_fallback_grid(path)
+        cells = grid.rank.shape[0] * grid.rank.shape[1] * grid.rank.shape[2]
+        self.stdout.write(self.style.SUCCESS(
+            f'Materialized {cells} ranking and {grid.cost_rows[..., 0].size} pricing cells '
+            f'in {time.perf_counter() - started:.1f}s → {path}'
+        ))
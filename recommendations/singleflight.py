@@ -0,0 +1,106 @@
+"""
+Single-flight call coalescing
+=============================
+If several threads ask for the same key while a call is already running,
+only the first one (the "leader") does the work; the others wait for it
+and share its result. Nothing is cached once the call finishes.
+"""
+
+import asyncio
+import copy
+import hashlib
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Per-process duplicate-call suppression keyed on an arbitrary string."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Run fn() once for all concurrent callers of the same key.
+        Returns (result, shared) — shared is True for callers that waited
+        on another thread's call. Every caller gets its own copy of a shared
+        result, so it can be mutated freely.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result), True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        # Followers copy call.result, so the leader must not hand out the same object
+        if call.waiters:
+            return copy.deepcopy(call.result), False
+        return call.result, False
+
+    def in_flight(self):
+        """Number of distinct keys currently being fetched."""
+        return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """
+    asyncio flavour of SingleFlight. The work runs as its own task, so a
+    caller that disconnects (and is cancelled) does not cancel it for the
+    others. Calls are grouped per event loop, since a task can only be
+    awaited on the loop that created it.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, fn):
+        """Await fn() once for all concurrent callers of key; returns (result, shared)."""
+        loop = asyncio.get_running_loop()
+        slot = (id(loop), key)
+        task = self._tasks.get(slot)
+        shared = task is not None
+        if not shared:
+            task = self._tasks[slot] = loop.create_task(fn())
+            task.add_done_callback(lambda t: self._tasks.pop(slot) if self._tasks.get(slot) is t else None)
+        result = await asyncio.shield(task)
+        # Several coroutines may resume on the same object; never hand it out directly
+        return copy.deepcopy(result), shared
+
+    def in_flight(self):
+        return len(self._tasks)
+
+
+def prompt_key(prompt, *extra):
+    """Stable hash of a prompt (plus any call options that change the output)."""
+    h = hashlib.sha256(prompt.encode('utf-8'))
+    for part in extra:
+        h.update(b'\0' + str(part).encode('utf-8'))
+    return h.hexdigest()
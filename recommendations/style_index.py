@@ -0,0 +1,90 @@
+"""
+Precompiled style index for the static recommender
+==================================================
+Every style tag in the destination catalog (and in STYLE_ALIASES) gets one
+bit. Each destination is stored as an int bitmask of its tags, and each
+user style compiles to two masks:
+
+    exact  — the tags it matches through STYLE_ALIASES     (worth 2 points)
+    words  — tags sharing a word with it, e.g. "hill"      (worth 1 point)
+
+Scoring a destination is then a couple of ANDs per selected style. Scores
+are computed once per distinct destination mask (a few dozen, however big
+the catalog grows), spread back over the catalog with one NumPy gather and
+cached per style selection.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+# Words that never count as a style overlap on their own
+STOPWORDS = frozenset({'&', 'and', 'the'})
+
+
+def _tag(value):
+    return str(value).lower().strip()
+
+
+class StyleIndex:
+    def __init__(self, destinations, aliases):
+        tags = {_tag(s) for d in destinations for s in d.get('styles', [])}
+        for key, expanded in aliases.items():
+            tags.add(_tag(key))
+            tags.update(_tag(t) for t in expanded)
+        self.bits = {tag: 1 << i for i, tag in enumerate(sorted(tags))}
+
+        self.aliases = {
+            _tag(key): self._mask(expanded) for key, expanded in aliases.items()
+        }
+        # word → tags containing that word; replaces per-request split/intersect
+        self.word_masks = {}
+        for tag, bit in self.bits.items():
+            for word in set(tag.split()) - STOPWORDS:
+                self.word_masks[word] = self.word_masks.get(word, 0) | bit
+
+        self.masks = [self._mask(d.get('styles', [])) for d in destinations]
+        self._distinct_masks = sorted(set(self.masks))
+        position = {m: i for i, m in enumerate(self._distinct_masks)}
+        # Catalog row → index into _distinct_masks (the style column of the catalog)
+        self.mask_ids = np.array([position[m] for m in self.masks], dtype=np.intp)
+        self.scores = lru_cache(maxsize=256)(self._scores)
+
+    def _mask(self, styles):
+        mask = 0
+        for s in styles:
+            mask |= self.bits.get(_tag(s), 0)
+        return mask
+
+    def compile_style(self, style):
+        """(exact_mask, word_mask) for one user-selected style."""
+        s = _tag(style)
+        exact = self.aliases.get(s, self.bits.get(s, 0))
+        words = 0
+        for word in set(style.lower().split()) - STOPWORDS:
+            words |= self.word_masks.get(word, 0)
+        return exact, words
+
+    def score_mask(self, mask, compiled):
+        """2 per style matched through its aliases, 1 per style matched only by a shared word."""
+        score = 0
+        for exact, words in compiled:
+            if exact & mask:
+                score += 2
+            elif words & mask:
+                score += 1
+        return score
+
+    def _scores(self, styles):
+        """
+        Style score of every destination (catalog order) for a tuple of user
+        styles, as a read-only int array.
+        """
+        if not styles:
+            scores = np.ones(len(self.masks), dtype=np.int64)
+        else:
+            compiled = [self.compile_style(s) for s in styles]
+            per_mask = np.array([self.score_mask(m, compiled) for m in self._distinct_masks], dtype=np.int64)
+            scores = per_mask[self.mask_ids]
+        scores.flags.writeable = False
+        return scores
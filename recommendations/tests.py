@@ -1,3 +1,1046 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import importlib.util
+import io
+import ipaddress
+import json
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import openpyxl
+from django.contrib.auth.models import User
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+
+from . import ai_service, excel_service, views
+from .autocomplete import Autocomplete, SuggestionCache
+from .cache_service import MemoryCacheBackend, ranking_seed, recommendations_cache_key
+from .catalog import load_data, top_k, top_k_rows
+from .circuit_breaker import CircuitBreaker
+from .fallback_grid import FallbackGrid, fingerprint
+from .export import FIELDS
+from .festival_index import month_number, months_of
+from .geoip import UNKNOWN, GeoIPIndex, IPLocator
+from .journal import Journal
+from .json_stream import MAX_DEPTH, JSONStreamParser, extract_json
+from .models import TripRequest
+from .singleflight import AsyncSingleFlight, SingleFlight
+from .style_index import STOPWORDS
+from .write_behind import WriteBehindQueue
+
+RECOMMENDATION = {
+    'name': 'Goa', 'estimated_total_cost': 18000, 'why_visit': 'Beaches',
+    'best_time': 'Nov–Feb', 'highlights': ['Baga'], 'distance_from_start': '~600 km',
+}
+
+
+def _service(**methods):
+    """A GeminiAIService that reports Gemini as available, with methods stubbed out."""
+    service = ai_service.GeminiAIService()
+    service.available = True
+    service._configure = lambda: None
+    for name, method in methods.items():
+        setattr(service, name, method)
+    return service
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def _old_festivals_for(festivals_db, default, destination_name):
+    """The two linear scans FestivalIndex replaced."""
+    name_lower = destination_name.lower()
+    for key, festivals in festivals_db.items():
+        if key in name_lower or name_lower in key:
+            return festivals
+    for key, festivals in festivals_db.items():
+        if any(word in name_lower for word in key.split()):
+            return festivals
+    return default
+
+
+def _chunks(text, rng, longest=40):
+    pos = 0
+    while pos < len(text):
+        size = rng.randint(1, longest)
+        yield text[pos:pos + size]
+        pos += size
+
+
+def _ndjson_lines(response):
+    return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+
+def _old_style_score(dest, styles):
+    """The per-destination scorer StyleIndex replaced."""
+    if not styles:
+        return 1
+    d_styles = {s.lower().strip() for s in dest.get('styles', [])}
+    score = 0
+    for user_style in styles:
+        s = user_style.lower().strip()
+        expanded = {t.lower() for t in ai_service.STYLE_ALIASES.get(s, [s])}
+        if expanded & d_styles:
+            score += 2
+        elif any((set(user_style.split()) & set(ds.split())) - STOPWORDS for ds in d_styles):
+            score += 1
+    return score
+
+
+# ── static recommender ──
+
+class StyleIndexTests(SimpleTestCase):
+    def test_scores_match_per_destination_scorer(self):
+        catalog = ai_service.get_catalog()
+        keys = list(ai_service.STYLE_ALIASES) + ['hill', 'city', 'unknown style']
+        rng = random.Random(11)
+        for _ in range(300):
+            styles = tuple(sorted(rng.sample(keys, rng.randint(0, 4))))
+            scores = catalog.style.scores(styles)
+            expected = [_old_style_score(d, styles) for d in catalog.destinations]
+            self.assertEqual(scores.tolist(), expected, styles)
+
+
+class TopKTests(SimpleTestCase):
+    def test_top_k_matches_full_sort(self):
+        rng = np.random.default_rng(12)
+        for _ in range(200):
+            # Few distinct values, so ties are common
+            order = rng.integers(0, 5, size=rng.integers(1, 60)).astype(np.float64)
+            candidates = np.flatnonzero(rng.random(order.size) < 0.7)
+            k = int(rng.integers(0, 12))
+            full = candidates[np.argsort(order[candidates], kind='stable')][:k]
+            picked = top_k(order, candidates, k)
+            self.assertEqual(order[picked].tolist(), order[full].tolist())
+            self.assertEqual(len(set(picked.tolist())), len(picked))
+            self.assertTrue(set(picked.tolist()) <= set(candidates.tolist()))
+
+    def test_top_k_rows_matches_full_sort(self):
+        rng = np.random.default_rng(13)
+        order = rng.random((40, 50))
+        mask = rng.random(order.shape) < 0.4
+        for k in (0, 1, 6, 50, 80):
+            rows = top_k_rows(order, mask, k)
+            for i, picked in enumerate(rows):
+                allowed = np.flatnonzero(mask[i])
+                expected = allowed[np.argsort(order[i, allowed], kind='stable')][:k]
+                self.assertEqual(picked.tolist(), expected.tolist())
+
+
+class SeededRankingTests(SimpleTestCase):
+    PREFS = {'name': 'Priya', 'budget': 30000, 'from_location': 'Mumbai',
+             'destination_styles': ['Beaches', 'Hill Stations']}
+
+    def names(self, prefs):
+        query, _ = ai_service._fallback_query(prefs)
+        within, over = ai_service.get_catalog().pick_many([query])[0]
+        return [dest['name'] for dest, _, _ in within + over]
+
+    def test_seed_depends_on_the_trip_only(self):
+        seed = ranking_seed(self.PREFS)
+        same = dict(self.PREFS, name='Rahul', budget=90000, from_location=' mumbai',
+                    destination_styles=['hill stations', 'beaches'])
+        self.assertEqual(ranking_seed(same), seed)
+        self.assertNotEqual(ranking_seed(dict(self.PREFS, from_location='Delhi')), seed)
+        self.assertNotEqual(ranking_seed(dict(self.PREFS, destination_styles=['Beaches'])), seed)
+
+    def test_same_request_same_tie_break(self):
+        catalog = ai_service.get_catalog()
+        first = catalog.tie_break(catalog.all, 12345)
+        self.assertEqual(first.tolist(), catalog.tie_break(catalog.all, 12345).tolist())
+        self.assertTrue(((first >= 0) & (first < 1)).all())
+        self.assertNotEqual(first.tolist(), catalog.tie_break(catalog.all, 54321).tolist())
+
+        names = self.names(self.PREFS)
+        self.assertTrue(names)
+        for _ in range(5):
+            self.assertEqual(self.names(dict(self.PREFS)), names)
+        # Any spelling of a known origin counts as the same trip
+        self.assertEqual(self.names(dict(self.PREFS, from_location='MUMBAI')), names)
+
+    def test_random_tie_break_can_be_restored(self):
+        with override_settings(AI_FALLBACK_DETERMINISTIC=False):
+            query, _ = ai_service._fallback_query(self.PREFS)
+        self.assertIsNone(query['seed'])
+
+
+class FestivalIndexTests(SimpleTestCase):
+    def test_matches_the_old_scans(self):
+        index = ai_service.get_festivals()
+        names = [d['name'] for d in ai_service.get_catalog().destinations]
+        names += list(index.keys) + [w for key in index.keys for w in key.split()]
+        rng = random.Random(15)
+        for key in rng.sample(index.keys, min(20, len(index.keys))):
+            names += [key[1:-1], key.title() + ' Backwaters', f'{key} & Beyond', key[: len(key) // 2]]
+        names += ['Nowhere', 'Rajasthan — Jaipur & Udaipur', 'Kerala Backwaters', 'ab', '']
+        for name in names:
+            self.assertIs(index.for_destination(name),
+                          _old_festivals_for(index.by_key, index.default, name), name)
+
+    def test_month_index(self):
+        self.assertEqual(months_of('November–March'), [11, 12, 1, 2, 3])
+        self.assertEqual(months_of('Daily'), list(range(1, 13)))
+        self.assertEqual(months_of('January (14th)'), [1])
+        self.assertEqual([month_number(v) for v in ('11', 'nov', 'November', '13', 'no')], [11, 11, 11, None, None])
+
+        index = ai_service.get_festivals()
+        for month in range(1, 13):
+            expected = [(key, f) for key, festivals in index.by_key.items()
+                        for f in festivals if month in months_of(f.get('month', ''))]
+            self.assertEqual(index.in_month(month), expected)
+
+
+class FallbackPricingTests(SimpleTestCase):
+    def setUp(self):
+        self.catalog = ai_service.get_catalog()
+
+    def _picks(self, **prefs):
+        query, _ = ai_service._fallback_query(dict({'budget': 50000, 'num_days': 5}, **prefs))
+        within, over = self.catalog.pick_many([query])[0]
+        return within + over
+
+    def test_costs_never_below_the_stay(self):
+        origins = [p['name'] for p in load_data('places.json') if 'lat' in p]
+        rng = random.Random(18)
+        queries = []
+        for _ in range(400):
+            prefs = {
+                'from_location': rng.choice(origins),
+                'travel_medium': rng.choice(list(ai_service.MEDIUM_MULTIPLIERS)),
+                'travel_scope': rng.choice(['within_country', 'international']),
+                'num_days': rng.randint(1, 20),
+                'budget': rng.choice([1000, 3000, 20000, 300000]),
+            }
+            queries.append((prefs, ai_service._fallback_query(prefs)[0]))
+        for (prefs, query), (within, over) in zip(queries, self.catalog.pick_many([q for _, q in queries])):
+            for dest, cost, trip in within + over:
+                stay = dest['cost_per_day'] * prefs['num_days'] * query['multiplier']
+                self.assertGreaterEqual(cost, stay - 1e-6, (prefs, dest['name']))
+
+    def test_no_transport_leg_when_already_there(self):
+        picks = self._picks(from_location='Port Blair', budget=3000, num_days=2, travel_medium='bus')
+        andaman = [(cost, trip) for dest, cost, trip in picks if dest['name'] == 'Andaman Islands']
+        self.assertTrue(andaman)
+        cost, trip = andaman[0]
+        self.assertGreater(cost, 0)
+        self.assertEqual(trip['fare'], 0)
+        self.assertIsNone(trip['mode'])
+
+        # Same name, a few km between the gazetteer point and the destination
+        for origin in ('Goa', 'Munnar'):
+            for dest, cost, trip in self._picks(from_location=origin, travel_medium='flight', budget=200000):
+                if dest['name'] == origin:
+                    self.assertEqual(trip['fare'], 0)
+
+
+class FallbackGridTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.catalog = ai_service.get_catalog()
+        cls.grid = FallbackGrid.build(cls.catalog, ai_service.STYLE_ALIASES, ai_service.MEDIUM_MULTIPLIERS, ranking_seed)
+
+    def test_grid_matches_pick_many(self):
+        keys = list(ai_service.STYLE_ALIASES)
+        rng = random.Random(20)
+        covered = 0
+        for _ in range(3000):
+            hub = rng.choice(self.catalog.hub_names)
+            prefs = {
+                'from_location': rng.choice([hub, hub.lower()]),
+                'travel_scope': rng.choice(['within_country', 'international']),
+                'travel_medium': rng.choice(list(ai_service.MEDIUM_MULTIPLIERS)),
+                'num_days': rng.randint(1, 30),
+                'destination_styles': rng.sample(keys, rng.randint(0, 2)),
+                'budget': rng.choice([3000, 20000, 50000, rng.uniform(1000, 400000)]),
+            }
+            query, origin = ai_service._fallback_query(prefs)
+            picked = self.grid.pick(query, origin and origin[0])
+            if picked is None:
+                continue
+            covered += 1
+            self.assertEqual(picked, self.catalog.pick_many([query])[0], prefs)
+        self.assertGreater(covered, 2500)
+
+    def test_outside_the_grid(self):
+        query, origin = ai_service._fallback_query({'from_location': 'Mumbai', 'num_days': 45})
+        self.assertIsNone(self.grid.pick(query, origin[0]))
+        query, _ = ai_service._fallback_query({'from_location': 'Nowhere'})
+        self.assertIsNone(self.grid.pick(query, None))
+
+    def test_save_and_load(self):
+        expected = fingerprint(self.catalog, ai_service.STYLE_ALIASES, ai_service.MEDIUM_MULTIPLIERS)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'grid.npz'
+            self.grid.save(path)
+            loaded = FallbackGrid.load(path, self.catalog, expected)
+            self.assertIsNotNone(loaded)
+            self.assertEqual(loaded.rank.dtype, np.int32)
+            self.assertIsNone(FallbackGrid.load(path, self.catalog, 'stale'))
+            self.assertIsNone(FallbackGrid.load(Path(tmp) / 'missing.npz', self.catalog, expected))
+
+
+# ── Gemini plumbing ──
+
+class RecommendationsCacheKeyTests(SimpleTestCase):
+    PREFS = {
+        'name': 'Priya', 'budget': 30000, 'currency': 'inr', 'travel_type': 'solo',
+        'num_days': 4, 'from_location': 'Chennai,  Tamil Nadu',
+        'destination_styles': ['Beaches', 'hill stations'],
+    }
+
+    def test_equivalent_preferences_share_a_key(self):
+        key = recommendations_cache_key(self.PREFS)
+        same = dict(self.PREFS, name='Rahul', currency='INR', budget='30000',
+                    from_location='chennai, tamil nadu', destination_styles=['Hill Stations', 'beaches', 'BEACHES'])
+        self.assertEqual(recommendations_cache_key(same), key)
+        for change in ({'budget': 30001}, {'num_days': 5}, {'destination_styles': ['Beaches']},
+                       {'from_location': 'Madurai'}):
+            self.assertNotEqual(recommendations_cache_key(dict(self.PREFS, **change)), key, change)
+
+    def test_short_names_get_their_own_entry(self):
+        key = recommendations_cache_key(self.PREFS)
+        self.assertEqual(recommendations_cache_key(dict(self.PREFS, name='')), key)
+        self.assertNotEqual(recommendations_cache_key(dict(self.PREFS, name='Al')), key)
+        self.assertNotEqual(recommendations_cache_key(dict(self.PREFS, name='Al')),
+                            recommendations_cache_key(dict(self.PREFS, name='Bo')))
+
+    def test_personalize_swaps_whole_names_only(self):
+        result = ai_service._personalize(
+            {'ai_summary': 'Priya, these suit you. Priyanka loved Goa.'}, 'Priya', 'Rahul')
+        self.assertEqual(result['ai_summary'], 'Rahul, these suit you. Priyanka loved Goa.')
+
+        summary = 'Al, A trip to Almora is a good fit.'
+        result = ai_service._personalize({'ai_summary': summary}, 'Al', 'Rahul')
+        self.assertEqual(result['ai_summary'], summary)
+
+    def test_cache_hit_is_personalized(self):
+        service = ai_service.GeminiAIService.__new__(ai_service.GeminiAIService)
+        service._recommendations_cache = MemoryCacheBackend()
+        result = {'recommendations': [RECOMMENDATION], 'ai_summary': 'Great picks for Priya.'}
+        key = recommendations_cache_key(self.PREFS)
+        service._store_recommendations(key, result, self.PREFS)
+
+        other = dict(self.PREFS, name='Rahul')
+        hit = service._cached_recommendations(recommendations_cache_key(other), other)
+        self.assertEqual(hit['ai_summary'], 'Great picks for Rahul.')
+        self.assertEqual(hit['recommendations'], [RECOMMENDATION])
+        self.assertIsNone(service._cached_recommendations(
+            recommendations_cache_key(dict(self.PREFS, name='Al')), dict(self.PREFS, name='Al')))
+
+
+class DestinationDetailsCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+        self.service = _service(_get_ai_destination_details=self.fetch)
+        self.service._details_cache = MemoryCacheBackend(ttl=3600)
+
+    def fetch(self, destination_name, prefs):
+        self.calls.append(destination_name)
+        self.release.wait(5)
+        return {'name': destination_name, 'version': len(self.calls)}
+
+    def test_fresh_then_stale_while_revalidating(self):
+        prefs = {'from_location': 'Pune'}
+        details, meta = self.service.get_destination_details_cached('Goa', prefs)
+        self.assertEqual((details['version'], meta['status']), (1, 'miss'))
+        details, meta = self.service.get_destination_details_cached('Goa', prefs)
+        self.assertEqual((details['version'], meta['status']), (1, 'fresh'))
+
+        with override_settings(AI_DETAILS_FRESH_TTL=-1):
+            self.release.clear()
+            for _ in range(5):
+                details, meta = self.service.get_destination_details_cached('Goa', prefs)
+                # The old entry is served at once while one refresh runs
+                self.assertEqual((details['version'], meta['status']), (1, 'stale'))
+            self.release.set()
+            self.assertTrue(_wait_for(lambda: not self.service._refreshing))
+        self.assertEqual(len(self.calls), 2)
+        details, meta = self.service.get_destination_details_cached('Goa', prefs)
+        self.assertEqual((details['version'], meta['status']), (2, 'fresh'))
+
+
+class JSONStreamTests(SimpleTestCase):
+    def test_streamed_parse_matches_whole_text(self):
+        rng = random.Random(9)
+        reply = {
+            'recommendations': [dict(RECOMMENDATION, name=f'Place {i} "}}]{{"') for i in range(8)],
+            'ai_summary': 'Brackets in strings: [ { } ]',
+        }
+        texts = [
+            json.dumps(reply),
+            'Sure! Here you go:\n```json\n' + json.dumps(reply, indent=2) + '\n```\nEnjoy {your trip}.',
+            'note [approx ' + json.dumps(reply),
+        ]
+        for text in texts:
+            for _ in range(20):
+                parser = JSONStreamParser(array_key='recommendations')
+                items = []
+                for chunk in _chunks(text, rng):
+                    items.extend(parser.feed(chunk))
+                value = parser.close()
+                self.assertEqual(value, extract_json(text))
+                self.assertEqual(value, reply)
+                if not text.startswith('note'):
+                    self.assertEqual(items, reply['recommendations'])
+
+    def test_expected_type(self):
+        self.assertEqual(extract_json('see [1] {"a": 1}'), {'a': 1})
+        self.assertEqual(extract_json('see [1] {"a": 1}', list), [1])
+        self.assertIsNone(extract_json('[1, 2]'))
+        self.assertEqual(extract_json('["Goa, Goa", "Ooty"]', list), ['Goa, Goa', 'Ooty'])
+        parser = JSONStreamParser()
+        parser.feed('see [1] {"a": 1}')
+        self.assertEqual(parser.close(), {'a': 1})
+
+    def test_unclosed_bracket_in_prose(self):
+        self.assertEqual(extract_json('note [approx {"a": 1}'), {'a': 1})
+        self.assertEqual(extract_json('a {b: [} {"ok": true}'), {'ok': True})
+
+    def test_truncated_reply(self):
+        text = '{"recommendations": [{"name": "Goa"}, {"name": "Oo'
+        self.assertIsNone(extract_json(text))
+        parser = JSONStreamParser(array_key='recommendations')
+        self.assertEqual(parser.feed(text), [{'name': 'Goa'}])
+        self.assertIsNone(parser.close())
+
+    def test_chunking_never_changes_the_result(self):
+        rng = random.Random(5)
+        for _ in range(2000):
+            text = ''.join(rng.choice('{}[]",: a1\\') for _ in range(rng.randint(0, 40)))
+            for expected in (dict, list, None):
+                parser = JSONStreamParser(expected=expected)
+                for chunk in _chunks(text, rng, longest=5):
+                    parser.feed(chunk)
+                self.assertEqual(parser.close(), extract_json(text, expected), (text, expected))
+
+    def test_deep_nesting_is_malformed_not_an_error(self):
+        for text in ('[' * 3000, '[' * 1500 + ']' * 1500, '{"a": ' * 3000):
+            self.assertIsNone(extract_json(text))
+            parser = JSONStreamParser(array_key='recommendations')
+            for chunk in _chunks(text, random.Random(1)):
+                parser.feed(chunk)
+            self.assertIsNone(parser.close())
+        self.assertEqual(extract_json('[' * 3000 + ' see {"a": 1}'), {'a': 1})
+        self.assertEqual(extract_json('{"a": 1} ' + '[' * 3000), {'a': 1})
+        nested = '[' * MAX_DEPTH + ']' * MAX_DEPTH
+        self.assertEqual(extract_json(nested, list), json.loads(nested))
+        self.assertIsNotNone(extract_json('[' * 1500 + ']' * 1500, list))
+
+    def test_unclosed_prose_brackets_stay_linear(self):
+        text = '{ a ' * 8000 + json.dumps({'ok': True})
+        started = time.monotonic()
+        self.assertEqual(extract_json(text), {'ok': True})
+        parser = JSONStreamParser()
+        for chunk in _chunks(text, random.Random(2)):
+            parser.feed(chunk)
+        self.assertEqual(parser.close(), {'ok': True})
+        self.assertIsNone(extract_json('[ a ' * 8000))
+        # Quadratic rescans took seconds here
+        self.assertLess(time.monotonic() - started, 1.0)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {'value': [1]}
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do('k', fetch)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flight.do('k', fetch))) for _ in range(4)]
+        for t in followers:
+            t.start()
+        time.sleep(0.05)
+        release.set()
+        for t in [leader] + followers:
+            t.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(shared for _, shared in results), [False, True, True, True, True])
+        values = [value for value, _ in results]
+        self.assertTrue(all(v == {'value': [1]} for v in values))
+        self.assertEqual(len({id(v) for v in values}), len(values))
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_error_reaches_every_caller(self):
+        flight = SingleFlight()
+        with self.assertRaises(ValueError):
+            flight.do('k', lambda: (_ for _ in ()).throw(ValueError('boom')))
+        self.assertEqual(flight.in_flight(), 0)
+        self.assertEqual(flight.do('k', lambda: 2), (2, False))
+
+    def test_async_callers_share_one_task(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return [1]
+
+        async def main():
+            return await asyncio.gather(*(flight.do('k', fetch) for _ in range(5)))
+
+        results = asyncio.run(main())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(shared for _, shared in results), [False, True, True, True, True])
+        self.assertEqual(flight.in_flight(), 0)
+
+
+class StreamRecommendationsTests(SimpleTestCase):
+    url = '/api/recommendations/stream/'
+    PREFS = {'name': 'Priya', 'budget': 30000, 'num_days': 4, 'from_location': 'Mumbai'}
+
+    def setUp(self):
+        recorded = Future()
+        recorded.set_result('Mumbai, Maharashtra, India')
+        for name, value in (('_start_recording', recorded), ('_recorded_ip_location', recorded.result())):
+            patcher = mock.patch.object(views, name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, service):
+        with mock.patch.object(views, '_get_ai_service', return_value=service):
+            response = Client().post(self.url, json.dumps(self.PREFS), content_type='application/json')
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            return _ndjson_lines(response)  # the body is generated while it is read
+
+    def test_static_picks_first_then_ai_picks(self):
+        reply = json.dumps({'recommendations': [RECOMMENDATION, dict(RECOMMENDATION, name='Gokarna')],
+                            'ai_summary': 'Coastal picks.'})
+
+        class Stream:
+            def generate_content_stream(self, **kwargs):
+                for i in range(0, len(reply), 16):
+                    yield type('Chunk', (), {'text': reply[i:i + 16]})()
+
+        service = _service(_cached_recommendations=lambda key, prefs: None)
+        service._recommendations_cache = MemoryCacheBackend()
+        service.client = type('Client', (), {'models': Stream()})()
+        events = self.post(service)
+
+        self.assertEqual(events[0]['type'], 'fallback')
+        self.assertTrue(events[0]['recommendations'])
+        self.assertEqual([e['recommendation']['name'] for e in events if e['type'] == 'recommendation'],
+                         ['Goa', 'Gokarna'])
+        self.assertEqual(events[-2], {'type': 'summary', 'ai_summary': 'Coastal picks.'})
+        self.assertEqual(events[-1], {'type': 'done', 'source': 'ai', 'count': 2,
+                                      'ip_location': 'Mumbai, Maharashtra, India'})
+
+    def test_failure_is_reported_as_an_error_event(self):
+        service = ai_service.GeminiAIService()
+
+        def events(prefs):
+            yield service._fallback_event(prefs)
+            raise RuntimeError('boom')
+
+        service.stream_travel_recommendations = events
+        lines = self.post(service)
+        self.assertEqual([e['type'] for e in lines], ['fallback', 'error'])
+        self.assertEqual(lines[-1]['error'], 'boom')
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def breaker(self, **options):
+        options = dict({'window': 10, 'min_calls': 4, 'failure_threshold': 0.5, 'open_seconds': 0.05}, **options)
+        return CircuitBreaker('test', **options)
+
+    def open(self, breaker):
+        breaker.record_failure('down', rate_limited=True)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+        time.sleep(0.06)
+
+    def test_opens_on_error_rate(self):
+        breaker = self.breaker()
+        for ok in (True, True, False):
+            breaker.record_success() if ok else breaker.record_failure('x')
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure('x')
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_half_open_trial_closes_or_reopens(self):
+        breaker = self.breaker()
+        self.open(breaker)
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())  # one trial at a time
+        breaker.record_success(0.5)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+        self.open(breaker)
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure('still down')
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_abandoned_trial_frees_the_slot(self):
+        breaker = self.breaker()
+        self.open(breaker)
+        self.assertTrue(breaker.allow_request())
+        breaker.record_abandoned()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow_request())
+
+        # Outside half-open an abandoned call is not a failure
+        closed = self.breaker()
+        for _ in range(10):
+            closed.record_abandoned()
+        self.assertEqual(closed.state, CircuitBreaker.CLOSED)
+
+    def test_unsettled_trial_times_out(self):
+        breaker = self.breaker(probe_timeout=0.1)
+        self.open(breaker)
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+        time.sleep(0.12)
+        self.assertTrue(breaker.allow_request())
+
+    def test_abandoned_stream_settles_the_trial(self):
+        class Chunk:
+            def __init__(self, text):
+                self.text = text
+
+        class Models:
+            def generate_content_stream(self, **kwargs):
+                yield Chunk('{"recommendations": [' + json.dumps(RECOMMENDATION) + ',')
+                yield Chunk(json.dumps(RECOMMENDATION) + ']}')
+
+        service = ai_service.GeminiAIService.__new__(ai_service.GeminiAIService)
+        service.available = True
+        service.client = type('Client', (), {'models': Models()})()
+        service._configure = lambda: None
+        service._cached_recommendations = lambda key, prefs: None
+        service._fallback_event = lambda prefs: {'type': 'fallback'}
+
+        breaker = self.breaker()
+        original, ai_service._BREAKER = ai_service._BREAKER, breaker
+        try:
+            self.open(breaker)
+            events = service.stream_travel_recommendations({'name': 't', 'budget': 50000})
+            for event in events:
+                if event['type'] == 'recommendation':
+                    break
+            events.close()  # client disconnected
+        finally:
+            ai_service._BREAKER = original
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow_request())
+
+
+# ── autocomplete ──
+
+class AutocompleteTests(SimpleTestCase):
+    PLACES = [
+        {'name': 'Mumbai', 'region': 'Maharashtra', 'weight': 100},
+        {'name': 'Munnar', 'region': 'Kerala', 'weight': 40},
+        {'name': 'Mussoorie', 'region': 'Uttarakhand', 'weight': 30},
+    ]
+
+    def test_prefix_and_typo_matches(self):
+        index = Autocomplete.from_places(self.PLACES)
+        # Prefix matches first, then near misses
+        self.assertEqual(index.suggest('MUN')[0], 'Munnar, Kerala')
+        self.assertEqual(index.suggest('mus')[0], 'Mussoorie, Uttarakhand')
+        self.assertEqual(index.suggest('mu'), ['Mumbai, Maharashtra', 'Munnar, Kerala', 'Mussoorie, Uttarakhand'])
+        self.assertEqual(index.suggest('kerala'), ['Munnar, Kerala'])
+        self.assertEqual(index.suggest('mumbia'), ['Mumbai, Maharashtra'])
+        self.assertEqual(index.suggest('xyz'), [])
+
+    def test_popularity_is_applied_in_batches(self):
+        index = Autocomplete.from_places(self.PLACES, rerank_interval=3600)
+        cache = SuggestionCache(index, limit=3)
+        version = index.version
+        self.assertEqual(cache.suggest('mu')[0], 'Mumbai, Maharashtra')
+        for _ in range(200):
+            index.learn('Munnar')
+            cache.suggest('mu')
+        self.assertEqual(index.version, version)
+        self.assertEqual(cache.stats['hit'], 200)
+
+        index.rerank()
+        self.assertGreater(index.version, version)
+        self.assertEqual(cache.suggest('mu')[0], 'Munnar, Kerala')
+
+    def test_new_places_are_added_at_once(self):
+        index = Autocomplete.from_places(self.PLACES, rerank_interval=3600)
+        for _ in range(3):
+            index.learn('Murud')
+        self.assertIn('Murud', index.suggest('mur'))
+
+
+class SuggestionCacheTests(SimpleTestCase):
+    PLACES = AutocompleteTests.PLACES + [
+        {'name': 'Surat', 'region': 'Gujarat', 'weight': 50},
+        {'name': 'Aurangabad', 'region': 'Maharashtra', 'weight': 20},
+        {'name': 'Navi Mumbai', 'region': 'Maharashtra', 'weight': 10},
+    ]
+
+    def test_derived_answers_match_a_full_search(self):
+        index = Autocomplete.from_places(self.PLACES)
+        cache = SuggestionCache(index, limit=3)
+        rng = random.Random(17)
+        typed = [p['name'] for p in self.PLACES] + ['mumbia', 'aurangbad', 'sura'] + [
+            ''.join(rng.choice('abimnrsu ') for _ in range(8)) for _ in range(100)]
+        for text in typed:
+            for end in range(1, len(text) + 1):
+                self.assertEqual(cache.suggest(text[:end]), index.suggest(text[:end], 3), text[:end])
+        self.assertGreater(cache.stats['derived'], 0)
+
+    def test_near_misses_are_found_for_the_full_query(self):
+        index = Autocomplete.from_places(self.PLACES)
+        cache = SuggestionCache(index)
+        cache.suggest('sur')
+        # "aura…" shares no trigram with "sur", only with "sura"
+        self.assertEqual(cache.suggest('sura'), ['Surat, Gujarat', 'Aurangabad, Maharashtra'])
+        self.assertEqual(cache.stats['derived'], 1)
+
+    def test_added_places_invalidate_cached_answers(self):
+        index = Autocomplete.from_places(self.PLACES)
+        cache = SuggestionCache(index)
+        self.assertNotIn('Munsiyari, Uttarakhand', cache.suggest('mun'))
+        index.add('Munsiyari, Uttarakhand')
+        self.assertIn('Munsiyari, Uttarakhand', cache.suggest('muns'))
+        self.assertIn('Munsiyari, Uttarakhand', cache.suggest('mun'))
+
+
+# ── analytics & storage ──
+
+class JournalTests(SimpleTestCase):
+    def test_compaction_under_concurrent_writers(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            journal_path = Path(tmp) / 'user_data.jsonl'
+            excel_path = Path(tmp) / 'user_data.xlsx'
+            original = excel_service._journal
+            excel_service._journal = Journal(journal_path, fsync_interval=60)
+            try:
+                with override_settings(USER_DATA_EXCEL=excel_path):
+                    writers, per_writer = 4, 300
+                    done = threading.Event()
+
+                    def write(w):
+                        # One Journal per thread, like separate worker processes
+                        journal = Journal(journal_path, fsync_interval=60)
+                        for i in range(per_writer):
+                            journal.append({'name': f'{w}-{i}', 'ip_address': '', 'timestamp': ''})
+                        journal.sync()
+
+                    def compact():
+                        while not done.is_set():
+                            excel_service.compact_user_data()
+
+                    threads = [threading.Thread(target=write, args=(w,)) for w in range(writers)]
+                    compactor = threading.Thread(target=compact)
+                    compactor.start()
+                    for t in threads:
+                        t.start()
+                    for t in threads:
+                        t.join()
+                    done.set()
+                    compactor.join()
+                    excel_service.compact_user_data()
+
+                    wb = openpyxl.load_workbook(excel_path, read_only=True)
+                    rows = list(wb.active.iter_rows(min_row=2, values_only=True))
+                    wb.close()
+            finally:
+                excel_service._journal = original
+
+            names = sorted(row[1] for row in rows)
+            self.assertEqual(names, sorted(f'{w}-{i}' for w in range(writers) for i in range(per_writer)))
+            self.assertEqual([row[0] for row in rows], list(range(1, len(rows) + 1)))
+            self.assertEqual(Journal(journal_path).segments(), [])
+
+    def test_torn_last_line_is_skipped(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'j.jsonl'
+            Journal(path).append_many([{'a': 1}, {'a': 2}])
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write('{"a": 3')
+            self.assertEqual(list(Journal.read(path)), [{'a': 1}, {'a': 2}])
+
+
+class WriteBehindQueueTests(SimpleTestCase):
+    def test_batches_flush_off_the_request_path(self):
+        batches = []
+        queue = WriteBehindQueue('test', batches.append, max_batch=10, flush_interval=0.05)
+        try:
+            for i in range(25):
+                self.assertTrue(queue.put(i))
+            self.assertTrue(_wait_for(lambda: queue.status()['flushed'] == 25))
+        finally:
+            queue.close()
+        self.assertEqual([r for batch in batches for r in batch], list(range(25)))
+        self.assertTrue(all(len(batch) <= 10 for batch in batches))
+        self.assertEqual(queue.status()['batches'], len(batches))
+
+    def test_overflow_policies(self):
+        release = threading.Event()
+        flushed = []
+
+        def flush(batch):
+            release.wait(5)
+            flushed.extend(batch)
+
+        for overflow, kept in ((WriteBehindQueue.DROP_OLDEST, [0, 3, 4]), (WriteBehindQueue.DROP_NEWEST, [0, 1, 2])):
+            flushed.clear()
+            release.clear()
+            queue = WriteBehindQueue('test', flush, max_batch=1, flush_interval=60, max_size=2, overflow=overflow)
+            queue.put(0)
+            # The worker is now stuck flushing 0; the buffer fills behind it
+            self.assertTrue(_wait_for(lambda: queue.status()['depth'] == 0))
+            for i in range(1, 5):
+                queue.put(i)
+            self.assertEqual(queue.status()['dropped'], 2)
+            release.set()
+            queue.close()
+            self.assertEqual(flushed, kept, overflow)
+
+    def test_failed_batch_is_counted_not_retried(self):
+        calls = []
+
+        def flush(batch):
+            calls.append(batch)
+            raise RuntimeError('database is down')
+
+        queue = WriteBehindQueue('test', flush, max_batch=100, flush_interval=60)
+        queue.put('a')
+        queue.put('b')
+        queue.close()
+        self.assertEqual(calls, [['a', 'b']])
+        status = queue.status()
+        self.assertEqual((status['failed'], status['flushed'], status['depth']), (2, 0, 0))
+        self.assertFalse(queue.put('c'))
+
+
+class GeoIPTests(SimpleTestCase):
+    def test_lookup_matches_linear_scan(self):
+        rng = random.Random(23)
+        ranges = []
+        for cls in (ipaddress.IPv4Address, ipaddress.IPv6Address):
+            bits = 32 if cls is ipaddress.IPv4Address else 128
+            starts = {rng.getrandbits(bits - 1) for _ in range(300)}
+            if bits == 128:
+                # Many ranges sharing their high 64 bits exercise the second bisection
+                base = rng.getrandbits(64) << 64
+                starts |= {base | rng.getrandbits(64) for _ in range(300)}
+            starts = sorted(starts)
+            for a, b in zip(starts, starts[1:]):
+                last = a + rng.randint(0, b - a - 1)
+                ranges.append((cls(a), cls(last), f'place {len(ranges) % 37}'))
+        index = GeoIPIndex.from_ranges(ranges)
+        spans = [(int(first), int(last), first.version, label) for first, last, label in ranges]
+
+        def scan(addr):
+            n = int(addr)
+            for first, last, version, label in spans:
+                if version == addr.version and first <= n <= last:
+                    return label
+            return None
+
+        for first, last, label in rng.sample(ranges, 200):
+            for n in (int(first), int(last), int(last) + 1, int(first) - 1):
+                cls = ipaddress.IPv4Address if first.version == 4 else ipaddress.IPv6Address
+                if 0 <= n < (1 << first.max_prefixlen):
+                    self.assertEqual(index.lookup(cls(n)), scan(cls(n)), cls(n))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'geoip.npz'
+            index.save(path)
+            loaded = GeoIPIndex.load(path)
+        probe = ranges[5][0]
+        self.assertEqual(loaded.lookup(probe), index.lookup(probe))
+
+    def test_ipv4_mapped_ipv6(self):
+        index = GeoIPIndex.from_ranges([('49.36.0.0', '49.39.255.255', 'Mumbai, Maharashtra, India')])
+        self.assertEqual(index.lookup('::ffff:49.37.1.2'), 'Mumbai, Maharashtra, India')
+        self.assertIsNone(index.lookup('49.40.0.0'))
+        self.assertIsNone(index.lookup('not an ip'))
+
+    def test_misses_expire_quickly(self):
+        class Resolver:
+            calls = 0
+
+            def locate(self, ip):
+                Resolver.calls += 1
+                return None
+
+        locator = IPLocator(Resolver(), ttl=3600, negative_ttl=0.05)
+        self.assertEqual(locator.locate('8.8.8.8'), UNKNOWN)
+        self.assertEqual(locator.locate('8.8.8.8'), UNKNOWN)
+        self.assertEqual(Resolver.calls, 1)
+        time.sleep(0.06)
+        locator.locate('8.8.8.8')
+        self.assertEqual(Resolver.calls, 2)
+        self.assertEqual(locator.locate('10.0.0.1'), UNKNOWN)  # private: never looked up
+        self.assertEqual(Resolver.calls, 2)
+
+
+# ── API ──
+
+class BatchFanOutTests(SimpleTestCase):
+    def _service(self, fetch):
+        return _service(
+            _fetch_ai_recommendations=fetch,
+            _cached_recommendations=lambda cache_key, prefs: None,
+            get_fallback_batch=lambda unique: [{'recommendations': [], 'budget': p['budget']} for p in unique],
+        )
+
+    def test_identical_entries_are_fetched_once(self):
+        calls = []
+
+        def fetch(cache_key, prefs):
+            calls.append(prefs['budget'])
+            return ({'recommendations': [RECOMMENDATION], 'budget': prefs['budget']}, None), False
+
+        prefs = [{'budget': b, 'num_days': 3} for b in (1000, 2000, 1000)]
+        results = sorted(self._service(fetch).iter_batch_recommendations(prefs), key=lambda r: r[0])
+        self.assertEqual(sorted(calls), [1000, 2000])
+        self.assertEqual([(i, r['budget'], source) for i, r, source in results],
+                         [(0, 1000, 'ai'), (1, 2000, 'ai'), (2, 1000, 'ai')])
+
+    @override_settings(AI_BATCH_CONCURRENCY=2, AI_DEADLINES={'recommendations': 0.05})
+    def test_late_calls_keep_their_slot(self):
+        lock = threading.Lock()
+        in_flight, peak = [0], [0]
+
+        def fetch(cache_key, prefs):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.2)
+            with lock:
+                in_flight[0] -= 1
+            return (None, None), False
+
+        prefs = [{'budget': 1000 * (i + 1), 'num_days': 3} for i in range(8)]
+        results = list(self._service(fetch).iter_batch_recommendations(prefs))
+        self.assertEqual(sorted(i for i, _, _ in results), list(range(8)))
+        self.assertEqual({source for _, _, source in results}, {'fallback'})
+        self.assertTrue(_wait_for(lambda: in_flight[0] == 0))
+        self.assertLessEqual(peak[0], 2)
+
+
+class BatchRecommendationsTests(TestCase):
+    url = '/api/recommendations/batch/'
+
+    def setUp(self):
+        self.item = {'name': 'A', 'budget': 20000, 'num_days': 4, 'from_location': 'Mumbai'}
+        User.objects.create_user('staff', password='p', is_staff=True)
+        User.objects.create_user('user', password='p')
+
+    def post(self, client, body, **extra):
+        return client.post(self.url, json.dumps(body), content_type='application/json', **extra)
+
+    def test_requires_staff_or_api_key(self):
+        body = {'items': [self.item]}
+        self.assertEqual(self.post(Client(), body).status_code, 403)
+        client = Client()
+        client.login(username='user', password='p')
+        self.assertEqual(self.post(client, body).status_code, 403)
+        with override_settings(BATCH_API_KEYS=['secret']):
+            self.assertEqual(self.post(Client(), body, headers={'X-API-Key': 'wrong'}).status_code, 403)
+            self.assertEqual(self.post(Client(), body, headers={'X-API-Key': 'secret'}).status_code, 200)
+
+    def test_staff_session_needs_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        client.login(username='staff', password='p')
+        self.assertEqual(self.post(client, {'items': [self.item]}).status_code, 403)
+
+    def test_static_by_default_and_ai_items_capped(self):
+        client = Client()
+        client.login(username='staff', password='p')
+        response = self.post(client, {'items': [self.item] * 3})
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([line.get('source') for line in lines[:-1]], ['fallback'] * 3)
+        self.assertEqual(lines[-1], {'type': 'done', 'count': 3})
+
+        with override_settings(AI_BATCH_MAX_AI_ITEMS=2):
+            response = self.post(client, {'items': [self.item] * 3, 'ai': True})
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportTripRequestsTests(TestCase):
+    url = '/api/export/trip-requests/'
+
+    def setUp(self):
+        User.objects.create_user('staff', password='p', is_staff=True)
+        self.client = Client()
+        self.client.login(username='staff', password='p')
+        for day, name in ((1, 'Asha'), (2, 'Ravi, "R"'), (3, 'Meera')):
+            trip = TripRequest.objects.create(
+                name=name, budget=20000, travel_type='solo', travel_scope='within_country',
+                num_days=4, food_accommodation='with', from_location='Mumbai', travel_medium='train',
+                destination_styles=['beach', 'food'] if day == 2 else [],
+            )
+            # 10:00 in Asia/Kolkata
+            TripRequest.objects.filter(pk=trip.pk).update(
+                created_at=datetime.datetime(2025, 3, day, 4, 30, tzinfo=datetime.timezone.utc))
+
+    def export(self, **params):
+        return self.client.get(self.url, params)
+
+    def test_staff_only(self):
+        self.assertEqual(Client().get(self.url).status_code, 403)
+
+    def test_csv_within_the_date_range(self):
+        response = self.export(start='2025-03-02', end='2025-03-03')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('trip_requests_2025-03-02_2025-03-03.csv', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8'))))
+        self.assertEqual(rows[0], FIELDS)
+        self.assertEqual([row[2] for row in rows[1:]], ['Ravi, "R"', 'Meera'])
+        self.assertEqual(rows[1][1], '2025-03-02T10:00:00+05:30')
+        self.assertEqual(rows[1][-1], 'beach, food')
+
+    def test_xlsx(self):
+        response = self.export(type='xlsx', end='2025-03-02')
+        self.assertEqual(response.status_code, 200)
+        wb = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        rows = list(wb.active.iter_rows(values_only=True))
+        wb.close()
+        self.assertEqual(list(rows[0]), FIELDS)
+        self.assertEqual([row[2] for row in rows[1:]], ['Asha', 'Ravi, "R"'])
+        self.assertEqual(rows[1][1], datetime.datetime(2025, 3, 1, 10, 0))
+
+    def test_parquet(self):
+        response = self.export(type='parquet')
+        if importlib.util.find_spec('pyarrow') is None:
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('pyarrow', response.json()['error'])
+            return
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(table.column_names, FIELDS)
+        self.assertEqual(table.column('name').to_pylist(), ['Asha', 'Ravi, "R"', 'Meera'])
+        self.assertEqual(table.column('destination_styles').to_pylist(), [[], ['beach', 'food'], []])
+
+    def test_bad_arguments(self):
+        self.assertEqual(self.export(type='pdf').status_code, 400)
+        self.assertEqual(self.export(start='March').status_code, 400)
+        self.assertEqual(self.export(end='2025-02-30').status_code, 400)
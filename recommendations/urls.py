@@ -3,14 +3,29 @@ from .views import (
     GetRecommendationsView,
     GetDestinationDetailsView,
     LocationSuggestionsView,
+    FestivalsByMonthView,
     ContactMessageView,
     HealthCheckView,
+    AsyncGetRecommendationsView,
+    AsyncGetDestinationDetailsView,
+    AsyncLocationSuggestionsView,
+    StreamRecommendationsView,
+    BatchRecommendationsView,
+    ExportTripRequestsView,
 )
 
 urlpatterns = [
     path('health/', HealthCheckView.as_view(), name='health-check'),
     path('recommendations/', GetRecommendationsView.as_view(), name='get-recommendations'),
+    path('recommendations/stream/', StreamRecommendationsView.as_view(), name='stream-recommendations'),
+    path('recommendations/batch/', BatchRecommendationsView.as_view(), name='batch-recommendations'),
     path('destination-details/', GetDestinationDetailsView.as_view(), name='destination-details'),
     path('location-suggestions/', LocationSuggestionsView.as_view(), name='location-suggestions'),
+    path('festivals/', FestivalsByMonthView.as_view(), name='festivals-by-month'),
     path('contact/', ContactMessageView.as_view(), name='contact-message'),
+    path('export/trip-requests/', ExportTripRequestsView.as_view(), name='export-trip-requests'),
+    # Async variants — use these when served through gypsycompass_backend.asgi
+    path('async/recommendations/', AsyncGetRecommendationsView.as_view(), name='get-recommendations-async'),
+    path('async/destination-details/', AsyncGetDestinationDetailsView.as_view(), name='destination-details-async'),
+    path('async/location-suggestions/', AsyncLocationSuggestionsView.as_view(), name='location-suggestions-async'),
 ]
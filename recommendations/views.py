@@ -1,9 +1,26 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.utils.http import parse_etags, quote_etag
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+import asyncio
+import hashlib
+import hmac
+import json
 import traceback
 import sys
-from .ai_service import GeminiAIService
+from concurrent.futures import ThreadPoolExecutor
+from .ai_service import get_ai_service, gemini_circuit_status
+from .festival_index import MONTHS, month_number
 
 # Ensure console output handles Unicode (₹ symbol)
 try:
@@ -11,13 +28,124 @@ try:
         sys.stdout.reconfigure(encoding='utf-8')
 except:
     pass
-from .excel_service import save_user_data, get_client_ip, get_user_ip_location
-from .models import TripRequest, ContactMessage
+from .analytics import analytics_status, record_trip_request
+from .excel_service import get_client_ip, get_user_ip_location
+from .export import FORMATS, ExportError, check_format, iter_rows, parse_bound, stream_export, trip_requests
+from .models import ContactMessage
 
 
 def _get_ai_service():
-    """Create a fresh AI service instance each request so API key changes take effect immediately."""
-    return GeminiAIService()
+    """Return the worker's shared AI service (it picks up .env / key changes on its own)."""
+    return get_ai_service()
+
+
+def _parse_user_prefs(data):
+    """Validate a trip request body. Returns (user_prefs, error_message)."""
+    required_fields = ['name', 'budget', 'num_days', 'from_location']
+    for field in required_fields:
+        if not data.get(field):
+            return None, f'"{field}" is required'
+
+    # Parse destination styles safely
+    raw_styles = data.get('destination_styles', [])
+    if isinstance(raw_styles, str):
+        raw_styles = [s.strip() for s in raw_styles.split(',') if s.strip()]
+    elif not isinstance(raw_styles, list):
+        raw_styles = []
+
+    user_prefs = {
+        'name': str(data.get('name', '')).strip(),
+        'budget': float(data.get('budget', 50000)),
+        'currency': str(data.get('currency', 'INR')).strip(),
+        'travel_type': str(data.get('travel_type', 'solo')).strip(),
+        'group_size': int(data.get('group_size', 1)),
+        'travel_scope': str(data.get('travel_scope', 'within_country')).strip(),
+        'num_days': int(data.get('num_days', 5)),
+        'food_accommodation': str(data.get('food_accommodation', 'with')).strip(),
+        'from_location': str(data.get('from_location', '')).strip(),
+        'travel_medium': str(data.get('travel_medium', 'any')).strip(),
+        'destination_styles': raw_styles,
+    }
+    return user_prefs, None
+
+
+def _record_trip_request(user_prefs, ip_address):
+    """IP lookup + Excel + DB bookkeeping for a trip request. Returns the IP location."""
+    ip_location = 'Unknown'
+    try:
+        ip_location = get_user_ip_location(ip_address)
+    except Exception as e:
+        print(f"IP location lookup failed (non-critical): {e}")
+
+    # Journal (→ Excel) and DB rows are written behind the request, in batches
+    if record_trip_request(user_prefs, ip_address, ip_location):
+        print("  Analytics: queued")
+    else:
+        print("  Analytics: queue full, record dropped (non-critical)")
+    _get_ai_service().remember_origin(user_prefs['from_location'])
+    return ip_location
+
+
+# Trip bookkeeping runs alongside the AI call rather than before it
+_RECORDER = ThreadPoolExecutor(max_workers=4, thread_name_prefix='trip-record')
+
+
+def _start_recording(user_prefs, ip_address):
+    """Run _record_trip_request in the background; returns a future for the IP location."""
+    return _RECORDER.submit(_record_trip_request, user_prefs, ip_address)
+
+
+def _recorded_ip_location(recording, timeout=2.0):
+    """The IP location from _start_recording(), or 'Unknown' if it isn't ready in time."""
+    try:
+        return recording.result(timeout=timeout)
+    except Exception as e:
+        print(f"IP location not ready (non-critical): {e!r}")
+        return 'Unknown'
+
+
+async def _arecord_trip_request(user_prefs, ip_address):
+    """Async twin of _record_trip_request — nothing here blocks the event loop."""
+    ip_location = 'Unknown'
+    try:
+        ip_location = await sync_to_async(get_user_ip_location, thread_sensitive=False)(ip_address)
+    except Exception as e:
+        print(f"IP location lookup failed (non-critical): {e}")
+
+    # Only appends to an in-memory buffer, so it is safe to call from the loop
+    if record_trip_request(user_prefs, ip_address, ip_location):
+        print("  Analytics: queued")
+    else:
+        print("  Analytics: queue full, record dropped (non-critical)")
+    _get_ai_service().remember_origin(user_prefs['from_location'])
+    return ip_location
+
+
+def _recommendations_payload(result, user_prefs, ip_location):
+    if not result or not isinstance(result, dict):
+        raise ValueError("AI service returned invalid response type")
+    recs = result.get('recommendations', [])
+    print(f"  Result: {len(recs)} recommendations returned")
+    return {
+        'success': True,
+        'user_prefs': user_prefs,
+        'ip_location': ip_location,
+        'recommendations': recs,
+        'ai_summary': result.get('ai_summary', ''),
+    }
+
+
+def _recommendations_error_payload(exc, user_prefs, ip_location):
+    print(f"  ERROR in AI service: {exc}")
+    traceback.print_exc()
+    return {
+        'success': False,
+        'error': str(exc),
+        'recommendations': [],
+        'ai_summary': 'Something went wrong generating recommendations. Please try again.',
+        'user_prefs': user_prefs,
+        'ip_location': ip_location,
+    }
 
 
 class GetRecommendationsView(APIView):
@@ -27,97 +155,25 @@ class GetRecommendationsView(APIView):
     """
 
     def post(self, request):
-        data = request.data
-
-        # Validate required fields
-        required_fields = ['name', 'budget', 'num_days', 'from_location']
-        for field in required_fields:
-            if not data.get(field):
-                return Response(
-                    {'error': f'"{field}" is required'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-        # Get user IP (for geographical context)
-        ip_address = get_client_ip(request)
-        ip_location = 'Unknown'
-        try:
-            ip_location = get_user_ip_location(ip_address)
-        except Exception as e:
-            print(f"IP location lookup failed (non-critical): {e}")
-
-        # Parse destination styles safely
-        raw_styles = data.get('destination_styles', [])
-        if isinstance(raw_styles, str):
-            raw_styles = [s.strip() for s in raw_styles.split(',') if s.strip()]
-        elif not isinstance(raw_styles, list):
-            raw_styles = []
-
-        user_prefs = {
-            'name': str(data.get('name', '')).strip(),
-            'budget': float(data.get('budget', 50000)),
-            'currency': str(data.get('currency', 'INR')).strip(),
-            'travel_type': str(data.get('travel_type', 'solo')).strip(),
-            'group_size': int(data.get('group_size', 1)),
-            'travel_scope': str(data.get('travel_scope', 'within_country')).strip(),
-            'num_days': int(data.get('num_days', 5)),
-            'food_accommodation': str(data.get('food_accommodation', 'with')).strip(),
-            'from_location': str(data.get('from_location', '')).strip(),
-            'travel_medium': str(data.get('travel_medium', 'any')).strip(),
-            'destination_styles': raw_styles,
-        }
+        user_prefs, error = _parse_user_prefs(request.data)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
 
         print("\n--- New Trip Request ---")
         print(f"  Name: {user_prefs['name']} | From: {user_prefs['from_location']}")
 
-        # Save to Excel (Local tracking - Ignored by Git)
-        try:
-            save_user_data(user_prefs, ip_address, ip_location)
-            print("  Excel: saved OK")
-        except Exception as e:
-            print(f"  Excel: failed (non-critical) -> {e}")
-
-        # Save to database (non-critical)
-        try:
-            TripRequest.objects.create(
-                ip_address=ip_address,
-                ip_location=ip_location,
-                **user_prefs
-            )
-            print("  DB: saved OK")
-        except Exception as e:
-            print(f"  DB: failed (non-critical) -> {e}")
+        # IP location (for geographical context) and analytics run alongside
+        # the AI call; only the response waits for the location
+        ip_address = get_client_ip(request)
+        recording = _start_recording(user_prefs, ip_address)
 
         # Get AI recommendations - ALWAYS returns a response
         try:
             ai_service = _get_ai_service()
             result = ai_service.get_travel_recommendations(user_prefs)
-
-            if not result or not isinstance(result, dict):
-                raise ValueError("AI service returned invalid response type")
-
-            recs = result.get('recommendations', [])
-            print(f"  Result: {len(recs)} recommendations returned")
-
-            return Response({
-                'success': True,
-                'user_prefs': user_prefs,
-                'ip_location': ip_location,
-                'recommendations': recs,
-                'ai_summary': result.get('ai_summary', ''),
-            })
-
+            return Response(_recommendations_payload(result, user_prefs, _recorded_ip_location(recording)))
         except Exception as exc:
-            print(f"  ERROR in AI service: {exc}")
-            traceback.print_exc()
-            return Response({
-                'success': False,
-                'error': str(exc),
-                'recommendations': [],
-                'ai_summary': 'Something went wrong generating recommendations. Please try again.',
-                'user_prefs': user_prefs,
-                'ip_location': ip_location,
-            })
+            return Response(_recommendations_error_payload(exc, user_prefs, _recorded_ip_location(recording)))
 
 
 class GetDestinationDetailsView(APIView):
@@ -137,30 +193,67 @@ class GetDestinationDetailsView(APIView):
 
         try:
             ai_service = _get_ai_service()
-            details = ai_service.get_destination_details(destination_name, user_prefs)
-            return Response({'success': True, 'details': details})
+            details, cache_meta = ai_service.get_destination_details_cached(destination_name, user_prefs)
+            print(f"  Details cache: {cache_meta['status']}")
+            return Response({'success': True, 'details': details, 'cache': cache_meta})
         except Exception as exc:
             print(f"  Detail error: {exc}")
             traceback.print_exc()
             return Response({'success': False, 'error': str(exc), 'details': {}})
 
 
+def _suggestions_response(request, suggestions, respond):
+    """
+    Suggestions with an ETag and Cache-Control so browsers and CDNs can reuse
+    them; 304 when the client already holds this exact list.
+    """
+    etag = quote_etag(hashlib.md5(json.dumps(suggestions).encode()).hexdigest())
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = respond({'suggestions': suggestions})
+    response['ETag'] = etag
+    if len(suggestions) >= 6:
+        max_age = getattr(settings, 'AI_SUGGESTIONS_MAX_AGE', 3600)
+    else:
+        max_age = getattr(settings, 'AI_SUGGESTIONS_PARTIAL_MAX_AGE', 60)
+    patch_cache_control(response, public=True, max_age=max_age)
+    return response
+
+
 class LocationSuggestionsView(APIView):
     """GET endpoint for location autocomplete."""
 
+    # Public and cacheable: skip session auth so responses don't Vary on Cookie
+    authentication_classes = []
+
     def get(self, request):
         query = request.query_params.get('q', '').strip()
         if len(query) < 2:
-            return Response({'suggestions': []})
+            return _suggestions_response(request, [], Response)
         try:
             ai_service = _get_ai_service()
             suggestions = ai_service.get_location_suggestions(query)
-            return Response({'suggestions': suggestions})
+            return _suggestions_response(request, suggestions, Response)
         except Exception as exc:
             print(f"Suggestion error: {exc}")
             return Response({'suggestions': []})
 
 
+class FestivalsByMonthView(APIView):
+    """GET endpoint: static festivals running in a month (?month=11 or ?month=November)."""
+
+    def get(self, request):
+        month = month_number(request.query_params.get('month', ''))
+        if month is None:
+            return Response(
+                {'error': 'month must be 1-12 or a month name'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        festivals = _get_ai_service().get_festivals_by_month(month)
+        return Response({'month': MONTHS[month - 1].title(), 'festivals': festivals})
+
+
 class ContactMessageView(APIView):
     """POST endpoint to receive contact form submissions."""
 
@@ -198,12 +291,305 @@ class HealthCheckView(APIView):
     def get(self, request):
         try:
             ai_service = _get_ai_service()
+            circuit = gemini_circuit_status()
+            if not ai_service.available:
+                ai_mode = 'Smart Fallback (30+ destinations)'
+            elif circuit['state'] == 'open':
+                ai_mode = 'Smart Fallback (Gemini circuit open)'
+            else:
+                ai_mode = 'Gemini AI (Real-time)'
             return Response({
                 'status': 'ok',
                 'service': 'GypsyCompass API',
                 'ai_available': ai_service.available,
-                'ai_mode': 'Gemini AI (Real-time)' if ai_service.available else 'Smart Fallback (30+ destinations)',
+                'ai_mode': ai_mode,
+                'ai_circuit': circuit,
+                'analytics_queue': analytics_status(),
                 'version': '2.0.0',
             })
         except Exception as exc:
             return Response({'status': 'error', 'detail': str(exc)})
+
+
+# ─────────────────────────────────────────────────────────
+#  ASYNC VIEWS  (served without blocking a worker under the ASGI entry point)
+# ─────────────────────────────────────────────────────────
+
+def _json_response(payload, status_code=200):
+    return JsonResponse(payload, status=status_code, json_dumps_params={'ensure_ascii': False})
+
+
+def _json_body(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncGetRecommendationsView(View):
+    """
+    Async POST endpoint for AI travel recommendations.
+    Same contract as GetRecommendationsView, but the Gemini round trip,
+    IP lookup and DB write are awaited instead of holding a worker thread.
+    """
+
+    async def post(self, request):
+        data = _json_body(request)
+        if data is None:
+            return _json_response({'error': 'Request body must be a JSON object'}, 400)
+        user_prefs, error = _parse_user_prefs(data)
+        if error:
+            return _json_response({'error': error}, 400)
+
+        print("\n--- New Trip Request (async) ---")
+        print(f"  Name: {user_prefs['name']} | From: {user_prefs['from_location']}")
+
+        ip_address = get_client_ip(request)
+        # Bookkeeping runs concurrently with the Gemini call
+        recorder = asyncio.ensure_future(_arecord_trip_request(user_prefs, ip_address))
+
+        try:
+            result = await _get_ai_service().aget_travel_recommendations(user_prefs)
+            return _json_response(_recommendations_payload(result, user_prefs, await recorder))
+        except Exception as exc:
+            return _json_response(_recommendations_error_payload(exc, user_prefs, await recorder))
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncGetDestinationDetailsView(View):
+    """Async POST endpoint for detailed destination information."""
+
+    async def post(self, request):
+        data = _json_body(request)
+        if data is None:
+            return _json_response({'error': 'Request body must be a JSON object'}, 400)
+        destination_name = str(data.get('destination_name', '')).strip()
+        user_prefs = data.get('user_prefs') or {}
+
+        if not destination_name:
+            return _json_response({'error': 'destination_name is required'}, 400)
+
+        print(f"\n--- Detail request (async): {destination_name} ---")
+
+        try:
+            details, cache_meta = await _get_ai_service().aget_destination_details_cached(destination_name, user_prefs)
+            print(f"  Details cache: {cache_meta['status']}")
+            return _json_response({'success': True, 'details': details, 'cache': cache_meta})
+        except Exception as exc:
+            print(f"  Detail error: {exc}")
+            traceback.print_exc()
+            return _json_response({'success': False, 'error': str(exc), 'details': {}})
+
+
+class AsyncLocationSuggestionsView(View):
+    """Async GET endpoint for location autocomplete."""
+
+    async def get(self, request):
+        query = request.GET.get('q', '').strip()
+        if len(query) < 2:
+            return _suggestions_response(request, [], _json_response)
+        try:
+            suggestions = await _get_ai_service().aget_location_suggestions(query)
+            return _suggestions_response(request, suggestions, _json_response)
+        except Exception as exc:
+            print(f"Suggestion error: {exc}")
+            return _json_response({'suggestions': []})
+
+
+# ─────────────────────────────────────────────────────────
+#  STREAMING RECOMMENDATIONS  (NDJSON, one event per line)
+# ─────────────────────────────────────────────────────────
+
+def _ndjson(event):
+    return json.dumps(event, ensure_ascii=False) + '\n'
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class StreamRecommendationsView(View):
+    """
+    POST endpoint streaming recommendations as NDJSON: the static fallback
+    first (within milliseconds), then each Gemini pick as it is generated,
+    then the AI summary. Analytics are recorded alongside the stream.
+    Streams incrementally under both ASGI (async generator) and WSGI
+    (sync generator).
+    """
+
+    async def post(self, request):
+        data = _json_body(request)
+        if data is None:
+            return _json_response({'error': 'Request body must be a JSON object'}, 400)
+        user_prefs, error = _parse_user_prefs(data)
+        if error:
+            return _json_response({'error': error}, 400)
+
+        print("\n--- New Trip Request (stream) ---")
+        print(f"  Name: {user_prefs['name']} | From: {user_prefs['from_location']}")
+
+        ip_address = get_client_ip(request)
+        if isinstance(request, ASGIRequest):
+            events = self._aevents(user_prefs, ip_address)
+        else:
+            events = self._events(user_prefs, ip_address)
+        response = StreamingHttpResponse(events, content_type='application/x-ndjson')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # keep proxies from buffering the stream
+        return response
+
+    def _events(self, user_prefs, ip_address):
+        recording = _start_recording(user_prefs, ip_address)
+        try:
+            for event in _get_ai_service().stream_travel_recommendations(user_prefs):
+                if event['type'] == 'done':
+                    event['ip_location'] = _recorded_ip_location(recording, timeout=5)
+                yield _ndjson(event)
+        except Exception as exc:
+            print(f"  ERROR in AI stream: {exc}")
+            traceback.print_exc()
+            yield _ndjson({'type': 'error', 'error': str(exc)})
+
+    async def _aevents(self, user_prefs, ip_address):
+        recorder = asyncio.ensure_future(_arecord_trip_request(user_prefs, ip_address))
+        try:
+            async for event in _get_ai_service().astream_travel_recommendations(user_prefs):
+                if event['type'] == 'done':
+                    event['ip_location'] = await recorder
+                yield _ndjson(event)
+        except Exception as exc:
+            print(f"  ERROR in AI stream: {exc}")
+            traceback.print_exc()
+            yield _ndjson({'type': 'error', 'error': str(exc)})
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class BatchRecommendationsView(View):
+    """
+    POST {"items": [user_prefs, ...], "ai": true} → NDJSON, one line per item
+    as soon as it is ready (not in request order):
+        {"type": "item", "index": i, "success": true, "source": "ai" | "cache" | "fallback",
+         "recommendations": [...], "ai_summary": "..."}
+        {"type": "item", "index": i, "success": false, "error": "..."}
+    then {"type": "done", "count": n}. Meant for partner and marketing jobs:
+    nothing is saved to Excel / the DB and no IP lookup is made. Items are
+    answered from the static catalog in one pass unless "ai": true, which
+    is allowed for at most AI_BATCH_MAX_AI_ITEMS items.
+
+    Callers are staff users (session login) or send an X-API-Key header
+    listed in BATCH_API_KEYS.
+    """
+
+    async def post(self, request):
+        if not await _batch_caller_allowed(request):
+            return _json_response({'error': 'Staff login or a valid X-API-Key header is required'}, 403)
+        data = _json_body(request)
+        if data is None:
+            return _json_response({'error': 'Request body must be a JSON object'}, 400)
+        items = data.get('items')
+        if not isinstance(items, list) or not items:
+            return _json_response({'error': '"items" must be a non-empty list of trip preferences'}, 400)
+        use_ai = bool(data.get('ai', False))
+        max_items = getattr(settings, 'AI_BATCH_MAX_AI_ITEMS', 20) if use_ai else getattr(settings, 'AI_BATCH_MAX_ITEMS', 500)
+        if len(items) > max_items:
+            scope = ' with "ai": true' if use_ai else ''
+            return _json_response({'error': f'At most {max_items} items per batch{scope}'}, 400)
+
+        print(f"\n--- Batch request: {len(items)} items ---")
+        events = self._events(items, use_ai)
+        if isinstance(request, ASGIRequest):
+            events = _aiterate_in_thread(events)
+        response = StreamingHttpResponse(events, content_type='application/x-ndjson')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def _events(self, items, use_ai):
+        valid, positions = [], []
+        for index, item in enumerate(items):
+            try:
+                user_prefs, error = _parse_user_prefs(item) if isinstance(item, dict) else (None, 'item must be an object')
+            except (TypeError, ValueError) as exc:
+                user_prefs, error = None, f'invalid value: {exc}'
+            if error:
+                yield _ndjson({'type': 'item', 'index': index, 'success': False, 'error': error})
+            else:
+                valid.append(user_prefs)
+                positions.append(index)
+        try:
+            for i, result, source in _get_ai_service().iter_batch_recommendations(valid, use_ai=use_ai):
+                yield _ndjson({
+                    'type': 'item', 'index': positions[i], 'success': True, 'source': source,
+                    'recommendations': result.get('recommendations', []),
+                    'ai_summary': result.get('ai_summary', ''),
+                })
+        except Exception as exc:
+            print(f"  ERROR in batch: {exc}")
+            traceback.print_exc()
+            yield _ndjson({'type': 'error', 'error': str(exc)})
+        yield _ndjson({'type': 'done', 'count': len(items)})
+
+
+async def _batch_caller_allowed(request):
+    """True for a listed X-API-Key, or an active staff user whose session passes the CSRF check."""
+    key = request.headers.get('X-API-Key', '')
+    if key:
+        return any(hmac.compare_digest(key, allowed) for allowed in getattr(settings, 'BATCH_API_KEYS', []))
+    user = await request.auser()
+    if not (user.is_active and user.is_staff):
+        return False
+    # The view is csrf_exempt for key callers; a cookie-authenticated one
+    # still needs the token (as DRF's SessionAuthentication requires)
+    check = CsrfViewMiddleware(lambda req: None)
+    check.process_request(request)
+    return check.process_view(request, None, (), {}) is None
+
+
+# ─────────────────────────────────────────────────────────
+#  EXPORT  (staff only, streamed)
+# ─────────────────────────────────────────────────────────
+
+class ExportTripRequestsView(APIView):
+    """
+    GET /api/export/trip-requests/?type=csv|xlsx|parquet&start=YYYY-MM-DD&end=YYYY-MM-DD
+    Staff-only download of TripRequest history (both dates inclusive, either
+    may be omitted), streamed in chunks whatever the table size.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        # Not ?format=: DRF reserves that for renderer selection
+        fmt = request.query_params.get('type', 'csv').lower()
+        try:
+            check_format(fmt)
+            start = parse_bound(request.query_params.get('start'))
+            end = parse_bound(request.query_params.get('end'), end=True)
+        except ExportError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        content_type, extension = FORMATS[fmt]
+        chunks = stream_export(fmt, iter_rows(trip_requests(start, end)))
+        if isinstance(request._request, ASGIRequest):
+            # The DB cursor belongs to the request's sync thread: iterate there
+            chunks = _aiterate_in_thread(chunks, thread_sensitive=True)
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        span = '_'.join(v for v in (request.query_params.get('start'), request.query_params.get('end')) if v)
+        filename = f"trip_requests{'_' + span if span else ''}.{extension}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['Cache-Control'] = 'no-store'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+async def _aiterate_in_thread(iterator, thread_sensitive=False):
+    """
+    Drive a blocking iterator from a worker thread so the event loop stays
+    free. thread_sensitive=True runs every step on the request's sync thread,
+    for iterators holding thread-bound resources such as a DB cursor.
+    """
+    done = object()
+    while True:
+        item = await sync_to_async(next, thread_sensitive=thread_sensitive)(iterator, done)
+        if item is done:
+            return
+        yield item
@@ -0,0 +1,147 @@
+"""
+Write-behind queue
+==================
+Requests hand their bookkeeping records to put(), which only appends to an
+in-memory buffer and returns. One daemon thread per process drains the
+buffer in batches, calling flush(records) every `max_batch` records or
+`flush_interval` seconds, whichever comes first, so a burst of N requests
+costs one bulk write instead of N round trips on the request path.
+
+    bounded   at most `max_size` records wait; past that the overflow
+              policy drops the oldest buffered record ('drop_oldest') or
+              the new one ('drop_newest'), and counts it
+    shutdown  close() (registered with atexit) stops the thread and
+              flushes whatever is left
+    counters  status(): depth, enqueued / flushed / dropped / failed
+              records, batches, and flush latency (last, max, average)
+
+A batch whose flush() raises is counted as failed and not retried: the
+records are analytics, and retrying a broken database from a bounded
+buffer would only turn one failure into a backlog of them.
+"""
+
+import atexit
+import os
+import threading
+import time
+from collections import Counter, deque
+
+
+class WriteBehindQueue:
+    DROP_OLDEST = 'drop_oldest'
+    DROP_NEWEST = 'drop_newest'
+
+    def __init__(self, name, flush, max_batch=100, flush_interval=0.5,
+                 max_size=10000, overflow=DROP_OLDEST):
+        if overflow not in (self.DROP_OLDEST, self.DROP_NEWEST):
+            raise ValueError(f"Unknown overflow policy: {overflow!r}")
+        self.name = name
+        self.flush = flush
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.overflow = overflow
+
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        self._counts = Counter()
+        self._flush_seconds = {'last': 0.0, 'max': 0.0, 'total': 0.0}
+        atexit.register(self.close)
+
+    def put(self, record):
+        """Buffer a record for the next flush; False if it was dropped."""
+        with self._cond:
+            if self._closed:
+                self._counts['dropped'] += 1
+                return False
+            self._ensure_worker()
+            accepted = True
+            if len(self._buffer) >= self.max_size:
+                self._counts['dropped'] += 1
+                if self.overflow == self.DROP_NEWEST:
+                    accepted = False
+                else:
+                    self._buffer.popleft()
+            if accepted:
+                self._buffer.append(record)
+                self._counts['enqueued'] += 1
+                if len(self._buffer) >= self.max_batch:
+                    self._cond.notify()
+            return accepted
+
+    def close(self, timeout=5.0):
+        """Stop the worker and flush everything still buffered (in this thread if the worker is gone)."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+            worker = self._thread if self._pid == os.getpid() else None
+        if worker is not None:
+            worker.join(timeout)
+        self._drain()
+
+    def status(self):
+        with self._cond:
+            batches = self._counts['batches']
+            return {
+                'depth': len(self._buffer),
+                'max_size': self.max_size,
+                'enqueued': self._counts['enqueued'],
+                'flushed': self._counts['flushed'],
+                'dropped': self._counts['dropped'],
+                'failed': self._counts['failed'],
+                'batches': batches,
+                'flush_ms_last': round(self._flush_seconds['last'] * 1000, 2),
+                'flush_ms_max': round(self._flush_seconds['max'] * 1000, 2),
+                'flush_ms_avg': round(self._flush_seconds['total'] * 1000 / batches, 2) if batches else 0.0,
+            }
+
+    def _ensure_worker(self):
+        # Threads don't survive fork: a gunicorn worker starts its own
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=f'write-behind-{self.name}', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._closed and len(self._buffer) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                closed = self._closed
+            self._drain()
+            if closed:
+                return
+
+    def _drain(self):
+        """Flush the buffer in batches of max_batch until it is empty."""
+        while True:
+            with self._cond:
+                batch = [self._buffer.popleft() for _ in range(min(self.max_batch, len(self._buffer)))]
+            if not batch:
+                return
+            self._flush_batch(batch)
+
+    def _flush_batch(self, batch):
+        started = time.perf_counter()
+        try:
+            self.flush(batch)
+            outcome = 'flushed'
+        except Exception as e:
+            print(f"[write-behind:{self.name}] Flush of {len(batch)} records failed: {e}")
+            outcome = 'failed'
+        elapsed = time.perf_counter() - started
+        with self._cond:
+            self._counts[outcome] += len(batch)
+            self._counts['batches'] += 1
+            self._flush_seconds['last'] = elapsed
+            self._flush_seconds['max'] = max(self._flush_seconds['max'], elapsed)
+            self._flush_seconds['total'] += elapsed